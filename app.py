@@ -1,13 +1,24 @@
-from flask import jsonify, request
+import os
+from flask import Response, jsonify, request, stream_with_context
 from functools import wraps
-from utils.auth import generate_token
+from utils.auth import get_session_backend
+from utils.passwords import PasswordHasherBusy
 from models.user import authenticate_user
 from app_factory import create_app
-from models.sessions import validate_session, create_session, delete_session, remove_expired_sessions
-from models.book import create_book, update_book, get_all_books, get_book, delete_book, search_book
-from utils.pagination import paginate
-
-app = create_app()
+from models.book import (
+    create_book, update_book, get_all_books, get_book, get_books_by_id, get_books_by_isbn, delete_book,
+    iter_books, build_book_filters, count_books, facet_counts, search_books_page, search_books_after,
+    get_book_changes, ChangesCompacted, SORTABLE_FIELDS, RELEVANCE,
+)
+from db.migrations import FACET_EXPRESSIONS
+from utils.bulk_import import import_books, iter_json_array, iter_ndjson
+from utils.http_cache import catalog_cached
+from utils.export import EXPORT_FORMATS, export_chunks
+from utils.metrics import timed
+from utils.serialization import book_to_dict, json_response
+from utils.pagination import paginate_query, paginate_keyset, decode_cursor
+
+app = create_app(os.environ.get("APP_CONFIG", "development"))
 
 def token_required(f):
     """
@@ -26,19 +37,14 @@ def token_required(f):
         if not token:
             return jsonify({"error": "Token is required"}), 400
 
-        if not validate_session(token):
+        with timed("auth"):
+            valid = get_session_backend().validate(token)
+        if not valid:
             return jsonify({"error": "Invalid or expired token"}), 401
 
         return f(*args, **kwargs)
     return decorated_function
 
-@app.before_request
-def clean_up_expired_sessions():
-    """
-    Remove expired sessions from the database before handling any request.
-    """
-    remove_expired_sessions()
-
 @app.route('/login', methods=['POST'])
 def login():
     """
@@ -54,12 +60,14 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
 
-    user_id = authenticate_user(username, password)
+    try:
+        user_id = authenticate_user(username, password)
+    except PasswordHasherBusy:
+        return jsonify({"error": "Too many logins in progress, retry shortly"}), 503, {"Retry-After": "1"}
     if user_id is None:
         return jsonify({"error": "Invalid credentials"}), 401
 
-    token = generate_token(username)
-    create_session(user_id, token)
+    token = get_session_backend().issue(user_id, username)
 
     return jsonify({"message": "Login successful", "token": token}), 200
 
@@ -73,10 +81,28 @@ def logout():
         JSON response confirming the logout.
     """
     token = request.headers.get('Authorization')
-    delete_session(token)
+    get_session_backend().revoke(token)
     return jsonify({"message": "Logout successful"}), 200
 
+def book_filters_from_request():
+    """
+    Build the book search for the filter query parameters of the current request.
+
+    Returns:
+        tuple: The WHERE clause, its parameters and the full-text MATCH expression,
+               as returned by build_book_filters.
+    """
+    return build_book_filters(
+        title=request.args.get('title'),
+        author=request.args.get('author'),
+        isbn=request.args.get('isbn'),
+        genre=request.args.get('genre'),
+        published_year=request.args.get('published_year'),
+        q=request.args.get('q'),
+    )
+
 @app.route('/books', methods=['GET'])
+@catalog_cached
 def get_books():
     """
     Fetch books with optional query parameters for filtering and pagination.
@@ -87,69 +113,189 @@ def get_books():
         isbn (str, optional): Filter by ISBN.
         genre (str, optional): Filter by genre.
         published_year (int, optional): Filter by published year.
+        q (str, optional): Full-text search; every word prefix-matches the title, author or genre.
         page (int, optional): Page number for pagination (default is 1).
-        per_page (int, optional): Items per page for pagination (default is 10).
+        per_page (int, optional): Items per page for pagination (default is 10, at most MAX_PER_PAGE).
+        sort (str, optional): Field to order by, one of SORTABLE_FIELDS, or "relevance"
+                              (the default when `q` is given, otherwise "id").
+        pagination (str, optional): Set to "cursor" to page with `after` cursors instead of page numbers.
+        after (str, optional): Cursor returned as `next_cursor` by the previous page; implies cursor mode.
 
     Returns:
         JSON response containing the paginated list of books or an error message.
+        In cursor mode the envelope carries `next_cursor` instead of page counts.
     """
-    title = request.args.get('title')
-    author = request.args.get('author')
-    isbn = request.args.get('isbn')
-    genre = request.args.get('genre')
-    published_year = request.args.get('published_year')
-
-    query = "SELECT * FROM books WHERE 1=1"
-    params = []
-
-    if title:
-        query += " AND title LIKE ?"
-        params.append(f"%{title}%")
-    if author:
-        query += " AND author LIKE ?"
-        params.append(f"%{author}%")
-    if isbn:
-        query += " AND isbn = ?"
-        params.append(isbn)
-    if genre:
-        query += " AND genre LIKE ?"
-        params.append(f"%{genre}%")
-    if published_year:
-        query += " AND published_year = ?"
-        params.append(published_year)
-
-    rows = search_book(query, params)
-
-    if not rows:
-        return jsonify({"message": "No books found"}), 404
-
-    books = [
-        {
-            'id': row[0],
-            'title': row[1],
-            'author': row[2],
-            'isbn': row[3],
-            'published_year': row[4],
-            'genre': row[5],
-            'created_at': row[6],
-        }
-        for row in rows
-    ]
-
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
     except ValueError:
         return jsonify({"error": "Page and per_page must be integers"}), 400
 
-    paginated_data = paginate(books, page, per_page)
+    if per_page < 1 or per_page > app.config["MAX_PER_PAGE"]:
+        return jsonify({"error": f"per_page must be between 1 and {app.config['MAX_PER_PAGE']}"}), 400
+
+    sort = request.args.get('sort', RELEVANCE if request.args.get('q') else 'id')
+    if sort not in SORTABLE_FIELDS and sort != RELEVANCE:
+        return jsonify({"error": f"sort must be one of {', '.join(SORTABLE_FIELDS + (RELEVANCE,))}"}), 400
+
+    where, params, match = book_filters_from_request()
+
+    after_token = request.args.get('after')
+    if after_token is not None or request.args.get('pagination') == 'cursor':
+        if sort == RELEVANCE:
+            return jsonify({"error": "Cursor pagination cannot order by relevance"}), 400
+        try:
+            after = decode_cursor(after_token, sort) if after_token else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        paginated_data = paginate_keyset(
+            lambda limit, position: [
+                book_to_dict(book) for book in search_books_after(where, params, limit, sort, position, match)
+            ],
+            per_page, sort, after,
+        )
+
+        if after is None and not paginated_data["items"]:
+            return jsonify({"message": "No books found"}), 404
+
+        return json_response(paginated_data)
+
+    total_items = count_books(where, params, match)
+
+    if not total_items:
+        return jsonify({"message": "No books found"}), 404
+
+    paginated_data = paginate_query(
+        total_items,
+        lambda limit, offset: search_books_page(where, params, limit, offset, sort, match, as_json=True),
+        page, per_page,
+    )
 
     if isinstance(paginated_data, tuple):
         return jsonify(paginated_data[0]), paginated_data[1]
 
-    return jsonify(paginated_data), 200
+    return json_response(paginated_data)
+
+@app.route('/books/facets', methods=['GET'])
+@catalog_cached
+def get_book_facets():
+    """
+    Count the books matching the GET /books filters per genre, author, year or decade.
+
+    Query Parameters:
+        facets (str, optional): Comma-separated facets among genre, author, published_year
+                                and decade (default: all of them).
+        limit (int, optional): Values returned per facet, most common first (default is 10,
+                               at most MAX_PER_PAGE).
+        title, author, isbn, genre, published_year, q: The same filters as GET /books.
+
+    Returns:
+        JSON response mapping each facet to its values and counts.
+    """
+    facets = request.args.get('facets')
+    facets = facets.split(',') if facets else list(FACET_EXPRESSIONS)
+    unknown = [facet for facet in facets if facet not in FACET_EXPRESSIONS]
+    if unknown:
+        return jsonify({"error": f"facets must be among {', '.join(FACET_EXPRESSIONS)}"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1 or limit > app.config["MAX_PER_PAGE"]:
+        return jsonify({"error": f"limit must be between 1 and {app.config['MAX_PER_PAGE']}"}), 400
+
+    where, params, match = book_filters_from_request()
+    return json_response({"facets": facet_counts(facets, where, params, match, limit)})
+
+@app.route('/books/export', methods=['GET'])
+def export_books():
+    """
+    Stream every book matching the GET /books filters as NDJSON or CSV.
+
+    Rows are read from SQLite in EXPORT_CHUNK_SIZE chunks and written to the
+    response as they are encoded, so the first bytes go out immediately and
+    memory use does not grow with the size of the catalog.
+
+    Query Parameters:
+        format (str, optional): "ndjson" (default) or "csv".
+        gzip (str, optional): "1" to gzip the stream; it is also gzipped when the
+                              client sends Accept-Encoding: gzip.
+        title, author, isbn, genre, published_year, q: The same filters as GET /books.
+
+    Returns:
+        Streaming response with the books in id order.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    where, params, match = book_filters_from_request()
+    gzip = request.args.get('gzip') == '1' or request.accept_encodings['gzip'] > 0
+    chunks = export_chunks(
+        iter_books(where, params, match, app.config["EXPORT_CHUNK_SIZE"]), export_format, gzip
+    )
+
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=books.{export_format}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/books/changes', methods=['GET'])
+@catalog_cached
+def get_book_changes_feed():
+    """
+    Fetch the changes to books after a feed position, so mirrors sync deltas instead of re-listing.
+
+    Query Parameters:
+        since (str, optional): The `next_since` of the previous response; 0 (the default) starts
+                               from the beginning, which lists every stored book.
+        limit (int, optional): Changes per response (default is 100, at most BOOK_CHANGES_MAX_LIMIT).
+
+    Returns:
+        JSON response with `changes` (oldest first, each an "upsert" with the current book or a
+        "delete"), the `next_since` to pass back and whether more changes are waiting (`has_more`).
+        410 when `since` predates compacted deletes and the client must start over from 0.
+    """
+    shards = app.config["BOOK_SHARDS"] or 1
+    try:
+        limit = int(request.args.get('limit', 100))
+        # With shards the position holds one version per shard, joined with dots
+        since = [int(part) for part in request.args.get('since', '0').split('.')]
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    if len(since) == 1:
+        since *= shards
+    if len(since) != shards or min(since) < 0:
+        return jsonify({"error": "since must be a next_since returned by this endpoint"}), 400
+    if limit < 1 or limit > app.config["BOOK_CHANGES_MAX_LIMIT"]:
+        return jsonify({"error": f"limit must be between 1 and {app.config['BOOK_CHANGES_MAX_LIMIT']}"}), 400
+
+    try:
+        changes, position, has_more = get_book_changes(since, limit)
+    except ChangesCompacted as e:
+        return jsonify({"error": f"{e}; start over from since=0"}), 410
+
+    return json_response({
+        "changes": [
+            {
+                "version": change.version,
+                "op": "delete" if change.deleted else "upsert",
+                "id": change.book_id,
+                "changed_at": change.changed_at,
+                "book": None if change.deleted else book_to_dict(change.book),
+            }
+            for change in changes
+        ],
+        "next_since": position[0] if shards == 1 else ".".join(map(str, position)),
+        "has_more": has_more,
+    })
 
 @app.route('/book/<int:book_id>', methods=['GET'])
+@catalog_cached
 def get_single_book(book_id: int):
     """
     Fetch details of a single book by its ID.
@@ -160,20 +306,41 @@ def get_single_book(book_id: int):
     Returns:
         JSON response containing the book details or an error message.
     """
-    row = get_book(book_id)
-    if row:
-        book = {
-            'id': row[0],
-            'title': row[1],
-            'author': row[2],
-            'isbn': row[3],
-            'published_year': row[4],
-            'genre': row[5],
-            'created_at': row[6]
-        }
-        return jsonify(book)
+    book = get_book(book_id)
+    if book:
+        return json_response(book_to_dict(book))
     return jsonify({"message": "Book not found"}), 404
 
+@app.route('/books/batch-get', methods=['POST'])
+def batch_get_books():
+    """
+    Fetch many books by ID or by ISBN in one request.
+
+    The body is a JSON object with either `ids` (integers) or `isbns`
+    (strings), at most BATCH_GET_MAX_ITEMS of them.
+
+    Returns:
+        JSON response with the found books in request order as `items`,
+        and the requested IDs or ISBNs that do not exist as `missing`.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or ("ids" in data) == ("isbns" in data):
+        return jsonify({"error": "Body must be a JSON object with either 'ids' or 'isbns'"}), 400
+
+    field = "ids" if "ids" in data else "isbns"
+    keys = data[field]
+    expected = int if field == "ids" else str
+    if not isinstance(keys, list) or not all(type(key) is expected for key in keys):
+        return jsonify({"error": f"'{field}' must be a list of {'integers' if field == 'ids' else 'strings'}"}), 400
+    if len(keys) > app.config["BATCH_GET_MAX_ITEMS"]:
+        return jsonify({"error": f"At most {app.config['BATCH_GET_MAX_ITEMS']} {field} per request"}), 400
+
+    books = get_books_by_id(keys) if field == "ids" else get_books_by_isbn(keys)
+    return json_response({
+        "items": [book_to_dict(book) for book in books if book is not None],
+        "missing": [key for key, book in zip(keys, books) if book is None],
+    })
+
 @app.route('/book', methods=['POST'])
 @token_required
 def add_book():
@@ -193,6 +360,30 @@ def add_book():
     create_book(title, author, isbn, published_year, genre)
     return jsonify({"message": "Book created successfully"}), 201
 
+@app.route('/books/bulk', methods=['POST'])
+@token_required
+def bulk_add_books():
+    """
+    Add many books at once from a JSON array or an NDJSON stream.
+
+    The body is read line by line as NDJSON when its Content-Type is
+    application/x-ndjson; otherwise it must be a JSON array of book objects.
+    Rows are validated and inserted in transactions of BULK_IMPORT_BATCH_SIZE.
+
+    Returns:
+        JSON response with the number of books inserted and failed, and the per-row errors.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({"error": "Body must be a JSON array of books or NDJSON"}), 400
+        records = iter_json_array(data)
+
+    report = import_books(records, app.config["BULK_IMPORT_BATCH_SIZE"])
+    return jsonify(report), 200
+
 @app.route('/book/<int:book_id>', methods=['PUT'])
 @token_required
 def edit_book(book_id: int):
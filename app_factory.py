@@ -1,9 +1,31 @@
-from db.database import initialize_db, get_db_connection
+import os
+import click
+from cli import register_commands
+from db.database import (
+    initialize_db, check_book_shard_layout, close_db_connection, get_database_path, log_sqlite_profile,
+    read_schema_version,
+)
+from db.migrations import LATEST_VERSION
 from flask import Flask
+from flask.cli import FlaskGroup
 from config import DevelopmentConfig, TestingConfig, ProductionConfig
 from models.user import create_user
+from utils.auth import create_session_backend
+from utils.metrics import init_metrics
+from utils.passwords import create_password_hasher
+from utils.profiling import init_profiling
+from utils.session_expiry import init_session_expiry
 
-def create_app(config_name="development"):
+def _loading_for_cli_command() -> bool:
+    """
+    Return True when a `flask` CLI command other than `flask run` is loading the app.
+
+    Such commands (e.g. `flask migrate`) must be able to start on an outdated schema in order to update it.
+    """
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and isinstance(ctx.find_root().command, FlaskGroup) and ctx.command.name != "run"
+
+def create_app(config_name="development", config_overrides=None):
     """
     Application factory to create and configure a Flask application instance.
 
@@ -11,9 +33,14 @@ def create_app(config_name="development"):
         config_name (str, optional): The configuration to use for the application.
                                      Options are "development", "testing", and "production".
                                      Defaults to "development".
+        config_overrides (dict, optional): Settings applied on top of the selected configuration.
 
     Returns:
         Flask: The configured Flask application instance.
+
+    Raises:
+        RuntimeError: If the database schema is older than this code expects (and AUTO_MIGRATE is off),
+                      or BOOK_SHARDS does not match the recorded shard layout.
     """
     app = Flask(__name__)
 
@@ -25,10 +52,52 @@ def create_app(config_name="development"):
     else:
         app.config.from_object(DevelopmentConfig)  # Defaults to development configuration
 
-    # Initialize the database and optionally add a test user
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    # Flask's logger inherits WARNING from the root logger; startup details are logged at INFO
+    app.logger.setLevel(app.config["LOG_LEVEL"])
+
+    register_commands(app)
+
+    # Time requests and SQL statements; registered first so later request hooks are included
+    init_metrics(app)
+
+    # Profile sampled and slow requests when PROFILING_ENABLED is on
+    init_profiling(app)
+
+    # Return pooled connections when each request (or app context) ends
+    app.teardown_appcontext(close_db_connection)
+
+    # Issue and validate tokens with the configured session backend
+    app.extensions["session_backend"] = create_session_backend(app.config)
+
+    # Hash and verify passwords on a bounded pool with the configured cost
+    app.extensions["password_hasher"] = create_password_hasher(app.config)
+
+    # Sweep expired sessions off the request hot path
+    init_session_expiry(app)
+
+    # Check the schema version (migrating only when allowed), seed the dev/test user and log the
+    # SQLite profile read from a read-only connection; nothing here writes to a current database
     with app.app_context():
-        initialize_db()
-        add_test_user()
+        version = read_schema_version()
+        if version < LATEST_VERSION and app.config["AUTO_MIGRATE"]:
+            initialize_db()
+            version = LATEST_VERSION
+        if version < LATEST_VERSION:
+            message = (f"Database schema is at version {version} but this code expects {LATEST_VERSION}; "
+                       "run `flask --app app migrate`")
+            if not _loading_for_cli_command():
+                raise RuntimeError(message)  # Workers never serve requests against an outdated schema
+            app.logger.warning(message)
+        else:
+            # Refuses to start when BOOK_SHARDS does not match where the books are stored
+            check_book_shard_layout()
+        if app.config["SEED_TEST_USER"]:
+            add_test_user()
+        if os.path.exists(get_database_path()):
+            log_sqlite_profile()
 
     return app
 
@@ -0,0 +1,12 @@
+"""
+ASGI entry point for the API, e.g. `uvicorn asgi:application`.
+
+Serves the same Flask app and models as app.py. The ASGI server's event loop
+does the network I/O (connections, request bodies, sending responses), and
+the views run on a dedicated executor of ASGI_WORKERS threads, so blocking
+SQLite I/O never stalls the loop and slow clients never hold a thread.
+"""
+from app import app
+from utils.asgi import WSGIToASGI
+
+application = WSGIToASGI(app, workers=app.config["ASGI_WORKERS"])
@@ -0,0 +1,334 @@
+"""
+Load-test the HTTP API with a mixed workload and compare runs for regressions.
+
+Usage:
+    python -m benchmarks.loadtest run [--books 10000] [--target inprocess|server] [--threads 8]
+                                      [--duration 10] [--output results.json]
+    python -m benchmarks.loadtest compare BASELINE.json CURRENT.json [--threshold 0.1]
+
+`run` seeds (or reuses) a synthetic catalog, then drives GET /books, GET /books?q=,
+GET /book/<id> and POST /login either in-process through the Flask test client
+or over HTTP against a server spawned locally, and reports p50/p95/p99 latency
+and throughput per endpoint. `compare` exits with status 1 when an endpoint's
+p95 latency grew, or its throughput shrank, by more than the threshold.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("APP_CONFIG", "development")
+
+LOADTEST_USER = ("loadtest", "loadtest-password")
+
+_WORDS = (
+    "river", "shadow", "garden", "empire", "winter", "silver", "machine", "ocean", "forest", "night",
+    "history", "secret", "island", "storm", "journey", "glass", "kingdom", "letters", "fire", "stone",
+)
+_GENRES = ("Fiction", "History", "Science", "Poetry", "Fantasy", "Biography", "Mystery")
+
+# Endpoint name -> (weight, request factory taking (rng, catalog size))
+WORKLOAD = {
+    "GET /books": (40, lambda rng, size: ("GET", "/books?page={}&per_page=20&sort={}".format(
+        rng.randint(1, 20), rng.choice(("id", "title", "published_year"))), None)),
+    "GET /books?q": (15, lambda rng, size: ("GET", "/books?q={}&per_page=20".format(rng.choice(_WORDS)), None)),
+    "GET /book/<id>": (40, lambda rng, size: ("GET", f"/book/{rng.randint(1, size)}", None)),
+    "POST /login": (5, lambda rng, size: ("POST", "/login", {"username": LOADTEST_USER[0],
+                                                             "password": LOADTEST_USER[1]})),
+}
+
+
+def _synthetic_books(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for i in range(count):
+        title = " ".join(rng.choice(_WORDS).title() for _ in range(rng.randint(2, 4)))
+        yield (f"{title} {i}", f"Author {rng.randint(1, max(1, count // 20))}", f"LT-{i:08d}",
+               rng.randint(1850, 2024), rng.choice(_GENRES))
+
+
+def _use_database(app, path: str):
+    from db.database import initialize_db
+    app.config["DATABASE_URI"] = f"sqlite:///{path}"
+    with app.app_context():
+        initialize_db()
+
+
+def seed_catalog(app, path: str, books: int):
+    """
+    Create a database of `books` synthetic books at `path`, reusing it if it already has them.
+
+    Args:
+        app (Flask): The API app, pointed at `path` by this call.
+        path (str): Database file for the catalog.
+        books (int): Number of books to seed.
+    """
+    from db.database import get_reader
+    from models.book import create_books
+    from models.user import create_user
+
+    _use_database(app, path)
+    with app.app_context():
+        existing = get_reader().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        if existing != books:
+            if existing:
+                raise SystemExit(f"{path} holds {existing} books, not {books}; remove it or pass --db")
+            started = time.perf_counter()
+            batch, batch_size = [], app.config["BULK_IMPORT_BATCH_SIZE"]
+            for book in _synthetic_books(books):
+                batch.append(book)
+                if len(batch) == batch_size:
+                    create_books(batch)
+                    batch = []
+            if batch:
+                create_books(batch)
+            print(f"seeded {books} books in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        create_user(*LOADTEST_USER)
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _summarize(samples: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name, (latencies, errors) in samples.items():
+        latencies = sorted(latencies)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        }
+    return endpoints
+
+
+def _inprocess_sender(app):
+    client = app.test_client()
+
+    def send(method, path, body):
+        return client.open(path, method=method, json=body).status_code
+    return send
+
+
+def _http_sender(port: int):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def send(method, path, body):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    return send
+
+
+def drive(make_sender, books: int, threads: int, duration: float, seed: int = 0) -> dict:
+    """
+    Run the mixed workload from `threads` client threads for `duration` seconds.
+
+    Args:
+        make_sender (callable): Returns a per-thread send(method, path, json_body) -> status function.
+        books (int): Catalog size, for picking book ids.
+        threads (int): Concurrent clients.
+        duration (float): Seconds to run.
+        seed (int, optional): Seed for the request mix.
+
+    Returns:
+        dict: Per-endpoint latency percentiles, throughput and error counts.
+    """
+    names = list(WORKLOAD)
+    weights = [WORKLOAD[name][0] for name in names]
+    samples = {name: ([], 0) for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        send = make_sender()
+        local = {name: ([], 0) for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = WORKLOAD[name][1](rng, books)
+            started = time.perf_counter()
+            try:
+                failed = send(method, path, body) >= 500
+            except (OSError, http.client.HTTPException):
+                failed = True
+            latencies, errors = local[name]
+            latencies.append(time.perf_counter() - started)
+            local[name] = (latencies, errors + failed)
+        with lock:
+            for name, (latencies, errors) in local.items():
+                samples[name][0].extend(latencies)
+                samples[name] = (samples[name][0], samples[name][1] + errors)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return _summarize(samples, time.perf_counter() - started)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn_server(db_path: str, port: int):
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.loadtest", "serve", "--db", db_path, "--port", str(port)],
+        cwd=repo_root,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited with status {server.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("server did not start within 60s")
+
+
+def run(args) -> dict:
+    """Seed the catalog, drive the workload against the chosen target and return the results document."""
+    from app import app
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"library-loadtest-{args.books}.db")
+    seed_catalog(app, db_path, args.books)
+
+    if args.target == "server":
+        port = _free_port()
+        server = _spawn_server(db_path, port)
+        try:
+            endpoints = drive(lambda: _http_sender(port), args.books, args.threads, args.duration, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+    else:
+        endpoints = drive(lambda: _inprocess_sender(app), args.books, args.threads, args.duration, args.seed)
+
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "meta": {
+            "target": args.target, "books": args.books, "threads": args.threads, "duration": args.duration,
+            "seed": args.seed, "config": os.environ["APP_CONFIG"], "python": sys.version.split()[0],
+            "timestamp": int(time.time()),
+        },
+        "throughput_rps": round(total / args.duration, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    List the endpoints that regressed between two result documents.
+
+    Args:
+        baseline (dict): Results of the reference run.
+        current (dict): Results of the run being checked.
+        threshold (float): Allowed relative change, e.g. 0.1 for 10%.
+
+    Returns:
+        list: Human-readable descriptions of each regression.
+    """
+    regressions = []
+    for name, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(name)
+        if after is None or not before["requests"]:
+            continue
+        if before["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} ms -> {after['p95_ms']:.2f} ms")
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} req/s"
+            )
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def _print_table(results: dict):
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<16} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    print(f"total throughput {results['throughput_rps']:.1f} req/s")
+
+
+def serve(args):
+    """Serve the API on a threaded development server against the benchmark database."""
+    from werkzeug.serving import run_simple
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access log
+    _use_database(app, args.db)
+    run_simple("127.0.0.1", args.port, app, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed a catalog and drive the workload")
+    run_parser.add_argument("--books", type=int, default=10000, help="Catalog size, e.g. 10000, 100000, 1000000")
+    run_parser.add_argument("--target", choices=("inprocess", "server"), default="inprocess")
+    run_parser.add_argument("--threads", type=int, default=8)
+    run_parser.add_argument("--duration", type=float, default=10.0)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--db", help="Catalog database file (default: one per size in the temp dir)")
+    run_parser.add_argument("--output", help="Write the results as JSON to this file")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    serve_parser = commands.add_parser("serve", help=argparse.SUPPRESS)
+    serve_parser.add_argument("--db", required=True)
+    serve_parser.add_argument("--port", type=int, required=True)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "run":
+        results = run(args)
+        _print_table(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print("no regressions")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
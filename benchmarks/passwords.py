@@ -0,0 +1,57 @@
+"""
+Measure password verifications (logins) per second for a hashing configuration.
+
+Usage:
+    python -m benchmarks.passwords [--config production] [--seconds 3]
+
+Reports single-thread logins/sec (per core), then the aggregate rate through
+the app's bounded hasher pool with PASSWORD_HASH_WORKERS threads.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import DevelopmentConfig, ProductionConfig, TestingConfig
+from utils.passwords import create_password_hasher
+
+CONFIGS = {"development": DevelopmentConfig, "testing": TestingConfig, "production": ProductionConfig}
+
+
+def _rate(check, seconds: float, threads: int = 1) -> float:
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            check()
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as clients:
+        total = sum(clients.map(lambda _: loop(), range(threads)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", choices=CONFIGS, default="production")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    config = {key: getattr(CONFIGS[args.config], key) for key in dir(CONFIGS[args.config]) if key.isupper()}
+    hasher = create_password_hasher(config)
+    encoded = hasher.hash("benchmark-password")
+    workers = config["PASSWORD_HASH_WORKERS"]
+    print(f"parameters      {encoded.rsplit('$', 2)[0]}")
+
+    per_core = _rate(lambda: hasher.verify("benchmark-password", encoded), args.seconds)
+    print(f"per core        {per_core:8.1f} logins/s  {1000 / per_core:7.1f} ms/login")
+
+    # More clients than workers, as in a login burst; the pool caps the cores used
+    pooled = _rate(lambda: hasher.check("benchmark-password", encoded), args.seconds, threads=workers * 2)
+    print(f"pool of {workers:<3}     {pooled:8.1f} logins/s  {pooled / workers:7.1f} logins/s per worker")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
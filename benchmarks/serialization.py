@@ -0,0 +1,130 @@
+"""
+Compare the ways GET /books can turn a page of rows into a JSON body, and time GET /books/export.
+
+Usage:
+    python -m benchmarks.serialization [--books 10000] [--per-page 10,50,100] [--repeat 200]
+
+Each variant renders the same page, taken from the middle of a throwaway
+catalog of `--books` books, at each page size GET /books accepts (up to
+MAX_PER_PAGE), and reports microseconds per page. The export formats then
+stream the whole catalog and report rows per second.
+"""
+import argparse
+import os
+import tempfile
+import time
+from flask import jsonify
+from app_factory import create_app
+from models.book import build_book_filters, create_books, iter_books, search_books_page
+from utils import serialization
+from utils.export import export_chunks
+from utils.serialization import book_to_dict, dumps
+
+
+def _dict_rows(rows):
+    # The per-row dict construction GET /books used before the Book type
+    return [
+        {
+            'id': row[0],
+            'title': row[1],
+            'author': row[2],
+            'isbn': row[3],
+            'published_year': row[4],
+            'genre': row[5],
+            'created_at': row[6],
+        }
+        for row in rows
+    ]
+
+
+def _time(render, repeat: int) -> float:
+    render()  # Warm the page cache
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(books: int, page_sizes: list, repeat: int):
+    """
+    Seed a temporary database with `books` books and time each serializer and export format.
+
+    Args:
+        books (int): Books in the catalog.
+        page_sizes (list): Page sizes to render; sizes above MAX_PER_PAGE are skipped.
+        repeat (int): Timed renders per page variant.
+
+    Returns:
+        tuple: Microseconds per page by page size and variant name, and rows per second by export format.
+    """
+    with tempfile.TemporaryDirectory() as db_dir:
+        app = create_app("testing", {"DATABASE_URI": f"sqlite:///{os.path.join(db_dir, 'bench.db')}"})
+        with app.test_request_context():
+            create_books([
+                (f"Book {i:06d}", f"Author {i % 97}", f"isbn-{i:06d}", 1900 + i % 120, "Fiction")
+                for i in range(books)
+            ])
+            where, params, match = build_book_filters()
+            offset = books // 2
+
+            pages = {}
+            for size in page_sizes:
+                if size > app.config["MAX_PER_PAGE"]:
+                    continue
+
+                def page(size=size):
+                    return search_books_page(where, params, size, offset)
+
+                variants = {
+                    "dict + jsonify": lambda page=page: jsonify({"items": _dict_rows(page())}).get_data(),
+                    "Book + json": lambda page=page: _without_orjson(
+                        lambda: dumps({"items": [book_to_dict(b) for b in page()]})
+                    ),
+                    "SQLite json_object": lambda size=size: search_books_page(
+                        where, params, size, offset, as_json=True
+                    ).encode(),
+                }
+                if serialization.orjson is not None:
+                    variants["Book + orjson"] = lambda page=page: dumps({"items": [book_to_dict(b) for b in page()]})
+                pages[size] = {name: _time(render, repeat) * 1e6 for name, render in variants.items()}
+
+            exports = {}
+            chunk_size = app.config["EXPORT_CHUNK_SIZE"]
+            for name, export_format, gzip in (("ndjson", "ndjson", False), ("csv", "csv", False),
+                                              ("ndjson + gzip", "ndjson", True)):
+                def export(export_format=export_format, gzip=gzip):
+                    for _ in export_chunks(iter_books(where, params, match, chunk_size), export_format, gzip):
+                        pass
+
+                exports[name] = books / _time(export, max(1, repeat // 100))
+    return pages, exports
+
+
+def _without_orjson(render):
+    encoder, serialization.orjson = serialization.orjson, None
+    try:
+        return render()
+    finally:
+        serialization.orjson = encoder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--per-page", default="10,50,100", help="Comma-separated page sizes")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages, exports = run(args.books, [int(size) for size in args.per_page.split(",")], args.repeat)
+    for size, results in pages.items():
+        print(f"per_page={size}")
+        baseline = results["dict + jsonify"]
+        for name, us in results.items():
+            print(f"  {name:<20} {us:8.0f} us/page {baseline / us:6.2f}x")
+    print(f"GET /books/export ({args.books} books)")
+    for name, rows_per_second in exports.items():
+        print(f"  {name:<20} {rows_per_second:10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure worker cold start: importing app.py and serving the first request.
+
+Usage:
+    python -m benchmarks.startup [--config development] [--runs 5]
+
+Each run is a fresh interpreter, as a newly forked worker would be, in a
+scratch directory so the configured database file is created there. The
+first boot migrates a new database (and seeds the test user where the
+config does); the following runs boot against the current schema and
+report the median.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_BOOT = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/books')
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_request": served - imported}))
+"""
+
+_MIGRATE = """
+from app_factory import create_app
+create_app({config!r}, {{"AUTO_MIGRATE": True}})
+"""
+
+
+def boot(config: str, cwd: str) -> dict:
+    """
+    Start a fresh interpreter that imports the app and serves one request.
+
+    Args:
+        config (str): The APP_CONFIG name.
+        cwd (str): The working directory, where relative database paths resolve.
+
+    Returns:
+        dict: Seconds spent importing app.py ("import") and serving GET /books ("first_request").
+    """
+    env = {**os.environ, "APP_CONFIG": config, "PYTHONPATH": REPO_ROOT, "SECRET_KEY": "benchmark"}
+    output = subprocess.run([sys.executable, "-c", _BOOT], cwd=cwd, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", choices=["development", "testing", "production"], default="development")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        if args.config == "production":  # Production never migrates at startup; do it as a deploy would
+            env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+            subprocess.run([sys.executable, "-c", _MIGRATE.format(config=args.config)], cwd=cwd, env=env,
+                           check=True, capture_output=True)
+        first = boot(args.config, cwd)
+        warm = [boot(args.config, cwd) for _ in range(args.runs)]
+
+    print(f"{'':16}{'import app':>12}{'first request':>15}")
+    print(f"{'first boot':16}{first['import'] * 1000:10.1f}ms{first['first_request'] * 1000:13.1f}ms")
+    print(f"{'warm (median)':16}"
+          f"{statistics.median(run['import'] for run in warm) * 1000:10.1f}ms"
+          f"{statistics.median(run['first_request'] for run in warm) * 1000:13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+import click
+from flask import current_app
+from db.database import (
+    get_book_shard_layout, get_sqlite_profile, initialize_db, read_schema_version, rebuild_search_index,
+    record_book_shard_layout,
+)
+from db.migrations import LATEST_VERSION
+from models.book import compact_book_changes, move_books_to_shards
+from utils.bulk_import import import_books, open_import_file
+
+
+def register_commands(app):
+    """
+    Register the project's `flask` CLI commands on an application.
+
+    Args:
+        app (Flask): The application to extend.
+    """
+
+    @app.cli.command("migrate")
+    @click.option("--check", is_flag=True, help="Only report pending migrations; exit with status 1 if any.")
+    def migrate_command(check):
+        """Apply pending schema migrations (run once per deploy, before starting workers)."""
+        version = read_schema_version()
+        if version >= LATEST_VERSION:
+            click.echo(f"Schema is up to date (version {version}).")
+            return
+        if check:
+            click.echo(f"Schema is at version {version}; migrations up to {LATEST_VERSION} are pending.")
+            raise SystemExit(1)
+        applied = initialize_db()
+        click.echo(f"Applied migrations {', '.join(map(str, applied)) or 'none'} (schema version {LATEST_VERSION}).")
+
+    @app.cli.command("sqlite-profile")
+    def sqlite_profile_command():
+        """Print the configured and effective value of each SQLITE_PRAGMAS setting."""
+        for name, values in get_sqlite_profile().items():
+            click.echo(f"{name}: configured {values['configured']!r}, effective {values['effective']!r}")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """Create missing full-text search tables and rebuild them from books."""
+        rebuild_search_index()
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command("shard-books")
+    @click.argument("shards", type=click.IntRange(min=1))
+    def shard_books_command(shards):
+        """Move the main database's books into SHARDS shard files and record the layout.
+
+        Run it with the current BOOK_SHARDS (e.g. `BOOK_SHARDS=0 flask --app app shard-books 4`), then
+        restart the workers with BOOK_SHARDS=SHARDS.
+        """
+        recorded = get_book_shard_layout()
+        if recorded and recorded != shards:
+            raise click.ClickException(f"Books are already stored in {recorded} shards; resharding is not supported.")
+        current_app.config["BOOK_SHARDS"] = shards  # This process only; the shard helpers read it from the config
+        initialize_db()  # Creates and migrates the shard files
+        moved = move_books_to_shards()
+        record_book_shard_layout(shards)
+        click.echo(f"Moved {moved} books into {shards} shards; start the workers with BOOK_SHARDS={shards}.")
+
+    @app.cli.command("compact-changes")
+    @click.option("--older-than", type=int, default=None,
+                  help="Seconds delete tombstones are kept (defaults to BOOK_CHANGES_RETENTION).")
+    def compact_changes_command(older_than):
+        """Remove old delete tombstones from the book change log."""
+        retention = current_app.config["BOOK_CHANGES_RETENTION"] if older_than is None else older_than
+        removed = compact_book_changes(int(time.time()) - retention)
+        click.echo(f"Removed {removed} tombstones older than {retention}s.")
+
+    @app.cli.command("import-books")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]),
+                  help="Input format; inferred from the file extension by default.")
+    @click.option("--batch-size", type=int, default=None,
+                  help="Rows per transaction (defaults to BULK_IMPORT_BATCH_SIZE).")
+    def import_books_command(path, file_format, batch_size):
+        """Bulk-load books from a CSV (with a header row) or NDJSON file."""
+        started = time.perf_counter()
+        handle, records = open_import_file(path, file_format)
+        with handle:
+            report = import_books(records, batch_size or current_app.config["BULK_IMPORT_BATCH_SIZE"])
+        elapsed = time.perf_counter() - started
+
+        for error in report["errors"]:
+            click.echo(f"row {error['row']}: {error['error']}", err=True)
+        rate = report["inserted"] / elapsed if elapsed else 0
+        click.echo(f"Imported {report['inserted']} books, {report['failed']} failed "
+                   f"in {elapsed:.2f}s ({rate:,.0f} rows/s).")
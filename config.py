@@ -1,17 +1,123 @@
+import os
+
+
 class Config:
     """Base config class with common settings."""
+    SECRET_KEY = os.environ.get("SECRET_KEY", "dev-only-insecure-secret-key")
+    # Session tokens: "database" (opaque tokens in the sessions table) or "signed" (stateless JWTs)
+    SESSION_BACKEND = "database"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # create_app only reads PRAGMA user_version; pending migrations run there only with AUTO_MIGRATE,
+    # otherwise apply them once per deploy with `flask --app app migrate` (workers refuse to start until then)
+    AUTO_MIGRATE = False
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")  # App logger level; INFO shows the startup SQLite profile
+    SEED_TEST_USER = False  # Create testuser/testpassword at startup (development and testing only)
+    MAX_PER_PAGE = 100  # Upper bound on GET /books page size
+    BATCH_GET_MAX_ITEMS = 500  # IDs or ISBNs accepted by one POST /books/batch-get
+    BOOK_CHANGES_MAX_LIMIT = 1000  # Upper bound on GET /books/changes page size
+    BOOK_CHANGES_RETENTION = 7 * 24 * 3600  # Seconds `flask --app app compact-changes` keeps delete tombstones
+    # Book shards: 0 keeps books in the main database; N > 0 spreads new books over N files next to it
+    # (<name>.books-0.db ...), placed by ISBN hash, with lists, counts and facets gathered from all of them
+    BOOK_SHARDS = int(os.environ.get("BOOK_SHARDS", 0))  # Must match the layout recorded by `flask shard-books`
+    BOOK_SHARD_WORKERS = 0  # Threads querying shards concurrently (0: one per shard)
+    DB_POOL_SIZE = 5  # Maximum open SQLite connections per database file
+    DB_POOL_TIMEOUT = 5.0  # Seconds to wait for a free connection when the pool is exhausted
+    DB_GROUP_COMMIT_WINDOW = 0.0  # Seconds the writer waits to commit concurrent writes together (0 disables)
+    DB_GROUP_COMMIT_MAX = 100  # Writes committed together at most
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED") == "1"  # Request/SQL instrumentation and GET /metrics
+    METRICS_SLOW_QUERY_SECONDS = 0.1  # Statements at least this slow are logged (when metrics are enabled)
+    METRICS_SERVER_TIMING = True  # Add a Server-Timing header to responses (when metrics are enabled)
+    # Request profiling; read once by create_app, so a disabled profiler registers no hooks at all
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED") == "1"
+    PROFILING_ENGINE = "stack"  # "stack" (sampling thread, collapsed stacks) or "cprofile" (pstats files)
+    PROFILING_SAMPLE_RATE = 0.01  # Fraction of requests profiled regardless of duration
+    PROFILING_SLOW_SECONDS = 0.5  # Requests at least this slow are always kept (None disables)
+    PROFILING_INTERVAL = 0.005  # Seconds between stack samples
+    PROFILING_DIR = os.environ.get("PROFILING_DIR", "profiles")  # Where profiles and their .json tags are written
+    PROFILING_MAX_FILES = 200  # Newest profiles kept in PROFILING_DIR
+    ASGI_WORKERS = 8  # Threads running views for the ASGI entry point (asgi.py); network I/O stays on the event loop
+    BULK_IMPORT_BATCH_SIZE = 5000  # Rows inserted per transaction by bulk imports
+    EXPORT_CHUNK_SIZE = 1000  # Rows fetched and encoded per chunk by GET /books/export
+    CATALOG_VERSION_TTL = 1.0  # Seconds a process trusts its catalog version before re-reading it
+    RESPONSE_CACHE_SIZE = 1024  # Cached GET /books and GET /book/<id> responses (0 disables the cache)
+    RESPONSE_CACHE_MAX_BODY = 256 * 1024  # Larger response bodies are not cached
+    # Expired-session cleanup: "background", "amortized" or "lazy" (see utils.session_expiry)
+    SESSION_CLEANUP_STRATEGY = "background"
+    SESSION_CLEANUP_INTERVAL = 300  # Seconds between background sweeps
+    SESSION_CLEANUP_EVERY_N_REQUESTS = 100  # Write requests between amortized sweeps
+    BOOK_CACHE_SIZE = 10000  # Books kept by the get_book read-through cache (0 disables the cache)
+    # Seconds a cached book is trusted; local copies are also dropped whenever the catalog version moves,
+    # so this only bounds shared-tier staleness from writes that bypass the models (raw SQL)
+    BOOK_CACHE_TTL = 300
+    BOOK_CACHE_NEGATIVE_TTL = 30  # Seconds an unknown book id is remembered as missing
+    BOOK_CACHE_SHARED_PATH = os.environ.get("BOOK_CACHE_SHARED_PATH")  # SQLite file shared by all workers on a host
+    BOOK_CACHE_LOCAL_TTL = 5  # Seconds a worker keeps its own copy of a shared entry
+    SESSION_CACHE_SIZE = 10000  # Validated tokens kept in memory (0 disables the cache)
+    SESSION_CACHE_TTL = 60  # Seconds a validated token is trusted without re-checking the database
+    # Password hashing: "scrypt" or "pbkdf2_sha256". Stored hashes using other settings are upgraded at login.
+    PASSWORD_HASH_ALGORITHM = "scrypt"
+    PASSWORD_SCRYPT_N = 2 ** 14  # scrypt cost; 16 MB and roughly 50 ms per hash
+    PASSWORD_SCRYPT_R = 8
+    PASSWORD_SCRYPT_P = 1
+    PASSWORD_PBKDF2_ITERATIONS = 600000
+    PASSWORD_HASH_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Leaves the other cores to book reads
+    PASSWORD_HASH_MAX_PENDING = 64  # Logins running or queued for hashing; more are answered with 503
+    PASSWORD_HASH_TIMEOUT = 2.0  # Seconds a login may spend hashing, queueing included, before a 503
+    # SQLite tuning profile: PRAGMA name/value pairs applied, in order, to each new connection.
+    # busy_timeout comes first so that switching journal_mode waits for locks instead of failing.
+    SQLITE_PRAGMAS = {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",  # Readers no longer queue behind writers
+        "synchronous": "NORMAL",  # Safe with WAL; fsync only at checkpoints
+        "cache_size": -16000,  # 16 MB page cache per connection
+        "temp_store": "MEMORY",
+    }
+    # Added for the read-only connections models read through; query_only rejects stray writes
+    SQLITE_READER_PRAGMAS = {
+        "query_only": 1,
+        "mmap_size": 268435456,  # 256 MB memory map for reads
+    }
 
 
 class DevelopmentConfig(Config):
     """Configuration for development environment."""
     DATABASE_URI = 'sqlite:///dev_database.db'  # Local SQLite database for development
+    AUTO_MIGRATE = True
+    SEED_TEST_USER = True
 
 class TestingConfig(Config):
     """Configuration for testing environment."""
     TESTING = True
-    DATABASE_URI = 'sqlite:///test_database.db'  # Separate SQLite database for testing
+    # Separate SQLite database for testing; the test suite points TEST_DATABASE_URI at a temporary file
+    DATABASE_URI = os.environ.get("TEST_DATABASE_URI", 'sqlite:///test_database.db')
+    AUTO_MIGRATE = True
+    SEED_TEST_USER = True
+    SESSION_CLEANUP_STRATEGY = "lazy"  # No sweeper threads for short-lived test apps
+    PASSWORD_SCRYPT_N = 2 ** 10  # Cheap hashes keep the suite fast
+    PASSWORD_PBKDF2_ITERATIONS = 1000
+    CATALOG_VERSION_TTL = 0  # Tests write through raw SQL too, so always re-read the version
+    SQLITE_PRAGMAS = {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",  # Durability does not matter for throwaway test data
+        "cache_size": -4000,
+        "temp_store": "MEMORY",
+    }
 
 class ProductionConfig(Config):
     """Configuration for production environment."""
     DATABASE_URI = 'sqlite:///prod_database.db'  # SQLite for production (can be a file or server-based)
+    SECRET_KEY = os.environ.get("SECRET_KEY")  # Must be provided; never fall back to the dev key
+    SQLITE_PRAGMAS = {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # 64 MB page cache per connection
+        "mmap_size": 268435456,  # Serve reads from a 256 MB memory map instead of read() calls
+        "temp_store": "MEMORY",
+    }
+    SQLITE_READER_PRAGMAS = {
+        "query_only": 1,
+        "mmap_size": 1073741824,  # Readers map up to 1 GB of the file
+    }
+    DB_GROUP_COMMIT_WINDOW = 0.002  # Batch writes arriving within 2 ms into one commit
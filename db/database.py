@@ -1,52 +1,627 @@
+import os
+import queue
 import sqlite3
-from flask import current_app
+import threading
+import time
+from concurrent.futures import Future
+from urllib.request import pathname2url
+from flask import current_app, g
+from db.shards import on_shard, shard_count
+from db.migrations import SEARCH_TABLES, create_search_tables, get_schema_version, migrate, rebuild_search_tables
+from utils.metrics import InstrumentedConnection, get_metrics, timed
+
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections to a single database file.
+
+    Connections are created lazily up to `size`, configured once when they are
+    opened, and handed back out to later requests instead of being closed.
+    """
+
+    def __init__(self, path: str, size: int, timeout: float, pragmas: dict = None, read_only: bool = False,
+                 metrics=None):
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+            size (int): Maximum number of open connections.
+            timeout (float): Seconds to wait for a free connection once the pool is exhausted.
+            pragmas (dict, optional): PRAGMA name/value pairs applied to each new connection.
+            read_only (bool, optional): Open connections with a mode=ro URI.
+            metrics (MetricsRegistry, optional): Records every statement run on the pool's connections.
+        """
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.read_only = read_only
+        self.metrics = metrics
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {"hits": 0, "creates": 0, "waits": 0, "wait_time": 0.0, "discarded": 0}
+
+    def _connect(self):
+        """Open and configure a new connection."""
+        factory = sqlite3.Connection if self.metrics is None else InstrumentedConnection
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=factory)
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def acquire(self):
+        """
+        Check a connection out of the pool.
+
+        Returns:
+            sqlite3.Connection: An idle connection, or a new one if the pool is not full.
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within `timeout` seconds.
+        """
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._open < self.size
+            if create:
+                self._open += 1
+                self._stats["creates"] += 1
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"Connection pool exhausted after waiting {self.timeout}s")
+        finally:
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += time.perf_counter() - started
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool, rolling back anything left uncommitted.
+
+        Connections that were closed by their user are dropped from the pool.
+
+        Args:
+            conn (sqlite3.Connection): A connection obtained from acquire().
+        """
+        try:
+            conn.rollback()
+        except sqlite3.ProgrammingError:
+            with self._lock:
+                self._open -= 1
+                self._stats["discarded"] += 1
+            return
+        self._idle.put(conn)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            return dict(self._stats, open=self._open, idle=self._idle.qsize(), size=self.size)
+
+
+class SerializedWriter:
+    """
+    The single writer of a database file, with optional group commit.
+
+    Write jobs are callables taking a connection; they are queued and run one
+    at a time on a dedicated thread, so request threads never compete for
+    SQLite's write lock. With a group-commit window, jobs arriving within
+    `window` seconds of the first are run in the same transaction, each in its
+    own savepoint so a failing job is rolled back alone, and committed
+    together: the number of commits, not of requests, bounds write throughput.
+
+    The thread and its connection are closed after `idle_timeout` seconds
+    without work and reopened on the next write.
+    """
+
+    def __init__(self, path: str, pragmas: dict = None, window: float = 0.0, max_batch: int = 100,
+                 idle_timeout: float = 30.0, metrics=None):
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+            pragmas (dict, optional): PRAGMA name/value pairs applied to the writer connection.
+            window (float, optional): Seconds to wait for more jobs to commit together; 0 commits each job alone.
+            max_batch (int, optional): Maximum number of jobs committed together.
+            idle_timeout (float, optional): Seconds without work after which the writer thread exits.
+            metrics (MetricsRegistry, optional): Records every statement run by the writer.
+        """
+        self.path = path
+        self.pragmas = pragmas or {}
+        self.metrics = metrics
+        self.window = window
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"jobs": 0, "commits": 0, "failed": 0, "max_batch": 0}
+
+    def submit(self, job):
+        """
+        Run a write job and wait until it is committed.
+
+        Args:
+            job (callable): Called as job(conn) on the writer connection; must not commit or roll back.
+
+        Returns:
+            The job's return value.
+
+        Raises:
+            Exception: Whatever the job raised, or the error that prevented its commit.
+        """
+        future = Future()
+        with self._lock:
+            self._jobs.put((job, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"sqlite-writer:{self.path}", daemon=True)
+                self._thread.start()
+        return future.result()
+
+    def _connect(self):
+        # Autocommit mode: transactions are managed explicitly by _commit
+        factory = sqlite3.Connection if self.metrics is None else InstrumentedConnection
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, factory=factory)
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.row_factory = sqlite3.Row
+        try:
+            apply_pragmas(conn, self.pragmas)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            with self._lock:
+                self._thread = None
+                pending = []
+                while not self._jobs.empty():
+                    pending.append(self._jobs.get_nowait())
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        try:
+            while True:
+                try:
+                    batch = [self._jobs.get(timeout=self.idle_timeout)]
+                except queue.Empty:
+                    with self._lock:
+                        if self._jobs.empty():
+                            self._thread = None
+                            return
+                    continue
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._jobs.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    results.append((future, job(conn), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, None, e) for _, future in batch]
+
+        with self._lock:
+            self._stats["jobs"] += len(batch)
+            self._stats["commits"] += 1
+            self._stats["failed"] += sum(1 for _, _, error in results if error is not None)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """Return the job and commit counters."""
+        with self._lock:
+            return dict(self._stats)
+
+
+def apply_pragmas(conn, pragmas: dict):
+    """
+    Apply PRAGMA settings to a connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection to configure.
+        pragmas (dict): PRAGMA name/value pairs, applied in order.
+    """
+    for name, value in pragmas.items():
+        if not name.isidentifier():
+            raise ValueError(f"Invalid PRAGMA name: {name!r}")
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+# Values SQLite reports back for the symbolic settings, used to compare a profile with reality
+_PRAGMA_SYMBOLS = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+}
+
+
+def _normalize_pragma(name: str, value):
+    """Normalize a PRAGMA value so configured and reported values compare equal."""
+    if isinstance(value, str):
+        symbols = _PRAGMA_SYMBOLS.get(name, {})
+        if value.upper() in symbols:
+            return symbols[value.upper()]
+        return int(value) if value.lstrip("-").isdigit() else value.lower()
+    return value
+
+
+def get_sqlite_profile() -> dict:
+    """
+    Report the configured SQLite profile next to the values a connection actually uses.
+
+    The values are read from a pooled read-only connection, which applies
+    the same per-connection PRAGMAs without ever writing: unlike a read-write
+    connection it does not switch journal_mode, which would need an exclusive
+    lock on a database that is not in WAL mode yet. journal_mode is reported
+    as stored in the file.
+
+    Returns:
+        dict: For each configured PRAGMA, a dict with the "configured" and "effective" values.
+    """
+    conn = get_reader()
+    profile = {}
+    for name, value in current_app.config["SQLITE_PRAGMAS"].items():
+        effective = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        profile[name] = {"configured": value, "effective": effective}
+    return profile
+
+
+def log_sqlite_profile():
+    """
+    Log the effective SQLite profile, warning about settings SQLite did not accept.
+
+    The profile itself is logged at INFO level; create_app sets the app logger to
+    LOG_LEVEL so that it is shown by default.
+    """
+    profile = get_sqlite_profile()
+    current_app.logger.info(
+        "SQLite profile for %s: %s", get_database_path(),
+        ", ".join(f"{name}={values['effective']}" for name, values in profile.items())
+    )
+    for name, values in profile.items():
+        if _normalize_pragma(name, values["configured"]) != _normalize_pragma(name, values["effective"]):
+            current_app.logger.warning(
+                "SQLite PRAGMA %s is %r instead of the configured %r",
+                name, values["effective"], values["configured"]
+            )
+
+
+def get_database_path() -> str:
+    """Extract the file path from the configured SQLite URI, or return the book shard pinned by use_shard."""
+    return g.get("_db_path") or current_app.config["DATABASE_URI"].split("///")[1]
+
+
+def get_pool() -> ConnectionPool:
+    """Return the connection pool for the current app's database, creating it on first use."""
+    path = get_database_path()
+    pools = current_app.extensions.setdefault("sqlite_pools", {})
+    pool = pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(path)
+            if pool is None:
+                config = current_app.config
+                pool = pools[path] = ConnectionPool(
+                    path, config["DB_POOL_SIZE"], config["DB_POOL_TIMEOUT"], config["SQLITE_PRAGMAS"],
+                    metrics=get_metrics()
+                )
+    return pool
+
+
+def get_pool_stats() -> dict:
+    """Return the hit, create and wait counters of the current app's connection pool."""
+    return get_pool().stats()
+
+
+def get_reader_pool() -> ConnectionPool:
+    """Return the read-only connection pool for the current app's database, creating it on first use."""
+    path = get_database_path()
+    pools = current_app.extensions.setdefault("sqlite_reader_pools", {})
+    pool = pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(path)
+            if pool is None:
+                config = current_app.config
+                # journal_mode is a property of the file, set by writers; read-only connections cannot change it
+                pragmas = {name: value for name, value in config["SQLITE_PRAGMAS"].items() if name != "journal_mode"}
+                pragmas.update(config["SQLITE_READER_PRAGMAS"])
+                pool = pools[path] = ConnectionPool(
+                    path, config["DB_POOL_SIZE"], config["DB_POOL_TIMEOUT"], pragmas, read_only=True,
+                    metrics=get_metrics()
+                )
+    return pool
+
+
+def get_writer() -> SerializedWriter:
+    """Return the serialized writer for the current app's database, creating it on first use."""
+    path = get_database_path()
+    writers = current_app.extensions.setdefault("sqlite_writers", {})
+    writer = writers.get(path)
+    if writer is None:
+        with _pools_lock:
+            writer = writers.get(path)
+            if writer is None:
+                config = current_app.config
+                writer = writers[path] = SerializedWriter(
+                    path, config["SQLITE_PRAGMAS"], config["DB_GROUP_COMMIT_WINDOW"], config["DB_GROUP_COMMIT_MAX"],
+                    metrics=get_metrics()
+                )
+    return writer
+
+
+def _context_connection(key: str, get_pool_for_path) -> sqlite3.Connection:
+    # One connection per database file and app context, so a context can use several shards
+    connections = g.setdefault(key, {})
+    path = get_database_path()
+    entry = connections.get(path)
+    if entry is None:
+        with timed("conn"):
+            pool = get_pool_for_path()
+            entry = connections[path] = (pool, pool.acquire())
+    return entry[1]
+
 
 def get_db_connection():
-    """Establish and return a database connection."""
-    database_uri = current_app.config["DATABASE_URI"]
-    conn = sqlite3.connect(database_uri.split("///")[1])  # Extract file path from SQLite URI
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Return the read-write database connection for the current app context.
+
+    The first call in a context checks a connection out of the pool; later
+    calls reuse it, and close_db_connection returns it at teardown. Models
+    read through get_reader and write through run_write instead; this
+    connection serves migrations, maintenance and ad-hoc SQL.
+    """
+    return _context_connection("_db_conns", get_pool)
+
+
+def get_reader():
+    """
+    Return the read-only database connection for the current app context.
+
+    Readers open the file with a mode=ro URI and PRAGMA query_only, plus the
+    SQLITE_READER_PRAGMAS (e.g. a larger memory map). In WAL mode they read
+    the last committed snapshot and never wait for the write lock.
+    """
+    return _context_connection("_db_readers", get_reader_pool)
+
+
+def run_write(job):
+    """
+    Run a write on the current database's serialized writer and wait for its commit.
+
+    Args:
+        job (callable): Called as job(conn); it must not commit or roll back.
+
+    Returns:
+        The job's return value.
+    """
+    writer = get_writer()
+    with timed("write"):
+        return writer.submit(job)
+
+
+def get_writer_stats() -> dict:
+    """Return the job and commit counters of the current app's writer."""
+    return get_writer().stats()
+
+
+def close_db_connection(exception=None):
+    """Return the current app context's connections to their pools (registered as a teardown handler)."""
+    for key in ("_db_conns", "_db_readers"):
+        for pool, conn in g.pop(key, {}).values():
+            pool.release(conn)
 
 def initialize_db():
-    """Initialize the database with required tables."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create Users table for authentication
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL
+    """
+    Bring the database schema up to date by applying any pending migrations.
+
+    With BOOK_SHARDS set every shard file is migrated too; each carries the
+    full schema.
+
+    Returns:
+        list: The migration versions that were applied to any file.
+    """
+    applied = migrate(get_db_connection())
+    _search_tables_cache().pop(get_database_path(), None)
+    for index in range(shard_count()):
+        applied = sorted(set(applied) | set(on_shard(index, initialize_db)))
+    # A new catalog starts out sharded; existing books must be moved with `flask shard-books`
+    if shard_count() and not get_book_shard_layout() and not _main_has_books():
+        record_book_shard_layout(shard_count())
+    return applied
+
+
+def _main_has_books() -> bool:
+    return get_reader().execute("SELECT EXISTS (SELECT 1 FROM books)").fetchone()[0] == 1
+
+
+def get_book_shard_layout() -> int:
+    """
+    Return the number of book shards recorded in the main database.
+
+    Returns:
+        int: The shard count the books were laid out for, 0 when they live in the main database.
+    """
+    return get_reader().execute("SELECT shards FROM book_shard_layout WHERE id = 1").fetchone()[0]
+
+
+def record_book_shard_layout(shards: int):
+    """
+    Record the number of book shards in the main database.
+
+    Args:
+        shards (int): The shard count the books are now laid out for.
+    """
+    run_write(lambda conn: conn.execute("UPDATE book_shard_layout SET shards = ? WHERE id = 1", (shards,)))
+
+
+def check_book_shard_layout():
+    """
+    Refuse to serve books from a layout other than the one they are stored in.
+
+    Ids are routed with (id - 1) % BOOK_SHARDS, so a different shard count,
+    or books left in the main database while sharded, would hide books and
+    let their ISBNs be reused.
+
+    Raises:
+        RuntimeError: If BOOK_SHARDS differs from the recorded layout, or the
+                      main database still holds books while BOOK_SHARDS is set.
+    """
+    configured = current_app.config["BOOK_SHARDS"]
+    recorded = get_book_shard_layout()
+    if recorded and configured != recorded:
+        raise RuntimeError(
+            f"Books are stored in {recorded} shards but BOOK_SHARDS is {configured}; "
+            "changing the number of shards is not supported"
         )
-    """)
-    
-    # Create Sessions table for tokens
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            token TEXT NOT NULL UNIQUE,
-            created_at INTEGER NOT NULL,  -- Track when the session was created
-            FOREIGN KEY (user_id) REFERENCES users (id)
+    if configured and (not recorded or _main_has_books()):
+        raise RuntimeError(
+            f"BOOK_SHARDS is {configured} but the books have not been moved out of the main database; run "
+            f"`BOOK_SHARDS={recorded} flask --app app shard-books {configured}` first"
         )
-    """)
-
-    # Create book table for Books
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS books (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        author TEXT NOT NULL,
-        isbn TEXT NOT NULL UNIQUE,
-        published_year INTEGER,
-        genre TEXT,
-        created_at INTEGER
-    )
 
-    """)
 
-    
-    conn.commit()
-    conn.close()
+def read_schema_version() -> int:
+    """
+    Return the database's schema version without writing to it.
+
+    Reads PRAGMA user_version through the read-only pool, so checking a
+    current schema at startup takes no lock and leaves a reader warm for the
+    first request.
+
+    Returns:
+        int: The applied schema version, 0 when the database file does not exist yet.
+             With shards, the lowest version of any file.
+    """
+    if not os.path.exists(get_database_path()):
+        return 0
+    version = get_schema_version(get_reader())
+    for index in range(shard_count()):
+        version = min(version, on_shard(index, read_schema_version))
+    return version
+
+
+def rebuild_search_index():
+    """Create any missing search tables and rebuild them from books, e.g. after a bulk load."""
+    def rebuild(conn):
+        cursor = conn.cursor()
+        create_search_tables(cursor)
+        rebuild_search_tables(cursor)
+        cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")  # Search results may change
+
+    run_write(rebuild)
+    _search_tables_cache().pop(get_database_path(), None)
+    forget_catalog_version()
+    for index in range(shard_count()):
+        on_shard(index, rebuild_search_index)
+
+
+def _search_tables_cache() -> dict:
+    return current_app.extensions.setdefault("search_tables", {})
+
+
+def get_search_tables() -> frozenset:
+    """
+    Return the names of the search tables available in the current database.
+
+    The lookup is cached per database file, so callers can check it on every request.
+    """
+    cache = _search_tables_cache()
+    path = get_database_path()
+    tables = cache.get(path)
+    if tables is None:
+        placeholders = ", ".join("?" for _ in SEARCH_TABLES)
+        rows = get_reader().execute(
+            f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+            list(SEARCH_TABLES)
+        ).fetchall()
+        tables = cache[path] = frozenset(row[0] for row in rows)
+    return tables
+
+
+def get_catalog_version() -> int:
+    """
+    Return the catalog version, a counter that triggers bump on every write to books.
+
+    The value is remembered per process for CATALOG_VERSION_TTL seconds, so
+    cached reads need not touch SQLite at all. Writers in this process call
+    forget_catalog_version so their change shows immediately; writes from
+    other processes are noticed once the TTL lapses.
+
+    Returns:
+        int: The current catalog version.
+    """
+    shards = shard_count()
+    if shards:
+        # Every shard's version only grows, so their sum changes whenever any shard is written
+        return sum(on_shard(index, get_catalog_version) for index in range(shards))
+
+    versions = current_app.extensions.setdefault("catalog_versions", {})
+    path = get_database_path()
+    cached = versions.get(path)
+    now = time.monotonic()
+    if cached is not None and now - cached[1] < current_app.config["CATALOG_VERSION_TTL"]:
+        return cached[0]
+
+    conn = get_reader()
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+    version = cursor.fetchone()[0]
+    versions[path] = (version, now)
+    return version
+
+
+def forget_catalog_version():
+    """Drop the remembered catalog version after a write from this process."""
+    current_app.extensions.get("catalog_versions", {}).pop(get_database_path(), None)
@@ -0,0 +1,339 @@
+import sqlite3
+
+# Full-text indexes over books: word/prefix search for q= (ranked with bm25),
+# and trigram for substring filters that would otherwise be leading-wildcard LIKEs.
+SEARCH_TABLES = {
+    "books_fts": "tokenize='unicode61 remove_diacritics 2', prefix='2 3'",
+    "books_trigram": "tokenize='trigram'",
+}
+
+# Facets counted per value in book_facets, as SQL expressions over a books
+# row (format with row="books", "new" or "old"). NULL values are not counted.
+FACET_EXPRESSIONS = {
+    "genre": "{row}.genre",
+    "author": "{row}.author",
+    "published_year": "{row}.published_year",
+    "decade": "{row}.published_year / 10 * 10",
+}
+
+
+def _create_base_tables(cursor):
+    """Create the users, sessions and books tables."""
+    # Create Users table for authentication
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        )
+    """)
+
+    # Create Sessions table for tokens
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            token TEXT NOT NULL UNIQUE,
+            created_at INTEGER NOT NULL,  -- Track when the session was created
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Create book table for Books
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT NOT NULL UNIQUE,
+            published_year INTEGER,
+            genre TEXT,
+            created_at INTEGER
+        )
+    """)
+
+
+def _create_lookup_indexes(cursor):
+    """Index session expiry/replacement and the GET /books sort orders."""
+    # Expiry sweeps delete by age and logins replace a user's sessions
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)")
+
+    # One (column, id) index per sort order, so pages and keyset cursors seek
+    # instead of sorting; idx_books_published_year_id also serves the
+    # published_year filter and isbn uses its UNIQUE index.
+    for column in ("title", "author", "published_year", "created_at"):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_books_{column}_id ON books ({column}, id)")
+
+
+def create_search_tables(cursor):
+    """
+    Create the FTS5 tables over books and the triggers keeping them in sync.
+
+    Tables this SQLite build cannot create (no FTS5 or no trigram tokenizer)
+    are skipped, and searches fall back to LIKE.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+
+    for table, options in SEARCH_TABLES.items():
+        if table not in existing:
+            try:
+                cursor.execute(f"""
+                    CREATE VIRTUAL TABLE {table} USING fts5(
+                        title, author, genre, content='books', content_rowid='id', {options}
+                    )
+                """)
+            except sqlite3.OperationalError:
+                continue
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON books BEGIN
+                INSERT INTO {table} (rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON books BEGIN
+                INSERT INTO {table} ({table}, rowid, title, author, genre)
+                VALUES ('delete', old.id, old.title, old.author, old.genre);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF title, author, genre ON books BEGIN
+                INSERT INTO {table} ({table}, rowid, title, author, genre)
+                VALUES ('delete', old.id, old.title, old.author, old.genre);
+                INSERT INTO {table} (rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+            END
+        """)
+
+
+def rebuild_search_tables(cursor):
+    """Rebuild every existing search table from the contents of books."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+    for table in SEARCH_TABLES:
+        if table in existing:
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+
+
+def _create_search_index(cursor):
+    """Create the full-text search tables and index the books already stored."""
+    create_search_tables(cursor)
+    rebuild_search_tables(cursor)
+
+
+def _create_catalog_version(cursor):
+    """Create a catalog version counter bumped by every write to books."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    for event, name in (("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS catalog_version_{name} AFTER {event} ON books BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        """)
+
+
+def _facet_changes(row: str, delta: int) -> str:
+    """Return trigger statements adding `delta` to the facet counts of a books row."""
+    statements = []
+    for facet, expression in FACET_EXPRESSIONS.items():
+        value = expression.format(row=row)
+        if delta > 0:
+            statements.append(f"""
+                INSERT INTO book_facets (facet, value, count) SELECT '{facet}', {value}, 1 WHERE {value} IS NOT NULL
+                ON CONFLICT (facet, value) DO UPDATE SET count = count + 1;""")
+        else:
+            statements.append(f"""
+                UPDATE book_facets SET count = count - 1 WHERE facet = '{facet}' AND value = {value};
+                DELETE FROM book_facets WHERE facet = '{facet}' AND value = {value} AND count <= 0;""")
+    return "".join(statements)
+
+
+def create_facet_triggers(cursor):
+    """Create the triggers keeping book_facets in step with inserts, updates and deletes on books."""
+    triggers = {
+        "ai": ("INSERT", _facet_changes("new", 1)),
+        "ad": ("DELETE", _facet_changes("old", -1)),
+        # Every facet is computed from these columns
+        "au": ("UPDATE OF genre, author, published_year", _facet_changes("old", -1) + _facet_changes("new", 1)),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS book_facets_{name} AFTER {event} ON books BEGIN{body}
+            END
+        """)
+
+
+def add_facet_counts(cursor, after_id: int = 0):
+    """
+    Add the books with an id above `after_id` to book_facets with one grouped insert per facet.
+
+    Used to backfill the table and by bulk inserts, which suspend the
+    per-row insert trigger while they run.
+    """
+    for facet, expression in FACET_EXPRESSIONS.items():
+        value = expression.format(row="books")
+        cursor.execute(f"""
+            INSERT INTO book_facets (facet, value, count)
+            SELECT '{facet}', {value}, COUNT(*) FROM books WHERE id > ? AND {value} IS NOT NULL GROUP BY 2
+            ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count
+        """, (after_id,))
+
+
+def _create_facet_counts(cursor):
+    """Create the book_facets summary table, fill it and keep it maintained by triggers."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_facets (
+            facet TEXT NOT NULL,
+            value NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (facet, value)
+        ) WITHOUT ROWID
+    """)
+    # Reads the most common values of a facet in order without sorting
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_facets_count ON book_facets (facet, count DESC, value)")
+    create_facet_triggers(cursor)
+    add_facet_counts(cursor)
+
+
+def create_change_triggers(cursor):
+    """
+    Create the triggers recording every write to books in book_changes.
+
+    INSERT OR REPLACE keeps one entry per book: each write moves the book's
+    entry to a new, higher version, and a delete leaves a tombstone.
+    """
+    now = "CAST(strftime('%s', 'now') AS INTEGER)"
+    triggers = {
+        "ai": ("INSERT", "new", 0),
+        "au": ("UPDATE", "new", 0),
+        "ad": ("DELETE", "old", 1),
+    }
+    for name, (event, row, deleted) in triggers.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS book_changes_{name} AFTER {event} ON books BEGIN
+                INSERT OR REPLACE INTO book_changes (book_id, deleted, changed_at) VALUES ({row}.id, {deleted}, {now});
+            END
+        """)
+
+
+def add_book_changes(cursor, after_id: int = 0):
+    """
+    Record the books with an id above `after_id` in book_changes, in id order.
+
+    Used to backfill the log and by bulk inserts, which suspend the per-row
+    insert trigger while they run.
+    """
+    cursor.execute("""
+        INSERT OR REPLACE INTO book_changes (book_id, deleted, changed_at)
+        SELECT id, 0, CAST(strftime('%s', 'now') AS INTEGER) FROM books WHERE id > ? ORDER BY id
+    """, (after_id,))
+
+
+def _create_change_log(cursor):
+    """Create the book_changes log, seed it with every stored book and keep it maintained by triggers."""
+    # AUTOINCREMENT: versions are never reused, even after the newest entry is compacted away
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL UNIQUE,
+            deleted INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    # Highest version of a tombstone removed by compaction; older `since` values cannot be served
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_changes_compacted (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO book_changes_compacted (id, version) VALUES (1, 0)")
+    # Finds the tombstones old enough to compact without scanning live entries
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_changes_tombstones ON book_changes (changed_at) WHERE deleted")
+    create_change_triggers(cursor)
+    add_book_changes(cursor)
+
+
+def _create_shard_layout(cursor):
+    """Record how many shard files hold the books; 0 means the main database's books table."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_shard_layout (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            shards INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO book_shard_layout (id, shards) VALUES (1, 0)")
+
+
+def _create_revoked_tokens(cursor):
+    """Create the table of logged-out signed tokens, kept until they expire."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti TEXT PRIMARY KEY,
+            expires_at INTEGER NOT NULL
+        )
+    """)
+    # Expiry sweeps delete by age
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens (expires_at)")
+
+
+# Ordered schema migrations as (version, description, function). The version
+# reached is stored in PRAGMA user_version; never edit or reorder a released
+# migration, append a new one instead.
+MIGRATIONS = [
+    (1, "Create users, sessions and books tables", _create_base_tables),
+    (2, "Index sessions and the GET /books sort orders", _create_lookup_indexes),
+    (3, "Create full-text search tables over books", _create_search_index),
+    (4, "Track a catalog version for HTTP caching", _create_catalog_version),
+    (5, "Maintain per-value facet counts of books", _create_facet_counts),
+    (6, "Log changes to books for incremental sync", _create_change_log),
+    (7, "Record the book shard layout", _create_shard_layout),
+    (8, "Record revoked signed session tokens", _create_revoked_tokens),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> list:
+    """
+    Apply every migration newer than the database's schema version.
+
+    Each migration runs in its own IMMEDIATE transaction together with the
+    user_version bump, so a failed migration leaves no trace and concurrent
+    workers never apply the same migration twice.
+
+    Args:
+        conn (sqlite3.Connection): A read-write connection.
+
+    Returns:
+        list: The versions that were applied.
+    """
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:  # Another worker got there first
+                conn.rollback()
+                continue
+            apply(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
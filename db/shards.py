@@ -0,0 +1,132 @@
+import heapq
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from flask import current_app, g
+
+
+def shard_count() -> int:
+    """
+    Return the number of book shards to fan out to, or 0 when books are not sharded.
+
+    Inside use_shard this is 0 too: code pinned to one shard reads and writes
+    that file exactly as it would the single database.
+    """
+    if g.get("_db_shard") is not None:
+        return 0
+    return current_app.config["BOOK_SHARDS"]
+
+
+def current_shard():
+    """Return (index, count) of the shard the current context is pinned to, or None."""
+    return g.get("_db_shard")
+
+
+def get_shard_path(index: int) -> str:
+    """
+    Return the file of one book shard, next to the main database.
+
+    Args:
+        index (int): The shard number, from 0 to BOOK_SHARDS - 1.
+
+    Returns:
+        str: The path, e.g. "prod_database.books-2.db" for "prod_database.db".
+    """
+    stem, extension = os.path.splitext(current_app.config["DATABASE_URI"].split("///")[1])
+    return f"{stem}.books-{index}{extension or '.db'}"
+
+
+def shard_for_id(book_id: int) -> int:
+    """
+    Return the shard holding a book id.
+
+    Sharded ids are allocated per shard in steps of BOOK_SHARDS (shard k hands
+    out k + 1, k + 1 + N, ...), so the id alone routes a lookup.
+    """
+    return (int(book_id) - 1) % current_app.config["BOOK_SHARDS"]
+
+
+def shard_for_isbn(isbn: str) -> int:
+    """Return the shard a new book with this ISBN is stored in, so each ISBN is unique within one file."""
+    return zlib.crc32(str(isbn).encode()) % current_app.config["BOOK_SHARDS"]
+
+
+@contextmanager
+def use_shard(index: int):
+    """
+    Pin the current app context to one shard file.
+
+    get_database_path, and with it the connection pools, the serialized
+    writer and the book cache, then resolve to the shard.
+
+    Args:
+        index (int): The shard number.
+    """
+    previous = g.get("_db_shard"), g.get("_db_path")
+    g._db_shard = (index, current_app.config["BOOK_SHARDS"])
+    g._db_path = get_shard_path(index)
+    try:
+        yield
+    finally:
+        g._db_shard, g._db_path = previous
+
+
+def on_shard(index: int, function, *args, **kwargs):
+    """Call function(*args, **kwargs) pinned to one shard and return its result."""
+    with use_shard(index):
+        return function(*args, **kwargs)
+
+
+def _shard_executor(app) -> ThreadPoolExecutor:
+    executor = app.extensions.get("shard_executor")
+    if executor is None:
+        executor = app.extensions.setdefault("shard_executor", ThreadPoolExecutor(
+            max_workers=app.config["BOOK_SHARD_WORKERS"] or app.config["BOOK_SHARDS"],
+            thread_name_prefix="shard-query",
+        ))
+    return executor
+
+
+def scatter(function, *args, shards=None, **kwargs) -> list:
+    """
+    Call a function on several shards concurrently and gather the results.
+
+    Each call runs on the shard executor in its own app context pinned to
+    one shard, so it gets that shard's connections and returns them when it
+    finishes. Exceptions are re-raised in the caller.
+
+    Args:
+        function (callable): Called as function(*args, **kwargs) on each shard.
+        shards (iterable, optional): Shard numbers to query. Defaults to all of them.
+
+    Returns:
+        list: The results, in the order of `shards`.
+    """
+    app = current_app._get_current_object()
+    shards = range(app.config["BOOK_SHARDS"]) if shards is None else list(shards)
+
+    def run(index):
+        with app.app_context():
+            return on_shard(index, function, *args, **kwargs)
+
+    futures = [_shard_executor(app).submit(run, index) for index in shards]
+    return [future.result() for future in futures]
+
+
+def merge_sorted(sequences, key, limit: int = None, offset: int = 0) -> list:
+    """
+    Merge per-shard results that are each sorted by `key` with a k-way heap merge.
+
+    Args:
+        sequences (iterable): Sorted sequences, one per shard.
+        key (callable): The sort key the shards ordered by.
+        limit (int, optional): Items to return; all by default.
+        offset (int, optional): Leading items of the merged order to skip.
+
+    Returns:
+        list: The merged items from `offset`, at most `limit` of them.
+    """
+    stop = None if limit is None else offset + limit
+    return list(islice(heapq.merge(*sequences, key=key), offset, stop))
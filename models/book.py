@@ -1,6 +1,127 @@
-from db.database import get_db_connection
+from flask import current_app
+from db.database import (
+    forget_catalog_version, get_catalog_version, get_database_path, get_reader, get_search_tables, run_write,
+)
+from db.migrations import (
+    FACET_EXPRESSIONS, add_book_changes, add_facet_counts, create_change_triggers, create_facet_triggers,
+    create_search_tables,
+)
+from db.shards import (
+    current_shard, merge_sorted, on_shard, scatter, shard_count, shard_for_id, shard_for_isbn,
+)
+from utils.cache import LRUCache, ReadThroughCache, SQLiteCache, TieredCache
+from utils.serialization import book_to_dict, dumps
+from collections import Counter
+from itertools import islice
+from typing import NamedTuple
+import heapq
+import re
+import sqlite3
 import time
 
+# Columns GET /books can be ordered by; each has a matching (column, id) index.
+SORTABLE_FIELDS = ("id", "title", "author", "published_year", "created_at")
+
+# Orders full-text matches by bm25 score, weighting title over author over genre.
+RELEVANCE = "relevance"
+_BM25 = "bm25(books_fts, 10.0, 5.0, 1.0)"
+
+# Batches at least this large are indexed for search in one statement after
+# the insert instead of row by row through the search triggers.
+_DEFERRED_INDEX_MIN_ROWS = 100
+
+# Values bound per IN (...) list; stays well under SQLite's host parameter limit.
+_IN_CHUNK_SIZE = 500
+
+class Book(NamedTuple):
+    """A row of the books table, in column order."""
+    id: int
+    title: str
+    author: str
+    isbn: str
+    published_year: int
+    genre: str
+    created_at: int
+
+def _book_row(cursor, row):
+    return Book._make(row)
+
+# Builds a book's JSON object inside SQLite, keyed like Book's fields.
+_BOOK_JSON = "json_object(" + ", ".join(f"'{field}', books.{field}" for field in Book._fields) + ")"
+
+def _book_cache():
+    """
+    Return the read-through cache used by get_book, or None when BOOK_CACHE_SIZE is 0.
+
+    Caches are kept per database file and tied to its catalog version: once
+    the version moves (after a write from any process, noticed within
+    CATALOG_VERSION_TTL), this process drops its local copies, so it never
+    serves a book older than the catalog version its responses are cached
+    under. With BOOK_CACHE_SHARED_PATH set, a SQLite-backed tier is shared by
+    every process on the host and survives the drop; its entries are
+    invalidated by the writing process and refill the local tier.
+    """
+    config = current_app.config
+    if not config["BOOK_CACHE_SIZE"]:
+        return None
+    caches = current_app.extensions.setdefault("book_caches", {})
+    path = get_database_path()
+    version = get_catalog_version()
+    entry = caches.get(path)
+    if entry is None:
+        backend = LRUCache(config["BOOK_CACHE_SIZE"])
+        if config["BOOK_CACHE_SHARED_PATH"]:
+            backend = TieredCache(backend, SQLiteCache(config["BOOK_CACHE_SHARED_PATH"]),
+                                  local_ttl=config["BOOK_CACHE_LOCAL_TTL"])
+        entry = caches.setdefault(path, [ReadThroughCache(
+            backend, ttl=config["BOOK_CACHE_TTL"], negative_ttl=config["BOOK_CACHE_NEGATIVE_TTL"]
+        ), version])
+    cache = entry[0]
+    if entry[1] != version:
+        entry[1] = version
+        if isinstance(cache.backend, TieredCache):
+            cache.backend.local.clear()
+        else:
+            cache.clear()  # Also keeps loads started under the old version from being stored
+    return cache
+
+def get_book_cache_stats() -> dict:
+    """
+    Return the hit, miss and coalesced-load counters of the get_book cache.
+
+    Returns:
+        dict: The cache counters, or an empty dict when the cache is disabled.
+    """
+    cache = _book_cache()
+    return cache.stats() if cache is not None else {}
+
+def _invalidate_books(book_ids):
+    cache = _book_cache()
+    if cache is not None:
+        cache.invalidate_many(book_ids)
+
+def _insert_book_sql() -> str:
+    """
+    Return the INSERT for a new book row.
+
+    On a shard the id is not left to AUTOINCREMENT but set to the shard's next
+    id in steps of BOOK_SHARDS (see db.shards.shard_for_id); sqlite_sequence
+    still records it, so ids are never reused after deletes.
+    """
+    shard = current_shard()
+    if shard is None:
+        return "INSERT INTO books (title, author, isbn, published_year, genre, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+    index, count = shard
+    return (
+        "INSERT INTO books (id, title, author, isbn, published_year, genre, created_at) VALUES ("
+        f"COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'books'), {index + 1 - count}) + {count}, "
+        "?, ?, ?, ?, ?, ?)"
+    )
+
+def _isbns_taken(isbns: list, shards=None) -> set:
+    """Return which of `isbns` are already stored on any of `shards` (all shards by default)."""
+    return set().union(*scatter(lambda: set(_load_books_by("isbn", isbns)), shards=shards))
+
 def create_book(title: str, author: str, isbn: str, published_year: int, genre: str):
     """
     Create a new book record in the database.
@@ -11,32 +132,273 @@ def create_book(title: str, author: str, isbn: str, published_year: int, genre:
         isbn (str): The unique ISBN of the book.
         published_year (int): The year the book was published.
         genre (str): The genre of the book.
+
+    Raises:
+        sqlite3.IntegrityError: If the ISBN is already stored.
+    """
+    if shard_count():
+        # Books live on their ISBN's shard, but an update may have left an ISBN elsewhere
+        if _isbns_taken([isbn]):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: books.isbn")
+        return on_shard(shard_for_isbn(isbn), create_book, title, author, isbn, published_year, genre)
+
+    sql = _insert_book_sql()
+
+    def insert(conn):
+        cursor = conn.execute(sql, (title, author, isbn, published_year, genre, int(time.time())))
+        return cursor.lastrowid
+
+    book_id = run_write(insert)
+    _invalidate_books([book_id])  # Drops a cached "not found" for the new id
+    forget_catalog_version()
+
+def create_books(books: list) -> list:
     """
-    conn = get_db_connection()
+    Insert a batch of books in a single transaction with executemany.
+
+    Books whose ISBN is already stored, or repeated earlier in the batch, are
+    skipped rather than failing the whole batch.
+
+    Large batches suspend the per-row full-text, facet and change-log triggers and index
+    the new rows with a single INSERT ... SELECT, which is several times
+    faster; the triggers are restored in the same transaction, so other
+    connections never see them missing.
+
+    Args:
+        books (list): (title, author, isbn, published_year, genre) tuples.
+
+    Returns:
+        list: The indexes in `books` of the rows skipped as duplicate ISBNs.
+    """
+    if shard_count():
+        return _create_books_sharded(books)
+
+    deferred_tables = get_search_tables()
+    sql = _insert_book_sql()
+
+    # Runs on the serialized writer, so no other write can add one of these ISBNs meanwhile
+    def insert(conn):
+        cursor = conn.cursor()
+        existing = set()
+        isbns = [book[2] for book in books]
+        for start in range(0, len(isbns), _IN_CHUNK_SIZE):
+            chunk = isbns[start:start + _IN_CHUNK_SIZE]
+            cursor.execute(
+                f"SELECT isbn FROM books WHERE isbn IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+
+        created_at = int(time.time())
+        rows = []
+        duplicates = []
+        for index, book in enumerate(books):
+            if book[2] in existing:
+                duplicates.append(index)
+                continue
+            existing.add(book[2])
+            rows.append((*book, created_at))
+
+        deferred = len(rows) >= _DEFERRED_INDEX_MIN_ROWS
+        search_tables = deferred_tables if deferred else ()
+        for table in search_tables:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_ai")
+        if deferred:
+            cursor.execute("DROP TRIGGER IF EXISTS book_facets_ai")
+            cursor.execute("DROP TRIGGER IF EXISTS book_changes_ai")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM books")
+        last_id = cursor.fetchone()[0]
+
+        cursor.executemany(sql, rows)
+
+        # AUTOINCREMENT ids only grow, so the new rows are exactly those past last_id
+        for table in search_tables:
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, title, author, genre) "
+                "SELECT id, title, author, genre FROM books WHERE id > ?",
+                (last_id,)
+            )
+        if search_tables:
+            create_search_tables(cursor)  # Restores the insert triggers
+        if deferred:
+            add_facet_counts(cursor, last_id)
+            create_facet_triggers(cursor)
+            add_book_changes(cursor, last_id)
+            create_change_triggers(cursor)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM books")
+        return duplicates, last_id, cursor.fetchone()[0]
+
+    duplicates, last_id, new_last_id = run_write(insert)
+    _invalidate_books(range(last_id + 1, new_last_id + 1))
+    forget_catalog_version()
+    return duplicates
+
+def _create_books_sharded(books: list) -> list:
+    """Split a batch by ISBN shard and insert every part concurrently on its shard's writer."""
+    taken = _isbns_taken([book[2] for book in books])
+    duplicates = [index for index, book in enumerate(books) if book[2] in taken]
+    groups = {}
+    for index, book in enumerate(books):
+        if book[2] not in taken:
+            groups.setdefault(shard_for_isbn(book[2]), []).append(index)
+
+    def insert_group():
+        return create_books([books[index] for index in groups[current_shard()[0]]])
+
+    for shard, skipped in zip(groups, scatter(insert_group, shards=groups)):
+        duplicates.extend(groups[shard][index] for index in skipped)
+    return sorted(duplicates)
+
+def move_books_to_shards() -> int:
+    """
+    Move the books stored in the main database into the BOOK_SHARDS shards, keeping their ids.
+
+    A book with id x goes to shard (x - 1) % BOOK_SHARDS, where lookups by
+    id will look for it, and each shard's id sequence is then advanced past
+    the main database's, so new ids never collide with moved ones. Books are
+    copied and then deleted from the main database in batches; an
+    interrupted move can simply be run again.
+
+    Returns:
+        int: The number of books moved.
+    """
+    shards = shard_count()
+    moved = 0
+    while True:
+        rows = get_reader().execute(f"SELECT * FROM books ORDER BY id LIMIT {_IN_CHUNK_SIZE}").fetchall()
+        if not rows:
+            break
+        groups = {}
+        for row in rows:
+            groups.setdefault(shard_for_id(row[0]), []).append(row)
+
+        def copy_group():
+            group = groups[current_shard()[0]]
+
+            # Skips rows a previous, interrupted run already copied
+            def copy(conn):
+                ids = [row[0] for row in group]
+                present = {row[0] for row in conn.execute(
+                    f"SELECT id FROM books WHERE id IN ({', '.join('?' for _ in ids)})", ids
+                )}
+                conn.executemany(
+                    "INSERT INTO books (id, title, author, isbn, published_year, genre, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in group if row[0] not in present]
+                )
+
+            run_write(copy)
+            _invalidate_books([row[0] for row in group])
+            forget_catalog_version()
+
+        scatter(copy_group, shards=groups)
+        run_write(lambda conn: conn.executemany("DELETE FROM books WHERE id = ?", [(row[0],) for row in rows]))
+        _invalidate_books([row[0] for row in rows])
+        forget_catalog_version()
+        moved += len(rows)
+
+    # Shard k hands out ids k + 1 + N * j (see _insert_book_sql); start each past the main database's last id
+    row = get_reader().execute("SELECT seq FROM sqlite_sequence WHERE name = 'books'").fetchone()
+    last_id = row[0] if row else 0
+    for index in range(shards):
+        seq = last_id - (last_id - 1 - index) % shards
+
+        def advance(conn, seq=seq):
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'books', ? WHERE NOT EXISTS "
+                         "(SELECT 1 FROM sqlite_sequence WHERE name = 'books')", (seq,))
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'books'", (seq,))
+
+        on_shard(index, run_write, advance)
+    return moved
+
+def _load_book(book_id: int):
+    conn = get_reader()
     cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO books (title, author, isbn, published_year, genre, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (title, author, isbn, published_year, genre, int(time.time()))
-    )
-    conn.commit()
-    conn.close()
+    cursor.row_factory = _book_row
+    cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
+    return cursor.fetchone()
 
 def get_book(book_id: int):
     """
     Retrieve a book record by its ID.
 
+    Reads go through the book cache; misses are loaded from the database once
+    even under concurrent requests, and unknown IDs are cached briefly too.
+
     Args:
         book_id (int): The ID of the book to retrieve.
 
     Returns:
-        tuple: A tuple representing the book record, or None if not found.
+        Book: The book record, or None if not found.
     """
-    conn = get_db_connection()
+    if shard_count():
+        return on_shard(shard_for_id(book_id), get_book, book_id)
+    cache = _book_cache()
+    if cache is None:
+        return _load_book(book_id)
+    book = cache.get(book_id, _load_book)
+    return Book._make(book) if book is not None else None  # The shared tier hands back lists
+
+def _load_books_by(column: str, keys: list) -> dict:
+    conn = get_reader()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-    book = cursor.fetchone()
-    conn.close()
-    return book
+    cursor.row_factory = _book_row
+    books = {}
+    for start in range(0, len(keys), _IN_CHUNK_SIZE):
+        chunk = keys[start:start + _IN_CHUNK_SIZE]
+        cursor.execute(f"SELECT * FROM books WHERE {column} IN ({', '.join('?' for _ in chunk)})", chunk)
+        for book in cursor.fetchall():
+            books[getattr(book, column)] = book
+    return books
+
+def get_books_by_id(book_ids: list) -> list:
+    """
+    Retrieve many books by ID in one round trip.
+
+    Cached books are served from the book cache; the rest are read with
+    chunked `id IN (...)` queries and cached, including unknown IDs.
+
+    Args:
+        book_ids (list): The IDs to fetch; duplicates are allowed.
+
+    Returns:
+        list: A Book, or None if not found, for each ID in request order.
+    """
+    if shard_count():
+        found = {}
+
+        def load_group():
+            index = current_shard()[0]
+            group = [book_id for book_id in dict.fromkeys(book_ids) if shard_for_id(book_id) == index]
+            return dict(zip(group, get_books_by_id(group)))
+
+        for books in scatter(load_group, shards={shard_for_id(book_id) for book_id in book_ids}):
+            found.update(books)
+        return [found[book_id] for book_id in book_ids]
+
+    cache = _book_cache()
+    if cache is None:
+        books = _load_books_by("id", list(dict.fromkeys(book_ids)))
+    else:
+        books = cache.get_many(book_ids, lambda missed: _load_books_by("id", missed))
+    return [Book._make(books[book_id]) if books.get(book_id) is not None else None for book_id in book_ids]
+
+def get_books_by_isbn(isbns: list) -> list:
+    """
+    Retrieve many books by ISBN in one round trip, using the ISBN index.
+
+    Args:
+        isbns (list): The ISBNs to fetch; duplicates are allowed.
+
+    Returns:
+        list: A Book, or None if not found, for each ISBN in request order.
+    """
+    if shard_count():
+        found = {}
+        for books in scatter(_load_books_by, "isbn", list(dict.fromkeys(isbns))):
+            found.update(books)
+        return [found.get(isbn) for isbn in isbns]
+    books = _load_books_by("isbn", list(dict.fromkeys(isbns)))
+    return [books.get(isbn) for isbn in isbns]
 
 def get_all_books():
     """
@@ -45,11 +407,12 @@ def get_all_books():
     Returns:
         list: A list of tuples, each representing a book record.
     """
-    conn = get_db_connection()
+    if shard_count():
+        return merge_sorted(scatter(get_all_books), key=lambda row: row[0])
+    conn = get_reader()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM books")
+    cursor.execute("SELECT * FROM books ORDER BY id")
     books = cursor.fetchall()
-    conn.close()
     return books
 
 def search_book(query: str, params: str):
@@ -62,14 +425,316 @@ def search_book(query: str, params: str):
 
     Returns:
         list: A list of tuples representing books that match the query.
+              With shards, the rows from every shard, one shard after another.
     """
-    conn = get_db_connection()
+    if shard_count():
+        return [row for rows in scatter(search_book, query, params) for row in rows]
+    conn = get_reader()
     cursor = conn.cursor()
     cursor.execute(query, params)
     books = cursor.fetchall()
-    conn.close()
     return books
 
+def build_book_filters(title: str = None, author: str = None, isbn: str = None,
+                       genre: str = None, published_year: int = None, q: str = None):
+    """
+    Build the WHERE clause, parameters and full-text query for a filtered book search.
+
+    Substring filters of three or more characters are answered by the trigram
+    index instead of a leading-wildcard LIKE, and `q` becomes an FTS5 prefix
+    query. Both fall back to LIKE when the search tables are unavailable.
+
+    Args:
+        title (str, optional): Substring to match against the title.
+        author (str, optional): Substring to match against the author.
+        isbn (str, optional): Exact ISBN to match.
+        genre (str, optional): Substring to match against the genre.
+        published_year (int, optional): Exact publication year to match.
+        q (str, optional): Free-text query; every word must prefix-match the title, author or genre.
+
+    Returns:
+        tuple: The WHERE clause (without the keyword), its list of parameters, and the
+               FTS5 MATCH expression for `q` (None when there is no full-text query).
+    """
+    search_tables = get_search_tables()
+    clauses = []
+    params = []
+    match = None
+
+    for column, value in (("title", title), ("author", author), ("genre", genre)):
+        if not value:
+            continue
+        if len(value) >= 3 and "books_trigram" in search_tables:
+            clauses.append(f"books.id IN (SELECT rowid FROM books_trigram WHERE {column} LIKE ?)")
+        else:
+            clauses.append(f"books.{column} LIKE ?")
+        params.append(f"%{value}%")
+    if isbn:
+        clauses.append("books.isbn = ?")
+        params.append(isbn)
+    if published_year:
+        clauses.append("books.published_year = ?")
+        params.append(published_year)
+
+    terms = re.findall(r"\w+", q or "")
+    if terms and "books_fts" in search_tables:
+        match = " ".join(f'"{term}"*' for term in terms)
+    else:
+        for term in terms:
+            clauses.append("(books.title LIKE ? OR books.author LIKE ? OR books.genre LIKE ?)")
+            params.extend([f"%{term}%"] * 3)
+
+    return (" AND ".join(clauses) if clauses else "1=1"), params, match
+
+def _from_books(where: str, params: list, match: str = None):
+    """Return the FROM clause, WHERE clause and parameters, joining the full-text index if needed."""
+    if match is None:
+        return "books", where, list(params)
+    return "books_fts JOIN books ON books.id = books_fts.rowid", f"books_fts MATCH ? AND {where}", [match, *params]
+
+def count_books(where: str, params: list, match: str = None) -> int:
+    """
+    Count the books matching a search built by build_book_filters.
+
+    Args:
+        where (str): The WHERE clause (without the keyword).
+        params (list): The parameters for the clause.
+        match (str, optional): The FTS5 MATCH expression.
+
+    Returns:
+        int: The number of matching books.
+    """
+    if shard_count():
+        return sum(scatter(count_books, where, params, match))
+    source, where, params = _from_books(where, params, match)
+    conn = get_reader()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params)
+    return cursor.fetchone()[0]
+
+def facet_counts(facets: list, where: str, params: list, match: str = None, limit: int = 10) -> dict:
+    """
+    Count the books matching a search built by build_book_filters per facet value.
+
+    Unfiltered searches read the book_facets summary table, which triggers keep
+    up to date, so each facet costs one index range scan. Filtered searches
+    group the matching rows.
+
+    Args:
+        facets (list): Names from FACET_EXPRESSIONS, e.g. ["genre", "decade"].
+        where (str): The WHERE clause (without the keyword).
+        params (list): The parameters for the clause.
+        match (str, optional): The FTS5 MATCH expression.
+        limit (int, optional): The most common values returned per facet.
+
+    Returns:
+        dict: Each facet mapped to a list of {"value", "count"} dicts, most common first.
+    """
+    if shard_count():
+        # A value's rank depends on its total, so every shard reports all of its values (-1: no LIMIT)
+        totals = {facet: Counter() for facet in facets}
+        for counts in scatter(facet_counts, facets, where, params, match, -1):
+            for facet, values in counts.items():
+                totals[facet].update({entry["value"]: entry["count"] for entry in values})
+        return {
+            facet: [
+                {"value": value, "count": count}
+                for value, count in sorted(values.items(), key=lambda item: (-item[1], _sql_order(item[0])))[:limit]
+            ]
+            for facet, values in totals.items()
+        }
+
+    conn = get_reader()
+    cursor = conn.cursor()
+    counts = {}
+    for facet in facets:
+        if where == "1=1" and match is None:
+            cursor.execute(
+                "SELECT value, count FROM book_facets WHERE facet = ? ORDER BY count DESC, value LIMIT ?",
+                (facet, limit)
+            )
+        else:
+            source, facet_where, facet_params = _from_books(where, params, match)
+            value = FACET_EXPRESSIONS[facet].format(row="books")
+            cursor.execute(
+                f"SELECT {value}, COUNT(*) FROM {source} WHERE {facet_where} AND {value} IS NOT NULL "
+                "GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT ?",
+                [*facet_params, limit]
+            )
+        counts[facet] = [{"value": value, "count": count} for value, count in cursor.fetchall()]
+    return counts
+
+def _sql_order(value) -> tuple:
+    """Return a key ordering Python values as SQLite orders them: NULL, numbers, text, then blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2 if isinstance(value, str) else 3, value)
+
+def _merge_key(book, sort: str, score=None) -> tuple:
+    """Return the key of a book in the ORDER BY of _order_by, for merging shards' results."""
+    if sort == RELEVANCE:
+        return (score if score is not None else 0, book.id)
+    if sort == "id":
+        return (book.id,)
+    return (*_sql_order(getattr(book, sort)), book.id)
+
+def _ranked_books(where: str, params: list, limit: int, sort: str, match: str = None) -> list:
+    """Return the first `limit` matching books of the current database as (merge key, Book) pairs."""
+    order_by = _order_by(sort, match)
+    score = _BM25 if sort == RELEVANCE and match is not None else "NULL"
+    source, where, params = _from_books(where, params, match)
+    cursor = get_reader().execute(
+        f"SELECT books.*, {score} FROM {source} WHERE {where} ORDER BY {order_by} LIMIT ?", [*params, limit]
+    )
+    books = []
+    for row in cursor.fetchall():
+        book = Book._make(row[:-1])
+        books.append((_merge_key(book, sort, row[-1]), book))
+    return books
+
+def _order_by(sort: str, match: str = None) -> str:
+    """Return the ORDER BY clause for a sort field, using id as the tie-breaker."""
+    if sort == RELEVANCE:
+        return f"{_BM25}, books.id" if match is not None else "books.id"
+    if sort not in SORTABLE_FIELDS:
+        raise ValueError(f"Cannot sort books by {sort!r}")
+    return "books.id" if sort == "id" else f"books.{sort}, books.id"
+
+def search_books_page(where: str, params: list, limit: int, offset: int, sort: str = "id", match: str = None,
+                      as_json: bool = False):
+    """
+    Fetch a single page of books matching a search built by build_book_filters.
+
+    Only `limit` rows are read from SQLite, so the cost of a page depends on
+    its size rather than on the size of the catalog. With `as_json`, SQLite
+    renders each row with json_object and no Python objects are built per
+    book, roughly twice as fast as serializing Book tuples at API page sizes.
+
+    Args:
+        where (str): The WHERE clause (without the keyword).
+        params (list): The parameters for the clause.
+        limit (int): The maximum number of rows to return.
+        offset (int): The number of matching rows to skip.
+        sort (str, optional): One of SORTABLE_FIELDS, or RELEVANCE for full-text searches. Defaults to "id".
+        match (str, optional): The FTS5 MATCH expression.
+        as_json (bool, optional): Return the page as JSON array text instead of Book tuples.
+
+    Returns:
+        list | str: The Books on the page, or their JSON array when `as_json` is set.
+    """
+    if shard_count():
+        # Every shard returns its first offset + limit rows; the page is cut from their merge
+        ranked = scatter(_ranked_books, where, params, offset + limit, sort, match)
+        books = [book for _, book in merge_sorted(ranked, key=lambda pair: pair[0], limit=limit, offset=offset)]
+        return dumps([book_to_dict(book) for book in books]).decode() if as_json else books
+
+    order_by = _order_by(sort, match)
+    source, where, params = _from_books(where, params, match)
+    conn = get_reader()
+    cursor = conn.cursor()
+    cursor.row_factory = None if as_json else _book_row
+    cursor.execute(
+        f"SELECT {_BOOK_JSON if as_json else 'books.*'} FROM {source} WHERE {where} "
+        f"ORDER BY {order_by} LIMIT ? OFFSET ?",
+        [*params, limit, offset]
+    )
+    if as_json:
+        # Joined here rather than with json_group_array, whose element order SQLite does not guarantee
+        return "[" + ",".join(row[0] for row in cursor.fetchall()) + "]"
+    return cursor.fetchall()
+
+def search_books_after(where: str, params: list, limit: int, sort: str = "id", after: tuple = None,
+                       match: str = None):
+    """
+    Fetch the books that follow a keyset position, in (sort, id) order.
+
+    The position is the (sort value, id) of the last book already returned,
+    so SQLite seeks straight to it through the (sort, id) index instead of
+    scanning and discarding the preceding rows as OFFSET does.
+
+    Args:
+        where (str): The WHERE clause (without the keyword).
+        params (list): The parameters for the clause.
+        limit (int): The maximum number of rows to return.
+        sort (str, optional): One of SORTABLE_FIELDS. Defaults to "id".
+        after (tuple, optional): The (sort value, id) to continue after, or None for the first page.
+        match (str, optional): The FTS5 MATCH expression.
+
+    Returns:
+        list: The Books following the position.
+    """
+    if sort == RELEVANCE:
+        raise ValueError("Keyset pagination cannot order by relevance")
+    if shard_count():
+        pages = scatter(search_books_after, where, params, limit, sort, after, match)
+        return merge_sorted(pages, key=lambda book: _merge_key(book, sort), limit=limit)
+    order_by = _order_by(sort)
+    params = list(params)
+
+    if after is not None:
+        value, last_id = after
+        if sort == "id":
+            where += " AND books.id > ?"
+            params.append(last_id)
+        elif value is None:
+            # NULLs sort first, so the rest of the NULL run and every non-NULL row follow.
+            where += f" AND ((books.{sort} IS NULL AND books.id > ?) OR books.{sort} IS NOT NULL)"
+            params.append(last_id)
+        else:
+            where += f" AND (books.{sort}, books.id) > (?, ?)"
+            params.extend([value, last_id])
+
+    source, where, params = _from_books(where, params, match)
+    conn = get_reader()
+    cursor = conn.cursor()
+    cursor.row_factory = _book_row
+    cursor.execute(f"SELECT books.* FROM {source} WHERE {where} ORDER BY {order_by} LIMIT ?", [*params, limit])
+    return cursor.fetchall()
+
+def _books_cursor(where: str, params: list, match: str = None):
+    source, where, params = _from_books(where, params, match)
+    conn = get_reader()
+    cursor = conn.cursor()
+    cursor.row_factory = _book_row
+    cursor.execute(f"SELECT books.* FROM {source} WHERE {where} ORDER BY books.id", params)
+    return cursor
+
+def iter_books(where: str, params: list, match: str = None, chunk_size: int = 1000):
+    """
+    Stream the books matching a search built by build_book_filters, in id order.
+
+    Rows are read from the cursor `chunk_size` at a time, so memory use stays
+    bounded however many books match.
+
+    Args:
+        where (str): The WHERE clause (without the keyword).
+        params (list): The parameters for the clause.
+        match (str, optional): The FTS5 MATCH expression.
+        chunk_size (int, optional): Rows fetched from SQLite per round trip. Defaults to 1000.
+
+    Yields:
+        list: Successive chunks of Books.
+    """
+    if shard_count():
+        # Each shard streams through its own cursor; rows are merged by id as they are consumed
+        cursors = [on_shard(index, _books_cursor, where, params, match) for index in range(shard_count())]
+        books = heapq.merge(*cursors, key=lambda book: book.id)
+        while True:
+            chunk = list(islice(books, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+        return
+
+    cursor = _books_cursor(where, params, match)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
 def update_book(book_id: int, title: str, author: str, isbn: str, published_year: int, genre: str):
     """
     Update an existing book record.
@@ -82,14 +747,19 @@ def update_book(book_id: int, title: str, author: str, isbn: str, published_year
         published_year (int): The updated publication year of the book.
         genre (str): The updated genre of the book.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
+    shards = shard_count()
+    if shards:
+        # The book stays on its shard, whose UNIQUE index covers it; check the others for the new ISBN
+        shard = shard_for_id(book_id)
+        if _isbns_taken([isbn], shards=[index for index in range(shards) if index != shard]):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: books.isbn")
+        return on_shard(shard, update_book, book_id, title, author, isbn, published_year, genre)
+    run_write(lambda conn: conn.execute(
         "UPDATE books SET title = ?, author = ?, isbn = ?, published_year = ?, genre = ? WHERE id = ?",
         (title, author, isbn, published_year, genre, book_id)
-    )
-    conn.commit()
-    conn.close()
+    ))
+    _invalidate_books([book_id])
+    forget_catalog_version()
 
 def delete_book(book_id: int):
     """
@@ -98,8 +768,104 @@ def delete_book(book_id: int):
     Args:
         book_id (int): The ID of the book to delete.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
-    conn.commit()
-    conn.close()
+    if shard_count():
+        return on_shard(shard_for_id(book_id), delete_book, book_id)
+    run_write(lambda conn: conn.execute("DELETE FROM books WHERE id = ?", (book_id,)))
+    _invalidate_books([book_id])
+    forget_catalog_version()
+
+class ChangesCompacted(LookupError):
+    """Raised when a change feed position predates tombstones removed by compact_book_changes."""
+
+class BookChange(NamedTuple):
+    """An entry of the book change log; `book` is the current row, or None for a delete."""
+    version: int
+    book_id: int
+    deleted: bool
+    changed_at: int
+    book: Book
+
+def _changes_since(since: int, limit: int) -> list:
+    conn = get_reader()
+    rows = conn.execute(
+        "SELECT book_changes.version, book_changes.book_id, book_changes.deleted, book_changes.changed_at, books.* "
+        "FROM book_changes LEFT JOIN books ON books.id = book_changes.book_id "
+        "WHERE book_changes.version > ? ORDER BY book_changes.version LIMIT ?",
+        (since, limit)
+    ).fetchall()
+    # Read after the entries: a compaction in between only makes the check stricter
+    compacted = conn.execute("SELECT version FROM book_changes_compacted WHERE id = 1").fetchone()[0]
+    if since and since < compacted:
+        raise ChangesCompacted(f"Changes up to version {compacted} have been compacted")
+    return [
+        BookChange(row[0], row[1], bool(row[2]), row[3], None if row[2] else Book._make(row[4:]))
+        for row in rows
+    ]
+
+def get_book_changes(since: list, limit: int) -> tuple:
+    """
+    Return the changes to books after a feed position, oldest first.
+
+    The log keeps only the latest change per book, so reading from 0 yields
+    every stored book (and the remaining tombstones): a new client starts
+    there, then keeps passing back the position it was given.
+
+    Args:
+        since (list): The last version seen from each shard; a single version without shards.
+        limit (int): The maximum number of changes to return.
+
+    Returns:
+        tuple: The BookChanges, the position after them (same form as `since`), and
+               whether more changes are waiting.
+
+    Raises:
+        ChangesCompacted: If `since` is behind tombstones that have been compacted;
+                          the client must start over from 0.
+    """
+    if not shard_count():
+        changes = _changes_since(since[0], limit + 1)
+        return changes[:limit], [changes[:limit][-1].version if changes else since[0]], len(changes) > limit
+
+    pages = scatter(lambda: _changes_since(since[current_shard()[0]], limit + 1))
+    # Merged by time; each shard's changes stay in version order, so a prefix of each is taken
+    merged = list(heapq.merge(
+        *[[(change.changed_at, index, change) for change in page] for index, page in enumerate(pages)],
+        key=lambda entry: entry[:2]
+    ))
+    position = list(since)
+    for _, index, change in merged[:limit]:
+        position[index] = change.version
+    return [change for _, _, change in merged[:limit]], position, len(merged) > limit
+
+def compact_book_changes(before: int) -> int:
+    """
+    Delete the tombstones of books deleted before a time.
+
+    Clients whose position is older than a removed tombstone get
+    ChangesCompacted and resync from 0; live books are never compacted, as
+    each already has a single entry.
+
+    Args:
+        before (int): Unix time; tombstones recorded earlier are removed.
+
+    Returns:
+        int: The number of tombstones removed.
+    """
+    if shard_count():
+        return sum(scatter(compact_book_changes, before))
+
+    def compact(conn):
+        version, count = conn.execute(
+            "SELECT MAX(version), COUNT(*) FROM book_changes WHERE deleted AND changed_at < ?", (before,)
+        ).fetchone()
+        if not count:
+            return 0
+        conn.execute("DELETE FROM book_changes WHERE deleted AND changed_at < ? AND version <= ?", (before, version))
+        conn.execute("UPDATE book_changes_compacted SET version = MAX(version, ?) WHERE id = 1", (version,))
+        # Cached GET /books/changes responses for positions now compacted must not be served
+        conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+        return count
+
+    removed = run_write(compact)
+    forget_catalog_version()
+    return removed
@@ -1,8 +1,36 @@
 import time
-from db.database import get_db_connection
+from flask import current_app
+from db.database import get_reader, run_write
+from utils.cache import LRUCache
 
 SESSION_TIMEOUT = 3600  # Session expiration time in seconds (e.g., 1 hour)
 
+def _session_cache():
+    """
+    Return the current app's validated-token cache, or None when SESSION_CACHE_SIZE is 0.
+
+    Each app process has its own cache, so SESSION_CACHE_TTL bounds how long a
+    logout performed by another process can go unnoticed here.
+    """
+    if not current_app.config["SESSION_CACHE_SIZE"]:
+        return None
+    cache = current_app.extensions.get("session_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            "session_cache", LRUCache(current_app.config["SESSION_CACHE_SIZE"])
+        )
+    return cache
+
+def get_session_cache_stats() -> dict:
+    """
+    Return the hit and miss counters of the validated-token cache.
+
+    Returns:
+        dict: The cache counters, or an empty dict when the cache is disabled.
+    """
+    cache = _session_cache()
+    return cache.stats() if cache is not None else {}
+
 def create_session(user_id: int, token: str):
     """
     Create a session for a user and store it in the database.
@@ -11,15 +39,23 @@ def create_session(user_id: int, token: str):
         user_id (int): The ID of the user.
         token (str): The unique session token for the user.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
-    cursor.execute(
-        "INSERT INTO sessions (user_id, token, created_at) VALUES (?, ?, ?)",
-        (user_id, token, int(time.time()))
-    )
-    conn.commit()
-    conn.close()
+    def replace(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT token FROM sessions WHERE user_id = ?", (user_id,))
+        old_tokens = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        cursor.execute(
+            "INSERT INTO sessions (user_id, token, created_at) VALUES (?, ?, ?)",
+            (user_id, token, int(time.time()))
+        )
+        return old_tokens
+
+    old_tokens = run_write(replace)
+
+    cache = _session_cache()
+    if cache is not None:
+        for old_token in old_tokens:
+            cache.delete(old_token)
 
 def delete_session(token: str):
     """
@@ -28,43 +64,99 @@ def delete_session(token: str):
     Args:
         token (str): The session token to be deleted.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM sessions WHERE token = ?", (token,))
-    conn.commit()
-    conn.close()
+    run_write(lambda conn: conn.execute("DELETE FROM sessions WHERE token = ?", (token,)))
+
+    cache = _session_cache()
+    if cache is not None:
+        cache.delete(token)
 
 def validate_session(token: str) -> bool:
     """
     Validate a session token to check if it is active and not expired.
 
+    Valid tokens are remembered in an in-process LRU cache until the session
+    expires (or SESSION_CACHE_TTL passes), so repeat checks skip the database.
+
     Args:
         token (str): The session token to validate.
 
     Returns:
         bool: True if the session token is valid and not expired, False otherwise.
     """
-    conn = get_db_connection()
+    cache = _session_cache()
+    if cache is not None and cache.get(token):
+        return True
+
+    conn = get_reader()
     cursor = conn.cursor()
     cursor.execute("SELECT created_at FROM sessions WHERE token = ?", (token,))
     result = cursor.fetchone()
     if result:
         created_at = result[0]
-        if time.time() - created_at < SESSION_TIMEOUT:
-            conn.close()
+        remaining = created_at + SESSION_TIMEOUT - time.time()
+        if remaining > 0:
+            if cache is not None:
+                # Never cache past the session's own expiry
+                cache.set(token, True, ttl=min(remaining, current_app.config["SESSION_CACHE_TTL"]))
             return True
-    conn.close()
+    return False
+
+def revoke_token(jti: str, expires_at: int):
+    """
+    Record a signed token as logged out until it expires.
+
+    Args:
+        jti (str): The token's unique ID.
+        expires_at (int): The token's expiry timestamp; the record is swept after it.
+    """
+    run_write(lambda conn: conn.execute(
+        "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at)
+    ))
+
+    cache = _session_cache()
+    if cache is not None:
+        cache.delete(("jti", jti))
+
+def is_token_revoked(jti: str, expires_at: int) -> bool:
+    """
+    Check whether a signed token has been logged out.
+
+    Tokens found not revoked are remembered in the validated-token cache, like
+    database sessions, so SESSION_CACHE_TTL bounds how long a logout handled by
+    another process can go unnoticed here.
+
+    Args:
+        jti (str): The token's unique ID.
+        expires_at (int): The token's expiry timestamp.
+
+    Returns:
+        bool: True if the token was revoked, False otherwise.
+    """
+    cache = _session_cache()
+    key = ("jti", jti)
+    if cache is not None and cache.get(key):
+        return False
+
+    cursor = get_reader().cursor()
+    cursor.execute("SELECT 1 FROM revoked_tokens WHERE jti = ?", (jti,))
+    if cursor.fetchone():
+        return True
+    remaining = expires_at - time.time()
+    if cache is not None and remaining > 0:
+        cache.set(key, True, ttl=min(remaining, current_app.config["SESSION_CACHE_TTL"]))
     return False
 
 def remove_expired_sessions():
     """
-    Remove sessions that have expired based on the SESSION_TIMEOUT.
+    Remove sessions that have expired based on the SESSION_TIMEOUT, and revocations of expired signed tokens.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM sessions WHERE created_at < ?", (int(time.time()) - SESSION_TIMEOUT,))
-    conn.commit()
-    conn.close()
+    now = int(time.time())
+
+    def sweep(conn):
+        conn.execute("DELETE FROM sessions WHERE created_at < ?", (now - SESSION_TIMEOUT,))
+        conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (now,))
+
+    run_write(sweep)
 
 def get_id_from_token(token: str):
     """
@@ -76,9 +168,8 @@ def get_id_from_token(token: str):
     Returns:
         int or bool: The user ID if the token exists, or False if the token is invalid.
     """
-    conn = get_db_connection()
+    conn = get_reader()
     cursor = conn.cursor()
     cursor.execute("SELECT user_id FROM sessions WHERE token = ?", (token,))
     result = cursor.fetchone()
-    conn.close()
     return result if result else False
@@ -1,5 +1,6 @@
 import sqlite3
-from db.database import get_db_connection
+from db.database import get_reader, run_write
+from utils.passwords import get_password_hasher
 
 def create_user(username: str, password: str):
     """
@@ -7,16 +8,14 @@ def create_user(username: str, password: str):
 
     Args:
         username (str): The username of the new user.
-        password (str): The password for the new user.
+        password (str): The password for the new user; only its hash is stored.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
-        (username, password)
-    )
-    conn.commit()
-    conn.close()
+    if get_reader().execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None:
+        return  # Skip hashing for a user that would be ignored anyway
+    hashed = get_password_hasher().hash(password)
+    run_write(lambda conn: conn.execute(
+        "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)", (username, hashed)
+    ))
 
 def get_user_by_id(user_id: int):
     """
@@ -28,11 +27,10 @@ def get_user_by_id(user_id: int):
     Returns:
         tuple: A tuple representing the user record, or None if no user is found.
     """
-    conn = get_db_connection()
+    conn = get_reader()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
     user = cursor.fetchone()
-    conn.close()
     return user
 
 def update_user_password(user_id: int, new_password: str):
@@ -41,16 +39,10 @@ def update_user_password(user_id: int, new_password: str):
 
     Args:
         user_id (int): The unique ID of the user.
-        new_password (str): The new password for the user.
+        new_password (str): The new password for the user; only its hash is stored.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET password = ? WHERE id = ?",
-        (new_password, user_id)
-    )
-    conn.commit()
-    conn.close()
+    hashed = get_password_hasher().hash(new_password)
+    run_write(lambda conn: conn.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id)))
 
 def delete_user(user_id: int):
     """
@@ -59,17 +51,39 @@ def delete_user(user_id: int):
     Args:
         user_id (int): The unique ID of the user to delete.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    run_write(lambda conn: conn.execute("DELETE FROM users WHERE id = ?", (user_id,)))
 
 def authenticate_user(username: str, password: str) -> int:
-    """Authenticate a user and return their ID if successful."""
-    conn = get_db_connection()
+    """
+    Authenticate a user and return their ID if successful.
+
+    The password is checked on the password hasher's bounded pool. Unknown
+    usernames are checked against a dummy hash, so they cost the same as a
+    wrong password. After a successful login, a hash made with outdated
+    settings (or a legacy plaintext password) is replaced by a current one,
+    derived in the same pool task as the check.
+
+    Args:
+        username (str): The username to authenticate.
+        password (str): The plaintext password to check.
+
+    Returns:
+        int: The user's ID, or None if the credentials are invalid.
+
+    Raises:
+        PasswordHasherBusy: If the check could not run within the login latency budget.
+    """
+    conn = get_reader()
     cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username = ? AND password = ?", (username, password))
+    cursor.execute("SELECT id, password FROM users WHERE username = ?", (username,))
     user = cursor.fetchone()
-    conn.close()
-    return user["id"] if user else None
\ No newline at end of file
+    matched, hashed = get_password_hasher().check_and_rehash(password, user["password"] if user else None)
+    if not matched:
+        return None
+
+    if hashed is not None:
+        # Guarded on the old value, so a concurrent password change is never overwritten
+        run_write(lambda conn: conn.execute(
+            "UPDATE users SET password = ? WHERE id = ? AND password = ?", (hashed, user["id"], user["password"])
+        ))
+    return user["id"]
\ No newline at end of file
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("APP_CONFIG", "testing")
+
+# Importing app migrates and seeds its database, so give it a throwaway file instead of test_database.db
+_import_db_dir = tempfile.TemporaryDirectory()
+os.environ.setdefault("TEST_DATABASE_URI", f"sqlite:///{os.path.join(_import_db_dir.name, 'test_database.db')}")
+
+from app import app
+from db.database import initialize_db
+from models.book import create_book
+
+
+class ApiTestCase(unittest.TestCase):
+    """Base test case running the API routes against a throwaway database file."""
+
+    def setUp(self):
+        """Point the app at a fresh temporary database."""
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.original_uri = app.config["DATABASE_URI"]
+        app.config["DATABASE_URI"] = f"sqlite:///{os.path.join(self.db_dir.name, 'api.db')}"
+        self.app = app
+        self.client = app.test_client()
+        with app.app_context():
+            initialize_db()
+
+    def tearDown(self):
+        """Restore the original database and remove the temporary one."""
+        app.config["DATABASE_URI"] = self.original_uri
+        self.db_dir.cleanup()
+
+    def seed_books(self, count, **overrides):
+        """Insert `count` books with predictable titles and ISBNs."""
+        with app.app_context():
+            for i in range(count):
+                fields = {
+                    "title": f"Book {i:05d}",
+                    "author": f"Author {i % 7}",
+                    "isbn": f"isbn-{i:05d}",
+                    "published_year": 1990 + i % 30,
+                    "genre": "Fiction" if i % 2 else "History",
+                }
+                fields.update(overrides)
+                create_book(**fields)
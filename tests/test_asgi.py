@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import unittest
+from api_testcase import ApiTestCase
+from flask import Flask, request
+from asgi import application
+from models.user import create_user
+from utils.asgi import WSGIToASGI
+
+
+def http_scope(method, path, headers):
+    """Build an ASGI http scope; `headers` is a dict or a list of pairs, which may repeat a name."""
+    path, _, query = path.partition("?")
+    pairs = headers.items() if isinstance(headers, dict) else headers
+    return {
+        "type": "http", "method": method, "path": path, "root_path": "", "scheme": "http",
+        "query_string": query.encode(), "http_version": "1.1",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in pairs],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+    }
+
+
+def asgi_request(method, path, body=b"", headers=None, chunk_size=None, app=application):
+    """Run one request through an ASGI application and collect the response."""
+    headers = list(headers.items() if isinstance(headers, dict) else headers or [])
+    if body and not chunk_size and not any(name.lower() == "content-length" for name, _ in headers):
+        headers.append(("Content-Length", str(len(body))))
+    scope = http_scope(method, path, headers)
+    step = chunk_size or max(len(body), 1)
+    messages = [
+        {"type": "http.request", "body": body[i:i + step], "more_body": i + step < len(body)}
+        for i in range(0, max(len(body), 1), step)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    response_headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert not sent[-1]["more_body"]
+    return start["status"], response_headers, body
+
+
+class AsgiEquivalenceTestCase(ApiTestCase):
+    """The ASGI entry point answers exactly like the WSGI app."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(30)
+        with self.app.app_context():
+            create_user("testuser", "testpassword")
+        self.token = self.client.post(
+            '/login', json={"username": "testuser", "password": "testpassword"}
+        ).get_json()["token"]
+
+    def assert_equivalent(self, method, path, body=b"", headers=None, chunk_size=None):
+        expected = self.client.open(path, method=method, data=body, headers=headers)
+        status, response_headers, response_body = asgi_request(method, path, body, headers, chunk_size)
+        self.assertEqual(status, expected.status_code, path)
+        self.assertEqual(response_body, expected.get_data(), path)
+        for name in ("content-type", "etag", "content-encoding"):
+            self.assertEqual(response_headers.get(name), expected.headers.get(name), (path, name))
+        return status, response_headers, response_body
+
+    def test_reads(self):
+        """Catalog reads, errors and conditional GETs match."""
+        for path in ('/books', '/books?per_page=5&page=2&sort=title', '/books?q=Book&per_page=3',
+                     '/books?pagination=cursor&per_page=4', '/books?title=nothing', '/books?per_page=0',
+                     '/book/3', '/book/999', '/books/export?format=csv', '/missing'):
+            with self.subTest(path=path):
+                self.assert_equivalent("GET", path)
+
+        etag = self.client.get('/book/3').headers['ETag']
+        status, _, _ = self.assert_equivalent("GET", '/book/3', headers={"If-None-Match": etag})
+        self.assertEqual(status, 304)
+
+    def test_streamed_export(self):
+        """Streamed, gzipped exports decode to the same rows."""
+        status, headers, body = asgi_request("GET", '/books/export?gzip=1')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-encoding"], "gzip")
+        expected = gzip.decompress(self.client.get('/books/export?gzip=1').get_data())
+        self.assertEqual(gzip.decompress(body), expected)
+
+    def test_writes(self):
+        """Authenticated writes, including a chunked NDJSON upload, behave the same."""
+        auth = {"Authorization": self.token, "Content-Type": "application/json"}
+        book = json.dumps({"title": "T", "author": "A", "isbn": "asgi-1", "published_year": 2020, "genre": "G"})
+        status, _, _ = asgi_request("POST", '/book', book.encode(), auth)
+        self.assertEqual(status, 201)
+        self.assertEqual(self.client.get('/books?isbn=asgi-1').get_json()["total_items"], 1)
+
+        self.assert_equivalent("POST", '/book', b"{}", {"Content-Type": "application/json"})  # No token
+
+        lines = "".join(
+            json.dumps({"title": f"Bulk {i}", "author": "A", "isbn": f"bulk-{i}", "published_year": 2001, "genre": "G"})
+            + "\n" for i in range(50)
+        ).encode()
+        status, _, body = asgi_request("POST", '/books/bulk', lines,
+                                       {"Authorization": self.token, "Content-Type": "application/x-ndjson"},
+                                       chunk_size=100)
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["inserted"], 50)
+
+    def test_repeated_headers(self):
+        """Headers sent several times are combined the way the WSGI app sees them."""
+        etag = self.client.get('/book/3').headers['ETag']
+        status, _, _ = self.assert_equivalent(
+            "GET", '/book/3', headers=[("If-None-Match", '"other"'), ("If-None-Match", etag)]
+        )
+        self.assertEqual(status, 304)
+        _, headers, _ = self.assert_equivalent(
+            "GET", '/books/export', headers=[("Accept-Encoding", "identity"), ("Accept-Encoding", "gzip")]
+        )
+        self.assertEqual(headers["content-encoding"], "gzip")
+
+
+class WSGIToASGITestCase(unittest.TestCase):
+    """Test the adapter itself on small WSGI apps."""
+
+    def test_repeated_cookie_headers(self):
+        """Cookies split over several headers (as HTTP/2 clients send them) all reach the app."""
+        app = Flask(__name__)
+        app.add_url_rule('/', view_func=lambda: dict(request.cookies))
+        status, _, body = asgi_request(
+            "GET", '/', headers=[("Cookie", "a=1"), ("Cookie", "b=2; c=3")], app=WSGIToASGI(app)
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"a": "1", "b": "2", "c": "3"})
+
+    def test_network_io_does_not_hold_a_worker(self):
+        """With one worker, a slow upload and a slow reader do not block another request."""
+        def wsgi_app(environ, start_response):
+            data = environ["wsgi.input"].read()
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [data or b"ok"]
+
+        adapter = WSGIToASGI(wsgi_app, workers=1)
+
+        async def run():
+            uploaded, fast_done = asyncio.Event(), asyncio.Event()
+            slow_sent = []
+
+            async def slow_receive():
+                if not uploaded.is_set():
+                    uploaded.set()
+                    return {"type": "http.request", "body": b"part", "more_body": True}
+                await fast_done.wait()  # The rest of the body arrives after the other request finished
+                return {"type": "http.request", "body": b"-rest", "more_body": False}
+
+            async def slow_send(message):
+                slow_sent.append(message)
+
+            async def fast_receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def fast_send(message):
+                if not message.get("more_body", True):
+                    fast_done.set()
+
+            async def blocked_reader():
+                # The reader of a finished response stalls until a third request has been served
+                reader_done = asyncio.Event()
+
+                async def stalled_send(message):
+                    await reader_done.wait()
+
+                async def third_send(message):
+                    if not message.get("more_body", True):
+                        reader_done.set()
+
+                await asyncio.gather(
+                    adapter(http_scope("GET", "/", []), fast_receive, stalled_send),
+                    adapter(http_scope("GET", "/", []), fast_receive, third_send),
+                )
+
+            await asyncio.wait_for(asyncio.gather(
+                adapter(http_scope("POST", "/", []), slow_receive, slow_send),
+                adapter(http_scope("GET", "/", []), fast_receive, fast_send),
+            ), timeout=5)
+            self.assertEqual(b"".join(message.get("body", b"") for message in slow_sent[1:]), b"part-rest")
+            await asyncio.wait_for(blocked_reader(), timeout=5)
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import time
+import unittest
+import jwt
+from api_testcase import ApiTestCase
+from db.database import get_reader
+from models.sessions import remove_expired_sessions
+from models.user import create_user
+from utils.auth import SignedTokenSessionBackend
+
+
+class LoginFlowTestCase(ApiTestCase):
+    """Test login, protected routes and logout through the session backend."""
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            create_user("testuser", "testpassword")
+
+    def login(self):
+        response = self.client.post('/login', json={"username": "testuser", "password": "testpassword"})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()["token"]
+
+    def check_flow(self):
+        token = self.login()
+        book = {"title": "T", "author": "A", "isbn": "isbn-1", "published_year": 2020, "genre": "G"}
+        self.assertEqual(self.client.post('/book', json=book, headers={"Authorization": token}).status_code, 201)
+        self.assertEqual(self.client.post('/logout', headers={"Authorization": token}).status_code, 200)
+        self.assertEqual(self.client.post('/logout', headers={"Authorization": token}).status_code, 401)
+
+    def test_database_backend(self):
+        """Opaque tokens work until logout."""
+        self.check_flow()
+
+    def test_signed_backend(self):
+        """Signed tokens work until logout without touching the sessions table."""
+        original = self.app.extensions["session_backend"]
+        self.app.extensions["session_backend"] = SignedTokenSessionBackend("test-secret")
+        try:
+            self.check_flow()
+        finally:
+            self.app.extensions["session_backend"] = original
+
+
+class SignedTokenBackendTestCase(ApiTestCase):
+    """Test signed token validation and revocation."""
+
+    def setUp(self):
+        super().setUp()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+        super().tearDown()
+
+    def test_rejects_expired_and_tampered_tokens(self):
+        """Expiry and signature are both enforced."""
+        backend = SignedTokenSessionBackend("secret", lifetime=1)
+        token = backend.issue(1, "testuser")
+        self.assertTrue(backend.validate(token))
+        self.assertFalse(SignedTokenSessionBackend("other-secret").validate(token))
+        expired = jwt.encode({"sub": "1", "exp": int(time.time()) - 1, "jti": "x"}, "secret", algorithm="HS256")
+        self.assertFalse(backend.validate(expired))
+
+    def test_revocation_is_shared(self):
+        """A logout is stored in the database, so a backend in another process rejects the token too."""
+        token = SignedTokenSessionBackend("secret").issue(1, "testuser")
+        SignedTokenSessionBackend("secret").revoke(token)
+        self.app.extensions.pop("session_cache", None)  # Another process starts with its own cache
+        self.assertFalse(SignedTokenSessionBackend("secret").validate(token))
+
+    def test_expired_revocations_are_swept(self):
+        """Revoked tokens leave the table once they have expired."""
+        backend = SignedTokenSessionBackend("secret", lifetime=1)
+        first = backend.issue(1, "testuser")
+        backend.revoke(first)
+        self.assertFalse(backend.validate(first))
+        time.sleep(2.1)
+        backend.revoke(backend.issue(1, "testuser"))
+        remove_expired_sessions()
+        self.assertEqual(get_reader().execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0], 1)
+
+    def test_requires_secret(self):
+        with self.assertRaises(ValueError):
+            SignedTokenSessionBackend(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from api_testcase import ApiTestCase
+from models.book import get_book, get_book_cache_stats, get_books_by_id, update_book
+
+
+class BatchGetTestCase(ApiTestCase):
+    """Test POST /books/batch-get and the multi-get model functions."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(5)
+        self.app.extensions.pop("book_caches", None)
+
+    def test_ids_in_request_order(self):
+        """Books come back in request order and unknown IDs are reported."""
+        response = self.client.post('/books/batch-get', json={"ids": [4, 99, 1, 4, 2]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([book["id"] for book in data["items"]], [4, 1, 4, 2])
+        self.assertEqual(data["items"][1]["isbn"], "isbn-00000")
+        self.assertEqual(data["missing"], [99])
+
+    def test_isbns(self):
+        """Books can be fetched by ISBN."""
+        data = self.client.post('/books/batch-get', json={"isbns": ["isbn-00003", "nope", "isbn-00001"]}).get_json()
+        self.assertEqual([book["isbn"] for book in data["items"]], ["isbn-00003", "isbn-00001"])
+        self.assertEqual(data["missing"], ["nope"])
+
+    def test_large_batches_are_chunked(self):
+        """Batches longer than one IN list still return every book."""
+        with self.app.app_context():
+            books = get_books_by_id(list(range(1200, 0, -1)))
+        self.assertEqual(len(books), 1200)
+        self.assertEqual([book.id for book in books if book is not None], [5, 4, 3, 2, 1])
+
+    def test_reads_share_the_book_cache(self):
+        """Batch reads fill the book cache and see writes made through the models."""
+        with self.app.app_context():
+            get_books_by_id([1, 2, 3])
+            get_book(2)
+            self.assertEqual(get_book_cache_stats()["hits"], 1)
+            update_book(2, "Renamed", "Author 1", "isbn-00001", 1991, "History")
+            self.assertEqual(get_books_by_id([2])[0].title, "Renamed")
+
+    def test_validation(self):
+        """Malformed bodies and oversized batches are rejected."""
+        for body in ({}, {"ids": [1], "isbns": ["a"]}, {"ids": "1,2"}, {"ids": [1, "2"]}, {"ids": [True]},
+                     {"isbns": [1]}, [1, 2]):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post('/books/batch-get', json=body).status_code, 400)
+        too_many = list(range(self.app.config["BATCH_GET_MAX_ITEMS"] + 1))
+        self.assertEqual(self.client.post('/books/batch-get', json={"ids": too_many}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,51 +1,34 @@
 import random
 import unittest
+from api_testcase import ApiTestCase
 from models.book import create_book, get_all_books
 from db.database import get_db_connection
-from app_factory import create_app
 from flask import current_app
-class BookDatabaseTestCase(unittest.TestCase):
+class BookDatabaseTestCase(ApiTestCase):
     """Test case for the Book API."""
 
     def setUp(self):
-        """Set up the test database before every test."""
-        self.app = create_app(config_name="testing")
-        self.client = self.app.test_client()
+        """Set up a throwaway, fully migrated test database before every test."""
+        super().setUp()
         # Manually push the application context to make sure we can access app's config
         self.app_context = self.app.app_context()
         self.app_context.push()
-        # Initialize the test database for each test
-        self.conn = get_db_connection()  # Pass the database URI here
+        self.conn = get_db_connection()
         self.cursor = self.conn.cursor()
 
-        # Create the books table for each test
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT NOT NULL UNIQUE,
-            published_year INTEGER,
-            genre TEXT,
-            created_at INTEGER
-        )
-        """)
-        self.conn.commit()
-
     def tearDown(self):
         """Clean up the database after every test."""
-        # Drop the books table after each test
-        self.cursor.execute("DROP TABLE IF EXISTS books")
-        self.conn.commit()
-        self.conn.close()
-        # Pop the application context after the test is done
+        # Popping the context returns the connection; the temporary database is removed with its
+        # directory, so the tracked test_database.db never loses its schema
         self.app_context.pop()
+        super().tearDown()
     
     def test_database_connection(self):
         """Verify the test database is being used."""
         with self.app.app_context():
+            self.assertTrue(current_app.config['TESTING'])
             db_uri = current_app.config['DATABASE_URI']
-            self.assertIn('sqlite:///test_database.db', db_uri)
+            self.assertIn(self.db_dir.name, db_uri)
 
 
     def test_create_book(self):
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from models.user import create_user
+
+
+class BulkImportTestCase(ApiTestCase):
+    """Test POST /books/bulk and the import-books CLI command."""
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            create_user("testuser", "testpassword")
+        response = self.client.post('/login', json={"username": "testuser", "password": "testpassword"})
+        self.headers = {"Authorization": response.get_json()["token"]}
+
+    def isbns(self):
+        with self.app.app_context():
+            rows = get_db_connection().execute("SELECT isbn FROM books ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def book(self, isbn, **overrides):
+        return dict({"title": f"Title {isbn}", "author": "Author", "isbn": isbn,
+                     "published_year": 2000, "genre": "Fiction"}, **overrides)
+
+    def test_json_array_with_row_errors(self):
+        """Invalid rows and duplicate ISBNs are reported without aborting the batch."""
+        self.seed_books(1)
+        payload = [
+            self.book("a"),
+            self.book("isbn-00000"),
+            self.book("b", title=""),
+            self.book("a"),
+            self.book("c", published_year="soon"),
+            self.book("d"),
+        ]
+        self.app.config["BULK_IMPORT_BATCH_SIZE"] = 2
+        try:
+            response = self.client.post('/books/bulk', json=payload, headers=self.headers)
+        finally:
+            self.app.config["BULK_IMPORT_BATCH_SIZE"] = 5000
+        report = response.get_json()
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(report["failed"], 4)
+        self.assertEqual([error["row"] for error in sorted(report["errors"], key=lambda e: e["row"])], [2, 3, 4, 5])
+        self.assertEqual(self.isbns(), ["isbn-00000", "a", "d"])
+
+    def test_ndjson_stream(self):
+        """NDJSON bodies are parsed line by line; bad lines are row errors."""
+        body = "\n".join([json.dumps(self.book("a")), "{not json", "", json.dumps(self.book("b"))])
+        response = self.client.post('/books/bulk', data=body, content_type='application/x-ndjson',
+                                    headers=self.headers)
+        report = response.get_json()
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(report["errors"][0]["row"], 2)
+
+    def test_requires_token_and_array(self):
+        self.assertEqual(self.client.post('/books/bulk', json=[self.book("a")]).status_code, 400)
+        self.assertEqual(self.client.post('/books/bulk', json={"a": 1}, headers=self.headers).status_code, 400)
+
+    def test_large_batch_is_searchable(self):
+        """Batches indexed after the insert are searchable and leave the search triggers in place."""
+        payload = [self.book(f"n{i}", title=f"Volume {i}") for i in range(150)]
+        self.assertEqual(self.client.post('/books/bulk', json=payload, headers=self.headers).get_json()["inserted"], 150)
+        self.assertEqual(self.client.get('/books?q=volume').get_json()["total_items"], 150)
+        self.assertEqual(self.client.get('/books?title=lume 14').get_json()["total_items"], 11)
+        self.client.post('/book', json=self.book("single", title="Standalone"), headers=self.headers)
+        self.assertEqual(self.client.get('/books?q=standalone').get_json()["total_items"], 1)
+
+    def test_cli_csv_import(self):
+        """The CLI loads CSV files with a header row."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write("title,author,isbn,published_year,genre\n")
+            handle.write("Dune,Frank Herbert,x1,1965,Science Fiction\n")
+            handle.write("Emma,Jane Austen,x2,,\n")
+            handle.write(",Nobody,x3,2000,\n")
+        self.addCleanup(os.unlink, handle.name)
+        result = self.app.test_cli_runner().invoke(args=["import-books", handle.name, "--batch-size", "1"])
+        self.assertIn("Imported 2 books, 1 failed", result.output)
+        self.assertEqual(self.isbns(), ["x1", "x2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from api_testcase import ApiTestCase
+from models.book import create_book, delete_book, get_book, get_book_cache_stats, update_book
+from utils.cache import LRUCache, ReadThroughCache, SQLiteCache, TieredCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Reading an entry protects it from eviction."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        """Entries past their ttl are misses."""
+        cache = LRUCache(maxsize=10, ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=10)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class ReadThroughCacheTestCase(unittest.TestCase):
+    """Test load-on-miss caching, negative entries and the shared tier."""
+
+    def test_concurrent_misses_load_once(self):
+        """Callers missing the same key together share one load."""
+        cache = ReadThroughCache(LRUCache(maxsize=10))
+        loads = []
+        started = threading.Event()
+
+        def slow_loader(key):
+            loads.append(key)
+            started.set()
+            time.sleep(0.05)
+            return key * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(21, slow_loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(loads, [21])
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_negative_entries(self):
+        """A None result is cached, separately from misses, for negative_ttl."""
+        cache = ReadThroughCache(LRUCache(maxsize=10), negative_ttl=0.05)
+        loads = []
+        loader = lambda key: loads.append(key)
+        self.assertIsNone(cache.get("gone", loader))
+        self.assertIsNone(cache.get("gone", loader))
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.stats()["negative_hits"], 1)
+        time.sleep(0.1)
+        cache.get("gone", loader)
+        self.assertEqual(len(loads), 2)
+
+    def test_invalidation_during_load_is_not_overwritten(self):
+        """A load racing an invalidation does not store its stale result."""
+        cache = ReadThroughCache(LRUCache(maxsize=10))
+
+        def loader(key):
+            cache.invalidate(key)  # A writer commits while the old row is being read
+            return "stale"
+
+        self.assertEqual(cache.get("k", loader), "stale")
+        self.assertEqual(cache.get("k", lambda key: "fresh"), "fresh")
+
+    def test_get_many_loads_misses_together(self):
+        """Only missed keys reach the loader, in one call, and its results are cached."""
+        cache = ReadThroughCache(LRUCache(maxsize=10))
+        cache.get(1, lambda key: "one")
+        batches = []
+
+        def loader(keys):
+            batches.append(keys)
+            return {key: str(key) for key in keys if key != 3}
+
+        self.assertEqual(cache.get_many([2, 1, 3, 2], loader), {1: "one", 2: "2", 3: None})
+        self.assertEqual(batches, [[2, 3]])
+        self.assertEqual(cache.get_many([3, 2], loader), {2: "2", 3: None})
+        self.assertEqual(len(batches), 1)
+
+    def test_shared_tier_spans_caches(self):
+        """Two processes' caches see each other's entries and invalidations."""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        path = os.path.join(cache_dir.name, "cache.db")
+        first = ReadThroughCache(TieredCache(LRUCache(10), SQLiteCache(path), local_ttl=0))
+        second = ReadThroughCache(TieredCache(LRUCache(10), SQLiteCache(path), local_ttl=0))
+        self.assertEqual(first.get(1, lambda key: ("Dune", 1965)), ("Dune", 1965))
+        self.assertEqual(second.get(1, lambda key: self.fail("should be shared")), ["Dune", 1965])
+        first.invalidate(1)
+        self.assertEqual(second.get(1, lambda key: "reloaded"), "reloaded")
+
+
+    def test_shared_invalidation_during_load_is_not_overwritten(self):
+        """A load racing another process's invalidation does not put its stale result in the shared tier."""
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        path = os.path.join(cache_dir.name, "cache.db")
+        writer = ReadThroughCache(TieredCache(LRUCache(10), SQLiteCache(path), local_ttl=0))
+        reader = ReadThroughCache(TieredCache(LRUCache(10), SQLiteCache(path), local_ttl=0))
+
+        def loader(key):
+            writer.invalidate(key)  # Another worker commits an update while the old row is being read
+            return "stale"
+
+        self.assertEqual(reader.get(5, loader), "stale")
+        self.assertEqual(reader.get_many([6], lambda keys: {6: writer.invalidate(6) or "stale"}), {6: "stale"})
+        third = ReadThroughCache(TieredCache(LRUCache(10), SQLiteCache(path), local_ttl=0))
+        self.assertEqual(third.get(5, lambda key: "fresh"), "fresh")
+        self.assertEqual(third.get_many([6], lambda keys: {6: "fresh"}), {6: "fresh"})
+        self.assertEqual(reader.get(5, lambda key: self.fail("should be cached")), "fresh")
+
+
+class BookCacheTestCase(ApiTestCase):
+    """Test the get_book read-through cache against the models."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(2)
+
+    def test_writes_invalidate(self):
+        """Updates, deletes and inserts through the models are visible immediately."""
+        with self.app.app_context():
+            self.assertEqual(get_book(1)[1], "Book 00000")
+            self.assertEqual(get_book(1)[1], "Book 00000")
+            self.assertEqual(get_book_cache_stats()["hits"], 1)
+
+            update_book(1, "Renamed", "Author 0", "isbn-00000", 1990, "History")
+            self.assertEqual(get_book(1)[1], "Renamed")
+
+            delete_book(1)
+            self.assertIsNone(get_book(1))
+
+            self.assertIsNone(get_book(3))
+            create_book("New", "Author", "isbn-new", 2000, "Fiction")
+            self.assertEqual(get_book(3)[1], "New")
+
+    def test_writes_from_another_process_drop_local_copies(self):
+        """A write that moves the catalog version is seen by get_book and by GET /book/<id>."""
+        self.assertEqual(self.client.get('/book/1').get_json()["title"], "Book 00000")
+        path = self.app.config["DATABASE_URI"].split("///")[1]
+        with sqlite3.connect(path) as conn:  # Like another worker, which cannot invalidate this process's cache
+            conn.execute("UPDATE books SET title = 'Renamed elsewhere' WHERE id = 1")
+        conn.close()
+        self.assertEqual(self.client.get('/book/1').get_json()["title"], "Renamed elsewhere")
+        with self.app.app_context():
+            self.assertEqual(get_book(1)[1], "Renamed elsewhere")
+
+    def test_route_uses_cache(self):
+        """GET /book/<id> is answered from the book cache on repeat reads."""
+        self.app.extensions.pop("response_cache", None)
+        self.client.get('/book/2')
+        self.app.extensions.pop("response_cache", None)
+        self.assertEqual(self.client.get('/book/2').get_json()["title"], "Book 00001")
+        with self.app.app_context():
+            self.assertEqual(get_book_cache_stats()["hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
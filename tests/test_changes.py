@@ -0,0 +1,93 @@
+import time
+import unittest
+from api_testcase import ApiTestCase
+from db.database import initialize_db
+from models.book import compact_book_changes, create_books, delete_book, update_book
+
+
+class BookChangesTestCase(ApiTestCase):
+    """Test GET /books/changes and the book_changes log."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(5)
+
+    def tearDown(self):
+        self.app.config["BOOK_SHARDS"] = 0
+        self.app.extensions.pop("response_cache", None)
+        super().tearDown()
+
+    def sync(self, since=0, limit=100):
+        """Follow the feed from `since` to its end, returning every change and the final position."""
+        changes = []
+        while True:
+            data = self.client.get(f'/books/changes?since={since}&limit={limit}').get_json()
+            changes.extend(data["changes"])
+            since = data["next_since"]
+            if not data["has_more"]:
+                return changes, since
+
+    def test_starting_from_zero_lists_every_book(self):
+        """The compacted log holds one upsert per stored book, so a new client bootstraps from 0."""
+        changes, since = self.sync(limit=2)
+        self.assertEqual([change["id"] for change in changes], [1, 2, 3, 4, 5])
+        self.assertTrue(all(change["op"] == "upsert" for change in changes))
+        self.assertEqual(changes[0]["book"]["isbn"], "isbn-00000")
+        self.assertEqual(since, changes[-1]["version"])
+
+    def test_deltas_since_a_position(self):
+        """Only books written after the position are returned, each once, with deletes as tombstones."""
+        _, since = self.sync()
+        with self.app.app_context():
+            update_book(2, "First edit", "Author 1", "isbn-00001", 1991, "Fiction")
+            update_book(2, "Second edit", "Author 1", "isbn-00001", 1991, "Fiction")
+            delete_book(4)
+        changes, since = self.sync(since)
+        self.assertEqual([(change["id"], change["op"]) for change in changes], [(2, "upsert"), (4, "delete")])
+        self.assertEqual(changes[0]["book"]["title"], "Second edit")
+        self.assertIsNone(changes[1]["book"])
+        self.assertEqual(self.sync(since)[0], [])
+
+    def test_bulk_inserts_are_logged(self):
+        """Batches that suspend the per-row triggers still log every new book."""
+        _, since = self.sync()
+        with self.app.app_context():
+            create_books([(f"Bulk {i}", "Author", f"bulk-{i}", 2000, "Fiction") for i in range(150)])
+        changes, _ = self.sync(since, limit=1000)
+        self.assertEqual(len(changes), 150)
+        self.assertEqual([change["id"] for change in changes], list(range(6, 156)))
+
+    def test_compaction(self):
+        """Old tombstones are removed; positions before them get 410 while 0 still works."""
+        _, before = self.sync()
+        with self.app.app_context():
+            delete_book(1)
+            _, after = self.sync(before)
+            self.assertEqual(compact_book_changes(int(time.time()) + 1), 1)
+        self.assertEqual(self.client.get(f'/books/changes?since={before}').status_code, 410)
+        self.assertEqual(self.sync(after)[0], [])
+        changes, _ = self.sync()
+        self.assertEqual([change["id"] for change in changes], [2, 3, 4, 5])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/books/changes?since=abc').status_code, 400)
+        self.assertEqual(self.client.get('/books/changes?since=1.2').status_code, 400)
+        self.assertEqual(self.client.get('/books/changes?limit=0').status_code, 400)
+
+    def test_sharded_positions(self):
+        """With shards the position carries one version per shard and no change is skipped."""
+        self.app.config["BOOK_SHARDS"] = 3
+        with self.app.app_context():
+            initialize_db()
+        self.seed_books(12, title="Sharded")  # Books in the main database are outside the sharded catalog
+        changes, since = self.sync(limit=4)
+        self.assertEqual(len(since.split(".")), 3)
+        self.assertEqual(len(changes), 12)
+        with self.app.app_context():
+            delete_book(changes[0]["id"])
+        delta, _ = self.sync(since, limit=4)
+        self.assertEqual([(change["id"], change["op"]) for change in delta], [(changes[0]["id"], "delete")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,315 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from api_testcase import ApiTestCase
+from app_factory import create_app
+from click.testing import CliRunner
+from flask.cli import FlaskGroup
+from db.migrations import LATEST_VERSION, get_schema_version, migrate
+from db.database import (
+    ConnectionPool, SerializedWriter, get_reader, get_reader_pool, get_sqlite_profile, get_writer,
+    log_sqlite_profile,
+)
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    """Test the SQLite connection pool."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.db_dir.name, "pool.db")
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def test_connections_are_reused(self):
+        """A released connection is handed out again instead of opening a new one."""
+        pool = ConnectionPool(self.path, size=2, timeout=0.1)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        stats = pool.stats()
+        self.assertEqual(stats["creates"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_pragmas_applied_on_connect(self):
+        """Configured pragmas are applied to each new connection."""
+        pool = ConnectionPool(self.path, size=1, timeout=0.1, pragmas={"cache_size": -4000})
+        conn = pool.acquire()
+        self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -4000)
+
+    def test_exhausted_pool_times_out(self):
+        """Waiting on a full pool raises once the timeout expires and is recorded."""
+        pool = ConnectionPool(self.path, size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire()
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_closed_connection_is_discarded(self):
+        """A connection closed by its user does not go back into the pool."""
+        pool = ConnectionPool(self.path, size=1, timeout=0.05)
+        conn = pool.acquire()
+        conn.close()
+        pool.release(conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+
+class SerializedWriterTestCase(unittest.TestCase):
+    """Test the single writer and its group commit."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.db_dir.name, "writer.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+        conn.close()
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def names(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+        finally:
+            conn.close()
+
+    def submit_concurrently(self, writer, names):
+        errors = {}
+
+        def insert(name):
+            try:
+                writer.submit(lambda conn: conn.execute("INSERT INTO items (name) VALUES (?)", (name,)))
+            except sqlite3.IntegrityError as e:
+                errors[name] = e
+
+        threads = [threading.Thread(target=insert, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_group_commit_batches_writes(self):
+        """Concurrent writes share commits, and a failing write is rolled back alone."""
+        writer = SerializedWriter(self.path, window=0.05)
+        names = [f"item-{i}" for i in range(20)] + ["item-0"]
+        errors = self.submit_concurrently(writer, names)
+        self.assertEqual(list(errors), ["item-0"])
+        self.assertEqual(self.names(), sorted(set(names)))
+        stats = writer.stats()
+        self.assertEqual(stats["jobs"], 21)
+        self.assertEqual(stats["failed"], 1)
+        self.assertLess(stats["commits"], 21)
+
+    def test_without_window_each_write_commits(self):
+        """With no window every write is its own transaction."""
+        writer = SerializedWriter(self.path)
+        for i in range(3):
+            row_id = writer.submit(lambda conn: conn.execute("INSERT INTO items (name) VALUES (?)", (str(i),)).lastrowid)
+            self.assertEqual(row_id, i + 1)
+        self.assertEqual(writer.stats()["commits"], 3)
+
+    def test_idle_writer_stops_and_restarts(self):
+        """The writer thread exits when idle and comes back on the next write."""
+        writer = SerializedWriter(self.path, idle_timeout=0.05)
+        writer.submit(lambda conn: conn.execute("INSERT INTO items (name) VALUES ('a')"))
+        time.sleep(0.2)
+        self.assertIsNone(writer._thread)
+        writer.submit(lambda conn: conn.execute("INSERT INTO items (name) VALUES ('b')"))
+        self.assertEqual(self.names(), ["a", "b"])
+
+
+class MigrationTestCase(unittest.TestCase):
+    """Test the versioned schema migrations."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.db_dir.name, "legacy.db"))
+
+    def tearDown(self):
+        self.conn.close()
+        self.db_dir.cleanup()
+
+    def test_upgrades_unversioned_database(self):
+        """A database created before migrations keeps its rows and gains the new schema."""
+        self.conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                          "author TEXT NOT NULL, isbn TEXT NOT NULL UNIQUE, published_year INTEGER, "
+                          "genre TEXT, created_at INTEGER)")
+        self.conn.execute("INSERT INTO books (title, author, isbn) VALUES ('Dune', 'Frank Herbert', '1')")
+        self.conn.commit()
+
+        self.assertEqual(migrate(self.conn), list(range(1, LATEST_VERSION + 1)))
+        self.assertEqual(get_schema_version(self.conn), LATEST_VERSION)
+        indexes = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn("idx_books_published_year_id", indexes)
+        self.assertEqual(self.conn.execute("SELECT rowid FROM books_fts WHERE books_fts MATCH 'dune'").fetchall(), [(1,)])
+
+    def test_migrations_run_once(self):
+        """A current database has nothing left to apply."""
+        migrate(self.conn)
+        self.assertEqual(migrate(self.conn), [])
+
+
+class RequestConnectionTestCase(ApiTestCase):
+    """Test that requests share pooled connections."""
+
+    def test_requests_reuse_connections(self):
+        """Consecutive requests do not open new reader connections."""
+        self.seed_books(3)
+        self.client.get('/books')
+        with self.app.app_context():
+            before = get_reader_pool().stats()
+        for _ in range(5):
+            self.client.get('/books')
+            self.client.get('/book/1')
+        with self.app.app_context():
+            after = get_reader_pool().stats()
+        self.assertEqual(after["creates"], before["creates"])
+        self.assertGreaterEqual(after["hits"] - before["hits"], 10)
+
+
+class ReaderWriterTestCase(ApiTestCase):
+    """Test the read-only connections models read through."""
+
+    def test_readers_are_read_only(self):
+        """Reader connections reject writes."""
+        with self.app.app_context():
+            with self.assertRaises(sqlite3.OperationalError):
+                get_reader().execute("DELETE FROM books")
+
+    def test_reads_do_not_wait_for_writes(self):
+        """Reads return the last committed snapshot while the writer holds its lock."""
+        self.seed_books(2)
+        in_write = threading.Event()
+        finish = threading.Event()
+
+        def slow_write(conn):
+            conn.execute("DELETE FROM books")
+            in_write.set()
+            finish.wait(5)
+
+        with self.app.app_context():
+            writer = threading.Thread(target=get_writer().submit, args=(slow_write,))
+            writer.start()
+            try:
+                in_write.wait(5)
+                started = time.perf_counter()
+                count = get_reader().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+                self.assertLess(time.perf_counter() - started, 0.5)
+                self.assertEqual(count, 2)
+            finally:
+                finish.set()
+                writer.join()
+            self.assertEqual(self.client.get('/books').status_code, 404)
+
+
+class SQLiteProfileTestCase(ApiTestCase):
+    """Test that the configured SQLite profile is applied to connections."""
+
+    def test_profile_is_effective(self):
+        """Every pragma of the testing profile is in effect on pooled connections."""
+        with self.app.app_context():
+            profile = get_sqlite_profile()
+        self.assertEqual(profile["journal_mode"]["effective"], "wal")
+        self.assertEqual(profile["synchronous"]["effective"], 0)
+        self.assertEqual(profile["temp_store"]["effective"], 2)
+        self.assertEqual(profile["busy_timeout"]["effective"], 5000)
+
+    def test_mismatch_is_logged(self):
+        """Settings a connection is not actually using are reported as warnings."""
+        original = self.app.config["SQLITE_PRAGMAS"]
+        self.app.config["SQLITE_PRAGMAS"] = dict(original, journal_mode="MEMORY")
+        try:
+            with self.app.app_context(), self.assertLogs(self.app.logger, level="WARNING") as logs:
+                log_sqlite_profile()
+        finally:
+            self.app.config["SQLITE_PRAGMAS"] = original
+        self.assertTrue(any("instead of the configured 'MEMORY'" in line for line in logs.output))
+
+    def test_profile_is_surfaced(self):
+        """The effective profile is logged at INFO, which the configured logger level emits, and printed by the CLI."""
+        self.assertTrue(self.app.logger.isEnabledFor(logging.INFO))
+        with self.app.app_context(), self.assertLogs(self.app.logger, level="INFO") as logs:
+            log_sqlite_profile()
+        self.assertTrue(logs.output[0].startswith("INFO:"))
+        self.assertIn("SQLite profile for", logs.output[0])
+        result = self.app.test_cli_runner().invoke(args=["sqlite-profile"])
+        self.assertIn("synchronous: configured", result.output)
+
+
+class StartupTestCase(unittest.TestCase):
+    """Test that create_app only checks the schema, and the migrate command."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.db_dir.name, "startup.db")
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def make_app(self, **overrides):
+        return create_app("testing", {"DATABASE_URI": f"sqlite:///{self.path}", **overrides})
+
+    def snapshot(self):
+        files = (self.path, self.path + "-wal")
+        return [(open(path, "rb").read() if os.path.exists(path) else None) for path in files]
+
+    def test_current_schema_is_not_written(self):
+        """A second boot against a migrated, seeded database writes nothing."""
+        self.make_app()
+        before = self.snapshot()
+        self.make_app()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_boot_does_not_switch_journal_mode(self):
+        """Logging the SQLite profile at startup never takes the write lock to change journal_mode."""
+        conn = sqlite3.connect(self.path)  # Migrated outside the app, so still in rollback-journal mode
+        migrate(conn)
+        conn.close()
+        with self.assertLogs(level="WARNING") as logs:
+            self.make_app(AUTO_MIGRATE=False, SEED_TEST_USER=False)
+        self.assertIn("journal_mode is 'delete'", "\n".join(logs.output))
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+
+    def test_seeding_is_opt_in(self):
+        """SEED_TEST_USER controls the default user."""
+        self.make_app(SEED_TEST_USER=False)
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone()[0], 0)
+
+    def test_outdated_schema_refuses_to_start(self):
+        """Without AUTO_MIGRATE an outdated schema stops create_app instead of serving requests."""
+        with self.assertRaisesRegex(RuntimeError, "flask --app app migrate"):
+            self.make_app(AUTO_MIGRATE=False, SEED_TEST_USER=False)
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(get_schema_version(conn), 0)
+
+    def test_migrate_command(self):
+        """The schema is left alone until `flask migrate` runs, which can load the app on an outdated schema."""
+        cli = FlaskGroup(create_app=lambda: self.make_app(AUTO_MIGRATE=False, SEED_TEST_USER=False))
+        runner = CliRunner()
+
+        with self.assertLogs(level="WARNING") as logs:
+            result = runner.invoke(cli, ["migrate", "--check"])
+        self.assertIn("flask --app app migrate", "\n".join(logs.output))
+        self.assertEqual(result.exit_code, 1)
+        result = runner.invoke(cli, ["migrate"])
+        self.assertIn(f"schema version {LATEST_VERSION}", result.output)
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(get_schema_version(conn), LATEST_VERSION)
+        result = runner.invoke(cli, ["migrate", "--check"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("up to date", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+from api_testcase import ApiTestCase
+
+
+class BookExportTestCase(ApiTestCase):
+    """Test the streaming GET /books/export endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(25)
+        self.app.config["EXPORT_CHUNK_SIZE"] = 4
+
+    def tearDown(self):
+        self.app.config["EXPORT_CHUNK_SIZE"] = 1000
+        super().tearDown()
+
+    def test_ndjson(self):
+        """Every book is written as one JSON object per line, in id order."""
+        response = self.client.get('/books/export')
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        books = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([book["id"] for book in books], list(range(1, 26)))
+        self.assertEqual(books[0]["isbn"], "isbn-00000")
+
+    def test_csv_with_filters(self):
+        """CSV exports have a header row and honour the GET /books filters."""
+        response = self.client.get('/books/export?format=csv&genre=fiction')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(len(rows), 12)
+        self.assertTrue(all(row["genre"] == "Fiction" for row in rows))
+
+    def test_gzip(self):
+        """The stream is gzipped on request or when the client accepts it."""
+        for url, headers in (('/books/export?gzip=1', {}), ('/books/export', {'Accept-Encoding': 'gzip'})):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(len(gzip.decompress(response.get_data()).splitlines()), 25)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/books/export?format=xml').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
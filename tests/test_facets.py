@@ -0,0 +1,76 @@
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from db.migrations import FACET_EXPRESSIONS
+from models.book import create_books, delete_book, update_book
+
+
+class FacetsTestCase(ApiTestCase):
+    """Test GET /books/facets and the book_facets summary table."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(20)  # Genres alternate History/Fiction, years cycle from 1990
+
+    def grouped(self, facet):
+        """Count a facet with a full GROUP BY over books, as the summary table should."""
+        value = FACET_EXPRESSIONS[facet].format(row="books")
+        with self.app.app_context():
+            rows = get_db_connection().execute(
+                f"SELECT {value}, COUNT(*) FROM books WHERE {value} IS NOT NULL GROUP BY 1"
+            ).fetchall()
+        return dict(rows)
+
+    def summary(self, facet):
+        with self.app.app_context():
+            rows = get_db_connection().execute(
+                "SELECT value, count FROM book_facets WHERE facet = ?", (facet,)
+            ).fetchall()
+        return dict(rows)
+
+    def test_unfiltered_counts(self):
+        """Unfiltered facets come from the summary table, most common first."""
+        data = self.client.get('/books/facets?facets=genre,decade&limit=5').get_json()
+        self.assertEqual(data["facets"]["genre"], [{"value": "Fiction", "count": 10}, {"value": "History", "count": 10}])
+        self.assertEqual(data["facets"]["decade"], [{"value": 1990, "count": 10}, {"value": 2000, "count": 10}])
+
+    def test_filtered_counts(self):
+        """Filters are the same as GET /books and restrict the counted rows."""
+        data = self.client.get('/books/facets?facets=genre,published_year&published_year=1991').get_json()
+        self.assertEqual(data["facets"]["genre"], [{"value": "Fiction", "count": 1}])
+        self.assertEqual(data["facets"]["published_year"], [{"value": 1991, "count": 1}])
+        data = self.client.get('/books/facets?facets=author&q=Book&limit=2').get_json()
+        self.assertEqual(data["facets"]["author"], [{"value": "Author 0", "count": 3}, {"value": "Author 1", "count": 3}])
+
+    def test_summary_follows_writes(self):
+        """Inserts, bulk inserts, updates and deletes keep the summary equal to a GROUP BY."""
+        with self.app.app_context():
+            update_book(1, "Renamed", "New Author", "isbn-00000", 1975, "Poetry")
+            delete_book(2)
+            create_books([(f"Bulk {i}", f"Bulk Author {i % 3}", f"bulk-{i}", 2010 + i % 4, None) for i in range(150)])
+            create_books([("Small", "Bulk Author 0", "small-1", None, "Poetry")])
+        for facet in FACET_EXPRESSIONS:
+            with self.subTest(facet=facet):
+                self.assertEqual(self.summary(facet), self.grouped(facet))
+        self.assertNotIn(None, self.summary("genre"))
+
+    def test_summary_reads_use_the_count_index(self):
+        """The most common values of a facet are read in index order, without a sort."""
+        with self.app.app_context():
+            plan = " ".join(row[3] for row in get_db_connection().execute(
+                "EXPLAIN QUERY PLAN SELECT value, count FROM book_facets WHERE facet = ? "
+                "ORDER BY count DESC, value LIMIT ?", ("author", 10)
+            ))
+        self.assertIn("idx_book_facets_count", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_validation(self):
+        """Unknown facets and bad limits are rejected."""
+        self.assertEqual(self.client.get('/books/facets?facets=genre,color').status_code, 400)
+        self.assertEqual(self.client.get('/books/facets?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/books/facets?limit=x').status_code, 400)
+        self.assertEqual(set(self.client.get('/books/facets').get_json()["facets"]), set(FACET_EXPRESSIONS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from models.book import update_book
+from utils.http_cache import get_response_cache_stats
+
+
+class ConditionalGetTestCase(ApiTestCase):
+    """Test ETags and the response cache on catalog reads."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(3)
+        self.app.extensions.pop("response_cache", None)
+
+    def test_if_none_match_returns_304(self):
+        """A client holding the current ETag gets an empty 304."""
+        first = self.client.get('/book/1')
+        etag = first.headers['ETag']
+        second = self.client.get('/book/1', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.get_data(), b"")
+        self.assertEqual(second.headers['ETag'], etag)
+
+    def test_etag_depends_on_normalized_query(self):
+        """Parameter order does not matter, parameter values do."""
+        a = self.client.get('/books?page=1&per_page=2').headers['ETag']
+        b = self.client.get('/books?per_page=2&page=1').headers['ETag']
+        c = self.client.get('/books?per_page=3&page=1').headers['ETag']
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_repeat_reads_hit_the_cache(self):
+        """The second identical read is served from the response cache."""
+        body = self.client.get('/books').get_data()
+        self.assertEqual(self.client.get('/books').get_data(), body)
+        with self.app.app_context():
+            self.assertEqual(get_response_cache_stats()["hits"], 1)
+
+    def test_writes_invalidate(self):
+        """Any write to books, including raw SQL, changes the ETag and the body."""
+        etag = self.client.get('/book/1').headers['ETag']
+        with self.app.app_context():
+            update_book(1, "Renamed", "Author 0", "isbn-00000", 1990, "History")
+        response = self.client.get('/book/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["title"], "Renamed")
+
+        # GET /book/<id> also goes through the book cache, which only model writes
+        # invalidate, so check the raw-SQL case against the list endpoint
+        etag = self.client.get('/books').headers['ETag']
+        with self.app.app_context():
+            conn = get_db_connection()
+            conn.execute("DELETE FROM books WHERE id = 1")
+            conn.commit()
+        response = self.client.get('/books', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["total_items"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import copy
+import os
+import unittest
+from api_testcase import ApiTestCase
+from benchmarks.loadtest import WORKLOAD, _inprocess_sender, compare, drive, seed_catalog
+
+
+class LoadTestHarnessTestCase(ApiTestCase):
+    """Test the load-test harness end to end on a tiny catalog."""
+
+    def test_drive_and_compare(self):
+        """Every endpoint of the mix is exercised without errors, and regressions are flagged."""
+        seed_catalog(self.app, os.path.join(self.db_dir.name, "loadtest.db"), 60)
+        endpoints = drive(lambda: _inprocess_sender(self.app), 60, threads=2, duration=0.5)
+        self.assertEqual(set(endpoints), set(WORKLOAD))
+        for name, stats in endpoints.items():
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertLessEqual(stats["p50_ms"], stats["p95_ms"])
+            self.assertLessEqual(stats["p95_ms"], stats["p99_ms"])
+
+        baseline = {"endpoints": endpoints}
+        self.assertEqual(compare(baseline, copy.deepcopy(baseline), 0.1), [])
+        slower = copy.deepcopy(baseline)
+        slower["endpoints"]["GET /book/<id>"]["p95_ms"] = endpoints["GET /book/<id>"]["p95_ms"] * 2 + 1
+        self.assertEqual(len(compare(baseline, slower, 0.1)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
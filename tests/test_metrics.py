@@ -0,0 +1,91 @@
+import logging
+import sqlite3
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_reader
+from models.user import create_user
+from utils.metrics import MetricsRegistry, normalize_sql
+
+
+class MetricsTestCase(ApiTestCase):
+    """Test request and SQL instrumentation, /metrics and Server-Timing."""
+
+    def setUp(self):
+        self.original_enabled = self.__class__.app_config("METRICS_ENABLED", True)
+        super().setUp()
+        self.app.extensions.pop("metrics", None)
+        self.app.extensions.pop("response_cache", None)
+        self.seed_books(5)
+
+    def tearDown(self):
+        self.app_config("METRICS_ENABLED", self.original_enabled)
+        super().tearDown()
+
+    @staticmethod
+    def app_config(name, value):
+        from app import app
+        original = app.config[name]
+        app.config[name] = value
+        return original
+
+    def test_server_timing(self):
+        """Responses break their time down into phases, including the SQL run."""
+        header = self.client.get('/books?per_page=2').headers["Server-Timing"]
+        phases = dict(entry.split(";", 1) for entry in header.split(", "))
+        self.assertIn("db", phases)
+        self.assertIn("serialize", phases)
+        self.assertIn("total", phases)
+        self.assertIn('statements"', phases["db"])
+
+    def test_auth_phase(self):
+        """Authenticated routes report the token check."""
+        with self.app.app_context():
+            create_user("testuser", "testpassword")
+        token = self.client.post('/login', json={"username": "testuser", "password": "testpassword"}).get_json()["token"]
+        response = self.client.delete('/book/1', headers={"Authorization": token})
+        self.assertIn("auth;dur=", response.headers["Server-Timing"])
+        self.assertIn("write;dur=", response.headers["Server-Timing"])
+
+    def test_prometheus_endpoint(self):
+        """/metrics exposes route histograms and per-statement counters."""
+        self.client.get('/book/1')
+        self.client.get('/book/2')
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/book/<int:book_id>",status="200"} 2',
+                      body)
+        self.assertIn('le="+Inf"', body)
+        self.assertIn('sqlite_statements_total{statement="SELECT * FROM books WHERE id = ?"} 2', body)
+        self.assertIn("sqlite_slow_statements_total 0", body)
+
+    def test_disabled(self):
+        """With metrics off there is no header, no endpoint and no instrumented connection."""
+        self.app_config("METRICS_ENABLED", False)
+        self.app.extensions.pop("sqlite_reader_pools", None)
+        response = self.client.get('/book/1')
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with self.app.app_context():
+            self.assertIs(type(get_reader()), sqlite3.Connection)
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    """Test statement normalization and slow-query logging."""
+
+    def test_normalize_sql(self):
+        """Whitespace and IN lists of any length collapse to one label."""
+        self.assertEqual(normalize_sql("SELECT *\n  FROM books WHERE id IN (?, ?,?)"),
+                         "SELECT * FROM books WHERE id IN (?, ...)")
+        self.assertEqual(normalize_sql("SELECT 1 WHERE a IN (?)"), "SELECT 1 WHERE a IN (?)")
+
+    def test_slow_queries_are_logged(self):
+        """Statements over the threshold are counted and logged."""
+        registry = MetricsRegistry(slow_query_threshold=0.05)
+        with self.assertLogs("library.sql.slow", logging.WARNING) as logs:
+            registry.observe_statement("SELECT slow", 0.2)
+        registry.observe_statement("SELECT fast", 0.001)
+        self.assertIn("SELECT slow", logs.output[0])
+        self.assertIn("sqlite_slow_statements_total 1", registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from utils.pagination import encode_cursor
+
+
+class BooksPaginationTestCase(ApiTestCase):
+    """Test GET /books pagination pushed down into SQL."""
+
+    def test_first_page_envelope(self):
+        """The envelope keeps its shape and only holds one page of items."""
+        self.seed_books(25)
+        response = self.client.get('/books?page=1&per_page=10')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data["total_items"], 25)
+        self.assertEqual(data["total_pages"], 3)
+        self.assertEqual(data["current_page"], 1)
+        self.assertEqual(data["per_page"], 10)
+        self.assertEqual([b["isbn"] for b in data["items"]], [f"isbn-{i:05d}" for i in range(10)])
+
+    def test_last_page_and_filters(self):
+        """Filters are applied before LIMIT/OFFSET and counted with COUNT(*)."""
+        self.seed_books(25)
+        response = self.client.get('/books?genre=fic&page=2&per_page=10')
+        data = response.get_json()
+        self.assertEqual(data["total_items"], 12)
+        self.assertEqual(len(data["items"]), 2)
+        self.assertTrue(all(b["genre"] == "Fiction" for b in data["items"]))
+
+    def test_invalid_page(self):
+        """Out-of-range pages and page sizes are rejected."""
+        self.seed_books(5)
+        self.assertEqual(self.client.get('/books?page=2').status_code, 400)
+        self.assertEqual(self.client.get('/books?per_page=0').status_code, 400)
+        self.assertEqual(self.client.get('/books?per_page=abc').status_code, 400)
+
+    def test_no_books(self):
+        """An empty result is still reported as 404."""
+        self.assertEqual(self.client.get('/books?title=missing').status_code, 404)
+
+
+class BooksKeysetPaginationTestCase(ApiTestCase):
+    """Test the opt-in cursor mode of GET /books."""
+
+    def walk(self, query):
+        """Follow next_cursor until exhausted and return every item seen."""
+        response = self.client.get(f'/books?pagination=cursor&{query}')
+        data = response.get_json()
+        items = list(data["items"])
+        while data["next_cursor"]:
+            self.assertNotIn("total_pages", data)
+            data = self.client.get(f'/books?after={data["next_cursor"]}&{query}').get_json()
+            items.extend(data["items"])
+        return items
+
+    def test_walk_matches_offset_order(self):
+        """Walking with cursors visits the same rows, in order, as page numbers."""
+        self.seed_books(23)
+        for sort in ("id", "author", "published_year"):
+            expected = self.client.get(f'/books?sort={sort}&per_page=100').get_json()["items"]
+            walked = self.walk(f'sort={sort}&per_page=5')
+            self.assertEqual([b["id"] for b in walked], [b["id"] for b in expected])
+
+    def test_null_sort_values(self):
+        """Books with a NULL sort value are neither skipped nor repeated."""
+        self.seed_books(6)
+        with self.app.app_context():
+            conn = get_db_connection()
+            conn.execute("UPDATE books SET published_year = NULL WHERE id % 3 = 0")
+            conn.commit()
+            conn.close()
+        walked = self.walk('sort=published_year&per_page=2')
+        self.assertEqual(sorted(b["id"] for b in walked), list(range(1, 7)))
+        self.assertEqual([b["published_year"] for b in walked[:2]], [None, None])
+
+    def test_cursor_validation(self):
+        """Malformed cursors and cursors for another sort order are rejected."""
+        self.seed_books(3)
+        data = self.client.get('/books?pagination=cursor&per_page=1').get_json()
+        self.assertEqual(self.client.get('/books?after=garbage').status_code, 400)
+        self.assertEqual(self.client.get(f'/books?after={data["next_cursor"]}&sort=title').status_code, 400)
+        self.assertEqual(self.client.get('/books?sort=genre').status_code, 400)
+
+    def test_cursor_value_types(self):
+        """Cursor values that do not fit the sort field are a 400, not a database error."""
+        self.seed_books(3)
+        for sort, value, last_id in (("title", {"x": 1}, 3), ("title", ["a"], 3), ("title", 5, 3),
+                                     ("published_year", "1990", 3), ("published_year", True, 3),
+                                     ("id", None, 3), ("author", "Author 1", True)):
+            with self.subTest(sort=sort, value=value, last_id=last_id):
+                token = encode_cursor(sort, value, last_id)
+                response = self.client.get(f'/books?sort={sort}&after={token}')
+                self.assertEqual(response.status_code, 400)
+        token = encode_cursor("published_year", None, 2)
+        self.assertEqual(self.client.get(f'/books?sort=published_year&after={token}').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import threading
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from models.user import authenticate_user, create_user
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+class PasswordHasherTestCase(unittest.TestCase):
+    """Test hashing, verification and the bounded check pool."""
+
+    def test_round_trip(self):
+        """Both algorithms verify their own hashes and reject wrong passwords."""
+        for hasher in (PasswordHasher(scrypt_n=2 ** 8), PasswordHasher("pbkdf2_sha256", pbkdf2_iterations=1000)):
+            encoded = hasher.hash("secret")
+            self.assertTrue(encoded.startswith(hasher.algorithm + "$"))
+            self.assertNotIn("secret", encoded)
+            self.assertTrue(hasher.check("secret", encoded))
+            self.assertFalse(hasher.check("wrong", encoded))
+            self.assertFalse(hasher.check("secret", None))
+            self.assertFalse(hasher.needs_rehash(encoded))
+
+    def test_needs_rehash(self):
+        """Plaintext and hashes made with other settings are flagged, yet still verify."""
+        old = PasswordHasher(scrypt_n=2 ** 8).hash("secret")
+        hasher = PasswordHasher(scrypt_n=2 ** 9)
+        self.assertTrue(hasher.needs_rehash(old))
+        self.assertTrue(hasher.verify("secret", old))
+        self.assertTrue(hasher.needs_rehash("secret"))
+        self.assertTrue(hasher.verify("secret", "secret"))
+        self.assertFalse(hasher.verify("secret", "scrypt$garbage"))
+        self.assertTrue(hasher.needs_rehash("scrypt$x$salt$hash"))
+
+    def test_derivations_run_on_the_pool(self):
+        """The dummy hash and upgraded hashes are derived by pool threads, never by the caller."""
+        hasher = PasswordHasher(scrypt_n=2 ** 9)
+        old = PasswordHasher(scrypt_n=2 ** 8).hash("secret")
+        threads = []
+        derive = hasher._derive
+
+        def recording_derive(*args):
+            threads.append(threading.current_thread().name)
+            return derive(*args)
+
+        hasher._derive = recording_derive
+        self.assertEqual(hasher.check_and_rehash("secret", None), (False, None))
+        matched, hashed = hasher.check_and_rehash("secret", old)
+        self.assertTrue(matched)
+        self.assertFalse(hasher.needs_rehash(hashed))
+        self.assertEqual(hasher.check_and_rehash("wrong", old), (False, None))
+        self.assertEqual(hasher.check_and_rehash("secret", hashed), (True, None))
+        self.assertEqual(len(threads), 6)  # Dummy hash and its check, check and rehash, two checks
+        self.assertTrue(all(name.startswith("password-hasher") for name in threads), threads)
+
+    def test_rejects_when_saturated(self):
+        """Checks beyond max_pending fail fast instead of queueing."""
+        hasher = PasswordHasher(scrypt_n=2 ** 8, max_pending=2)
+        encoded = hasher.hash("secret")
+        hasher._slots.acquire()
+        self.assertTrue(hasher.check("secret", encoded))
+        hasher._slots.acquire()  # Both slots now in flight
+        with self.assertRaises(PasswordHasherBusy):
+            hasher.check("secret", encoded)
+
+    def test_timeout(self):
+        """A check that cannot finish within the budget raises PasswordHasherBusy."""
+        hasher = PasswordHasher(scrypt_n=2 ** 8, workers=1, timeout=0.05)
+        release = threading.Event()
+        hasher._executor.submit(release.wait)
+        try:
+            with self.assertRaises(PasswordHasherBusy):
+                hasher.check("secret", hasher.hash("secret"))
+        finally:
+            release.set()
+
+
+class LoginHashingTestCase(ApiTestCase):
+    """Test password storage and upgrades through the models and /login."""
+
+    def stored_password(self, username):
+        with self.app.app_context():
+            row = get_db_connection().execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0]
+
+    def test_plaintext_is_upgraded_on_login(self):
+        """A legacy plaintext password still logs in and is replaced by a hash."""
+        with self.app.app_context():
+            conn = get_db_connection()
+            conn.execute("INSERT INTO users (username, password) VALUES ('legacy', 'hunter2')")
+            conn.commit()
+        response = self.client.post('/login', json={"username": "legacy", "password": "hunter2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.stored_password("legacy").startswith("scrypt$"))
+        self.assertEqual(self.client.post('/login', json={"username": "legacy", "password": "hunter2"}).status_code, 200)
+
+    def test_cost_change_rehashes(self):
+        """Raising the configured cost rehashes a user's password at their next login."""
+        with self.app.app_context():
+            create_user("alice", "pw")
+        before = self.stored_password("alice")
+        original = self.app.extensions["password_hasher"]
+        self.app.extensions["password_hasher"] = PasswordHasher("pbkdf2_sha256", pbkdf2_iterations=2000)
+        try:
+            with self.app.app_context():
+                self.assertIsNotNone(authenticate_user("alice", "pw"))
+                self.assertIsNone(authenticate_user("alice", "wrong"))
+                self.assertIsNone(authenticate_user("nobody", "pw"))
+        finally:
+            self.app.extensions["password_hasher"] = original
+        self.assertTrue(before.startswith("scrypt$"))
+        self.assertTrue(self.stored_password("alice").startswith("pbkdf2_sha256$2000$"))
+
+    def test_busy_login_returns_503(self):
+        """A saturated hasher answers /login with 503 and Retry-After."""
+        original = self.app.extensions["password_hasher"]
+        hasher = self.app.extensions["password_hasher"] = PasswordHasher(scrypt_n=2 ** 8, max_pending=1)
+        hasher._slots.acquire()
+        try:
+            response = self.client.post('/login', json={"username": "testuser", "password": "testpassword"})
+        finally:
+            self.app.extensions["password_hasher"] = original
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == '__main__':
+    unittest.main()
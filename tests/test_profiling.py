@@ -0,0 +1,120 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+from app_factory import create_app
+from utils.profiling import RequestProfiler
+
+
+class ProfilingTestCase(unittest.TestCase):
+    """Test the opt-in request profiler."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profile_dir = os.path.join(self.tmp.name, "profiles")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_app(self, **overrides):
+        app = create_app("testing", {
+            "DATABASE_URI": f"sqlite:///{os.path.join(self.tmp.name, 'profile.db')}",
+            "PROFILING_ENABLED": True,
+            "PROFILING_DIR": self.profile_dir,
+            "PROFILING_SAMPLE_RATE": 0.0,
+            "PROFILING_SLOW_SECONDS": None,
+            "PROFILING_INTERVAL": 0.001,
+            **overrides,
+        })
+
+        @app.route('/work/<int:ms>')
+        def work(ms):
+            deadline = time.perf_counter() + ms / 1000
+            while time.perf_counter() < deadline:
+                pass
+            return {"ok": True}
+
+        return app
+
+    def profiles(self, suffix):
+        return sorted(name for name in os.listdir(self.profile_dir) if name.endswith(suffix))
+
+    def test_disabled_registers_nothing(self):
+        """With profiling off no hooks are added and no directory is created."""
+        app = self.make_app(PROFILING_ENABLED=False)
+        app.test_client().get('/work/1')
+        self.assertNotIn("profiler", app.extensions)
+        self.assertFalse(os.path.exists(self.profile_dir))
+
+    def test_slow_requests_are_kept(self):
+        """Requests over the threshold are written as collapsed stacks with route and query tags."""
+        client = self.make_app(PROFILING_SLOW_SECONDS=0.03).test_client()
+        client.get('/work/1')
+        client.get('/work/60?q=dune&sort=title')
+
+        sidecars = self.profiles(".json")
+        self.assertEqual(len(sidecars), 1)
+        with open(os.path.join(self.profile_dir, sidecars[0])) as f:
+            tags = json.load(f)
+        self.assertEqual(tags["route"], "/work/<int:ms>")
+        self.assertEqual(tags["query"], {"q": ["dune"], "sort": ["title"]})
+        self.assertEqual(tags["reason"], "slow")
+
+        with open(os.path.join(self.profile_dir, tags["profile"])) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.startswith("GET /work/<int:ms>;") for line in lines))
+        self.assertTrue(any("test_profiling:ProfilingTestCase.make_app.<locals>.work" in line for line in lines))
+
+    def test_cprofile_sampling(self):
+        """The cprofile engine writes loadable pstats files for sampled requests."""
+        client = self.make_app(PROFILING_ENGINE="cprofile", PROFILING_SAMPLE_RATE=1.0).test_client()
+        client.get('/work/1')
+        (name,) = self.profiles(".pstats")
+        stats = pstats.Stats(os.path.join(self.profile_dir, name))
+        self.assertTrue(any(func[2] == "work" for func in stats.stats))
+
+    def test_cprofile_overlapping_requests(self):
+        """Requests overlapping a cProfiled request are served unprofiled instead of failing."""
+        app = self.make_app(PROFILING_ENGINE="cprofile", PROFILING_SAMPLE_RATE=1.0)
+        started = threading.Event()
+        release = threading.Event()
+
+        @app.route('/hold')
+        def hold():
+            started.set()
+            release.wait(5)
+            return {"ok": True}
+
+        statuses = []
+        first = threading.Thread(target=lambda: statuses.append(app.test_client().get('/hold').status_code))
+        first.start()
+        self.assertTrue(started.wait(5))
+        statuses.append(app.test_client().get('/work/1').status_code)
+        release.set()
+        first.join()
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(len(self.profiles(".pstats")), 1)
+        app.test_client().get('/work/1')  # The session was released, so profiling resumes
+        self.assertEqual(len(self.profiles(".pstats")), 2)
+
+    def test_rotation(self):
+        """Only the newest max_files profiles are kept."""
+        client = self.make_app(PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_FILES=3).test_client()
+        for _ in range(5):
+            client.get('/work/1')
+        self.assertEqual(len(self.profiles(".json")), 3)
+        self.assertEqual(len(self.profiles(".collapsed")), 3)
+
+    def test_unknown_engine(self):
+        """An unknown engine is a configuration error."""
+        with self.assertRaises(ValueError):
+            RequestProfiler(self.profile_dir, engine="perf")
+
+
+if __name__ == '__main__':
+    unittest.main()
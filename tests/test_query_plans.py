@@ -0,0 +1,113 @@
+import itertools
+import re
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from models.book import SORTABLE_FIELDS, RELEVANCE, build_book_filters, _from_books, _order_by
+
+# Filter values long enough for every substring filter to use the trigram index
+FILTER_VALUES = {
+    "title": "hobbit",
+    "author": "tolkien",
+    "isbn": "isbn-1",
+    "genre": "fantasy",
+    "published_year": 1937,
+    "q": "hob",
+}
+
+# Substrings shorter than a trigram, which fall back to a LIKE on books
+SHORT_FILTER_VALUES = {
+    "title": "ho",
+    "author": "to",
+    "genre": "fa",
+}
+
+# Filters that narrow the rows through an index whatever the substring filters are
+INDEXED_FILTER_VALUES = {
+    "isbn": "isbn-1",
+    "published_year": 1937,
+    "q": "h",
+}
+
+TABLE_SCAN = re.compile(r"^SCAN books\b")
+# One pass over books, in rowid order or along an index, without a temporary sort
+SINGLE_PASS = re.compile(r"^SCAN books( USING (COVERING )?INDEX \w+)?$")
+
+
+class QueryPlanTestCase(ApiTestCase):
+    """Assert that no GET /books filter combination falls back to a full scan of books."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(50)
+
+    def query_plan(self, sql, params):
+        with self.app.app_context():
+            return [row[3] for row in get_db_connection().execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def assert_no_table_scan(self, sql, params, label):
+        plan = self.query_plan(sql, params)
+        scans = [line for line in plan if TABLE_SCAN.match(line)]
+        self.assertFalse(scans, f"{label} scans books:\n  {sql}\n  " + "\n  ".join(plan))
+
+    def queries(self, filters):
+        """Yield the count, page and keyset queries GET /books runs for a filter combination."""
+        with self.app.app_context():
+            where, params, match = build_book_filters(**filters)
+        source, full_where, full_params = _from_books(where, params, match)
+        yield "count", f"SELECT COUNT(*) FROM {source} WHERE {full_where}", full_params
+
+        sorts = SORTABLE_FIELDS + ((RELEVANCE,) if match else ())
+        for sort in sorts:
+            yield (
+                f"page sort={sort}",
+                f"SELECT books.* FROM {source} WHERE {full_where} ORDER BY {_order_by(sort, match)} LIMIT ? OFFSET ?",
+                full_params + [10, 20],
+            )
+
+        for sort in SORTABLE_FIELDS:
+            if sort == "id":
+                keyset_where, keyset_params = f"{where} AND books.id > ?", params + [5]
+            else:
+                keyset_where, keyset_params = f"{where} AND (books.{sort}, books.id) > (?, ?)", params + ["x", 5]
+            source, keyset_where, keyset_params = _from_books(keyset_where, keyset_params, match)
+            yield (
+                f"keyset sort={sort}",
+                f"SELECT books.* FROM {source} WHERE {keyset_where} ORDER BY {_order_by(sort)} LIMIT ?",
+                keyset_params + [10],
+            )
+
+    def test_every_filter_combination_uses_an_index(self):
+        for size in range(1, len(FILTER_VALUES) + 1):
+            for combination in itertools.combinations(FILTER_VALUES, size):
+                filters = {name: FILTER_VALUES[name] for name in combination}
+                for kind, sql, params in self.queries(filters):
+                    with self.subTest(filters=combination, query=kind):
+                        self.assert_no_table_scan(sql, params, f"{kind} with {', '.join(combination)}")
+
+    def test_short_substrings_fall_back_to_a_single_scan(self):
+        """A short substring alone is a LIKE on books, bounded to one pass over the table (or a keyset range)."""
+        for column, value in SHORT_FILTER_VALUES.items():
+            with self.app.app_context():
+                where, _, _ = build_book_filters(**{column: value})
+            self.assertEqual(where, f"books.{column} LIKE ?")
+            for kind, sql, params in self.queries({column: value}):
+                with self.subTest(filter=column, query=kind):
+                    plan = self.query_plan(sql, params)
+                    self.assertEqual(len(plan), 1, plan)
+                    if kind.startswith("keyset"):
+                        self.assertTrue(plan[0].startswith("SEARCH books USING "), plan)
+                    else:
+                        self.assertRegex(plan[0], SINGLE_PASS)
+
+    def test_short_substrings_with_an_indexed_filter_use_the_index(self):
+        for column, value in SHORT_FILTER_VALUES.items():
+            for indexed, indexed_value in INDEXED_FILTER_VALUES.items():
+                filters = {column: value, indexed: indexed_value}
+                for kind, sql, params in self.queries(filters):
+                    with self.subTest(filters=(column, indexed), query=kind):
+                        self.assert_no_table_scan(sql, params, f"{kind} with {column}, {indexed}")
+
+
+if __name__ == '__main__':
+    unittest.main()
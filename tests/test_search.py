@@ -0,0 +1,62 @@
+import unittest
+from api_testcase import ApiTestCase
+from db.database import get_db_connection
+from models.book import create_book, update_book, delete_book
+
+
+class BookSearchTestCase(ApiTestCase):
+    """Test full-text and substring search on GET /books."""
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            create_book("The Hobbit", "J. R. R. Tolkien", "isbn-1", 1937, "Fantasy")
+            create_book("Dune", "Frank Herbert", "isbn-2", 1965, "Science Fiction")
+            create_book("Foundation", "Isaac Asimov", "isbn-3", 1951, "Science Fiction")
+            create_book("A Fantasy Atlas", "Someone Else", "isbn-4", 2001, "Reference")
+
+    def titles(self, query):
+        response = self.client.get(f'/books?{query}')
+        if response.status_code == 404:
+            return []
+        return [book["title"] for book in response.get_json()["items"]]
+
+    def test_prefix_query(self):
+        """Every word of q prefix-matches title, author or genre."""
+        self.assertEqual(self.titles('q=tolk'), ["The Hobbit"])
+        self.assertEqual(sorted(self.titles('q=scien')), ["Dune", "Foundation"])
+        self.assertEqual(self.titles('q=scien+asim'), ["Foundation"])
+
+    def test_bm25_ranking(self):
+        """Title matches outrank genre matches by default."""
+        self.assertEqual(self.titles('q=fantasy'), ["A Fantasy Atlas", "The Hobbit"])
+        self.assertEqual(self.titles('q=fantasy&sort=id'), ["The Hobbit", "A Fantasy Atlas"])
+
+    def test_substring_filters_match_like_semantics(self):
+        """Trigram-backed filters still match anywhere in the value, ignoring case."""
+        self.assertEqual(self.titles('title=OBBI'), ["The Hobbit"])
+        self.assertEqual(self.titles('author=herb'), ["Dune"])
+        self.assertEqual(sorted(self.titles('genre=fi')), ["Dune", "Foundation"])
+
+    def test_index_follows_writes(self):
+        """Updates and deletes are reflected in search results."""
+        with self.app.app_context():
+            update_book(2, "Children of Dune", "Frank Herbert", "isbn-2", 1976, "Science Fiction")
+            delete_book(3)
+        self.assertEqual(self.titles('q=children'), ["Children of Dune"])
+        self.assertEqual(self.titles('q=foundation'), [])
+
+    def test_rebuild_command(self):
+        """The CLI rebuilds an index that has drifted from books."""
+        with self.app.app_context():
+            conn = get_db_connection()
+            conn.execute("INSERT INTO books_fts (books_fts) VALUES ('delete-all')")
+            conn.commit()
+        self.assertEqual(self.titles('q=dune'), [])
+        result = self.app.test_cli_runner().invoke(args=["rebuild-search-index"])
+        self.assertIn("rebuilt", result.output)
+        self.assertEqual(self.titles('q=dune'), ["Dune"])
+
+
+if __name__ == '__main__':
+    unittest.main()
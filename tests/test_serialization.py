@@ -0,0 +1,48 @@
+import json
+import unittest
+from unittest import mock
+from api_testcase import ApiTestCase
+from models.book import Book, build_book_filters, get_book, search_books_page
+from utils import serialization
+from utils.serialization import book_to_dict, json_response
+
+
+class SerializationTestCase(ApiTestCase):
+    """Test the Book row type and the JSON fast paths."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed_books(25, title="Ünïcode \"quoted\"")
+
+    def test_sqlite_json_matches_books(self):
+        """SQLite-rendered pages decode to the same objects as Book tuples."""
+        with self.app.app_context():
+            where, params, match = build_book_filters()
+            for sort in ("id", "title", "published_year"):
+                books = search_books_page(where, params, 10, 5, sort)
+                self.assertIsInstance(books[0], Book)
+                rendered = search_books_page(where, params, 10, 5, sort, as_json=True)
+                self.assertEqual(json.loads(rendered), [book_to_dict(book) for book in books])
+
+    def test_json_response_splices_items(self):
+        """Pre-rendered items are embedded verbatim, with or without orjson."""
+        payload = {"items": '[{"id":1}]', "current_page": 1}
+        for encoder in (serialization.orjson, None):
+            with mock.patch.object(serialization, "orjson", encoder), self.app.app_context():
+                body = json.loads(json_response(payload).get_data())
+                self.assertEqual(body, {"items": [{"id": 1}], "current_page": 1})
+                book = get_book(1)
+                self.assertEqual(json.loads(json_response(book_to_dict(book)).get_data())["title"], book.title)
+
+    def test_books_route(self):
+        """GET /books returns the same page through the SQLite path."""
+        response = self.client.get('/books?per_page=3&page=2')
+        self.assertEqual(response.mimetype, "application/json")
+        data = response.get_json()
+        self.assertEqual([book["id"] for book in data["items"]], [4, 5, 6])
+        self.assertEqual(data["items"][0]["title"], "Ünïcode \"quoted\"")
+        self.assertEqual(data["total_items"], 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+import unittest
+from app_factory import create_app
+from db.database import get_db_connection
+from models.sessions import (
+    SESSION_TIMEOUT, create_session, delete_session, validate_session, get_session_cache_stats,
+)
+from utils.session_expiry import SessionSweeper
+
+
+class SessionExpiryTestCase(unittest.TestCase):
+    """Test the expired-session cleanup strategies."""
+
+    def make_app(self, **overrides):
+        """Create an app on a throwaway database with an expired and a live session."""
+        db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(db_dir.cleanup)
+        overrides.setdefault("SESSION_CLEANUP_STRATEGY", "lazy")
+        app = create_app("testing", dict(
+            overrides, DATABASE_URI=f"sqlite:///{os.path.join(db_dir.name, 'sessions.db')}"
+        ))
+        with app.app_context():
+            create_session(1, "live-token")
+            conn = get_db_connection()
+            conn.execute(
+                "INSERT INTO sessions (user_id, token, created_at) VALUES (?, ?, ?)",
+                (2, "expired-token", int(time.time()) - SESSION_TIMEOUT - 1)
+            )
+            conn.commit()
+        return app
+
+    def session_tokens(self, app):
+        with app.app_context():
+            rows = get_db_connection().execute("SELECT token FROM sessions ORDER BY token").fetchall()
+        return [row[0] for row in rows]
+
+    def test_lazy_expiry(self):
+        """Expired sessions are rejected without being deleted."""
+        app = self.make_app()
+        with app.app_context():
+            self.assertTrue(validate_session("live-token"))
+            self.assertFalse(validate_session("expired-token"))
+        self.assertEqual(self.session_tokens(app), ["expired-token", "live-token"])
+
+    def test_amortized_sweeps_only_on_writes(self):
+        """Reads never sweep; every Nth write request does."""
+        app = self.make_app(SESSION_CLEANUP_STRATEGY="amortized", SESSION_CLEANUP_EVERY_N_REQUESTS=2)
+        for method in ("GET", "GET", "GET", "POST"):
+            with app.test_request_context('/', method=method):
+                app.preprocess_request()
+        self.assertEqual(len(self.session_tokens(app)), 2)
+        with app.test_request_context('/', method="POST"):
+            app.preprocess_request()
+        self.assertEqual(self.session_tokens(app), ["live-token"])
+
+    def test_background_sweeper(self):
+        """The sweeper thread removes expired sessions on its own."""
+        app = self.make_app()
+        sweeper = SessionSweeper(app, interval=0.01)
+        sweeper.start()
+        try:
+            deadline = time.time() + 2
+            while time.time() < deadline and len(self.session_tokens(app)) > 1:
+                time.sleep(0.01)
+        finally:
+            sweeper.stop()
+            sweeper.join()
+        self.assertEqual(self.session_tokens(app), ["live-token"])
+
+    def test_unknown_strategy(self):
+        """A misspelt strategy fails at startup."""
+        with self.assertRaises(ValueError):
+            create_app("testing", {"SESSION_CLEANUP_STRATEGY": "sometimes"})
+
+
+class SessionCacheTestCase(unittest.TestCase):
+    """Test the validated-token cache in front of validate_session."""
+
+    def setUp(self):
+        db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(db_dir.cleanup)
+        self.app = create_app("testing", {
+            "DATABASE_URI": f"sqlite:///{os.path.join(db_dir.name, 'sessions.db')}",
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+
+    def test_warm_cache_skips_database(self):
+        """A second validation of the same token is a cache hit."""
+        create_session(1, "token-a")
+        self.assertTrue(validate_session("token-a"))
+        self.assertTrue(validate_session("token-a"))
+        stats = get_session_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_logout_invalidates(self):
+        """delete_session removes the token from the cache."""
+        create_session(1, "token-a")
+        self.assertTrue(validate_session("token-a"))
+        delete_session("token-a")
+        self.assertFalse(validate_session("token-a"))
+
+    def test_new_login_invalidates_old_tokens(self):
+        """create_session evicts the tokens of the sessions it replaces."""
+        create_session(1, "token-a")
+        self.assertTrue(validate_session("token-a"))
+        create_session(1, "token-b")
+        self.assertFalse(validate_session("token-a"))
+        self.assertTrue(validate_session("token-b"))
+
+    def test_entry_expires_with_session(self):
+        """A cached token is not trusted past the session's expiry."""
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO sessions (user_id, token, created_at) VALUES (?, ?, ?)",
+            (1, "token-a", time.time() - SESSION_TIMEOUT + 0.05)
+        )
+        conn.commit()
+        self.assertTrue(validate_session("token-a"))
+        time.sleep(0.1)
+        self.assertFalse(validate_session("token-a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
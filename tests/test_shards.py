@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from api_testcase import ApiTestCase
+from app_factory import create_app
+from db.database import get_book_shard_layout, get_reader, initialize_db
+from db.shards import get_shard_path, merge_sorted, on_shard, shard_for_id, shard_for_isbn
+from models.book import (
+    count_books, create_book, create_books, delete_book, get_book, get_books_by_isbn, update_book,
+)
+
+SHARDS = 3
+
+
+class MergeSortedTestCase(unittest.TestCase):
+    """Test the k-way merge of per-shard results."""
+
+    def test_offset_and_limit_apply_to_merged_order(self):
+        merged = merge_sorted([[1, 4, 7], [2, 5], [3, 6, 8]], key=lambda n: n, limit=3, offset=2)
+        self.assertEqual(merged, [3, 4, 5])
+
+
+class ShardedBooksTestCase(ApiTestCase):
+    """Test books spread over BOOK_SHARDS files, with scatter-gather reads."""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config["BOOK_SHARDS"] = SHARDS
+        with self.app.app_context():
+            initialize_db()  # Creates and migrates the shard files
+        self.seed_books(30)
+
+    def tearDown(self):
+        self.app.config["BOOK_SHARDS"] = 0
+        self.app.extensions.pop("response_cache", None)
+        super().tearDown()
+
+    def shard_rows(self, index):
+        with self.app.app_context():
+            return on_shard(index, lambda: get_reader().execute("SELECT id, isbn FROM books ORDER BY id").fetchall())
+
+    def test_books_are_placed_by_isbn_with_routable_ids(self):
+        """Each book is stored in its ISBN's shard under an id that maps back to that shard."""
+        with self.app.app_context():
+            self.assertTrue(all(os.path.exists(get_shard_path(index)) for index in range(SHARDS)))
+            stored = 0
+            for index in range(SHARDS):
+                rows = self.shard_rows(index)
+                stored += len(rows)
+                for book_id, isbn in rows:
+                    self.assertEqual(shard_for_isbn(isbn), index)
+                    self.assertEqual(shard_for_id(book_id), index)
+            self.assertEqual(stored, 30)
+            self.assertEqual(get_reader().execute("SELECT COUNT(*) FROM books").fetchone()[0], 0)
+
+    def test_point_reads_and_writes_route_by_id(self):
+        """get_book, update_book and delete_book reach the right shard from the id alone."""
+        with self.app.app_context():
+            book_id, isbn = self.shard_rows(1)[0]
+            self.assertEqual(get_book(book_id).isbn, isbn)
+            update_book(book_id, "Renamed", "Someone", isbn, 2001, "Poetry")
+            self.assertEqual(get_book(book_id).title, "Renamed")
+            delete_book(book_id)
+            self.assertIsNone(get_book(book_id))
+            self.assertEqual(count_books("1", []), 29)
+
+    def test_ids_are_not_reused(self):
+        """A shard keeps allocating past deleted ids, one residue per shard."""
+        with self.app.app_context():
+            ids = [book_id for index in range(SHARDS) for book_id, _ in self.shard_rows(index)]
+            delete_book(max(ids))
+            create_book("New", "Author", "isbn-new", 2000, "Fiction")
+            new_id = self.shard_rows(shard_for_isbn("isbn-new"))[-1][0]
+            self.assertNotIn(new_id, ids)
+            self.assertEqual(get_book(new_id).title, "New")
+
+    def test_isbns_are_unique_across_shards(self):
+        """create_book, create_books and update_book reject an ISBN stored in any shard."""
+        with self.app.app_context():
+            with self.assertRaises(sqlite3.IntegrityError):
+                create_book("Copy", "Author", "isbn-00003", 2000, "Fiction")
+            duplicates = create_books([
+                ("A", "Author", "isbn-00004", 2000, "Fiction"),
+                ("B", "Author", "isbn-b", 2000, "Fiction"),
+                ("C", "Author", "isbn-b", 2000, "Fiction"),
+            ])
+            self.assertEqual(duplicates, [0, 2])
+            book_id = next(book_id for book_id, isbn in self.shard_rows(0) if isbn != "isbn-b")
+            other = next(isbn for index in (1, 2) for _, isbn in self.shard_rows(index))
+            with self.assertRaises(sqlite3.IntegrityError):
+                update_book(book_id, "Title", "Author", other, 2000, "Fiction")
+
+    def test_pages_follow_the_global_order(self):
+        """Offset pages merged from every shard match the order of one database."""
+        expected = sorted(
+            (f"Book {i:05d}" for i in range(30)), key=lambda title: (1990 + int(title[5:]) % 30, title)
+        )
+        titles = []
+        for page in (1, 2, 3):
+            data = self.client.get(f'/books?sort=published_year&per_page=10&page={page}').get_json()
+            self.assertEqual(data["total_items"], 30)
+            titles.extend(book["title"] for book in data["items"])
+        self.assertEqual(titles, expected)
+
+        data = self.client.get('/books?per_page=100').get_json()
+        ids = [book["id"] for book in data["items"]]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_cursor_pages(self):
+        """Keyset pagination walks every shard in order without repeats."""
+        titles = []
+        response = self.client.get('/books?pagination=cursor&sort=title&per_page=7').get_json()
+        while True:
+            titles.extend(book["title"] for book in response["items"])
+            if not response["next_cursor"]:
+                break
+            response = self.client.get(
+                f'/books?sort=title&per_page=7&after={response["next_cursor"]}'
+            ).get_json()
+        self.assertEqual(titles, sorted(f"Book {i:05d}" for i in range(30)))
+
+    def test_search_facets_and_batch_get(self):
+        """Counts, facets and batch lookups are gathered from every shard."""
+        data = self.client.get('/books?q=book&per_page=100').get_json()
+        self.assertEqual(data["total_items"], 30)
+
+        facets = self.client.get('/books/facets?facets=genre').get_json()["facets"]
+        self.assertEqual(facets["genre"], [{"value": "Fiction", "count": 15}, {"value": "History", "count": 15}])
+
+        with self.app.app_context():
+            ids = [self.shard_rows(index)[0][0] for index in range(SHARDS)]
+        response = self.client.post('/books/batch-get', json={"ids": ids + [10 ** 6]}).get_json()
+        self.assertEqual([book["id"] for book in response["items"]], ids)
+        self.assertEqual(response["missing"], [10 ** 6])
+
+        response = self.client.post('/books/batch-get', json={"isbns": ["isbn-00001", "isbn-00029"]}).get_json()
+        self.assertEqual([book["isbn"] for book in response["items"]], ["isbn-00001", "isbn-00029"])
+
+    def test_export_streams_every_shard_in_id_order(self):
+        response = self.client.get('/books/export')
+        ids = [json.loads(line)["id"] for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(ids, sorted(ids))
+
+
+class ShardLayoutTestCase(unittest.TestCase):
+    """Test moving an existing catalog into shards and the startup check of the layout."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.uri = f"sqlite:///{os.path.join(self.db_dir.name, 'layout.db')}"
+        app = self.make_app(0)
+        with app.app_context():
+            create_books([(f"Book {i}", "Author", f"isbn-{i}", 2000, "Fiction") for i in range(10)])
+            delete_book(10)  # The highest id is gone but must not be handed out again
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def make_app(self, shards):
+        return create_app("testing", {"DATABASE_URI": self.uri, "BOOK_SHARDS": shards})
+
+    def test_existing_books_refuse_to_start(self):
+        """Enabling shards over a populated main database fails instead of hiding its books."""
+        with self.assertRaisesRegex(RuntimeError, "shard-books 2"):
+            self.make_app(2)
+
+    def test_shard_books_keeps_ids_and_isbns(self):
+        """The command moves every book to the shard its id routes to and records the layout."""
+        result = self.make_app(0).test_cli_runner().invoke(args=["shard-books", "2"])
+        self.assertIn("Moved 9 books into 2 shards", result.output)
+
+        with self.make_app(2).app_context():
+            self.assertEqual(get_book(1).isbn, "isbn-0")
+            self.assertEqual(get_book(9).isbn, "isbn-8")
+            self.assertEqual(count_books("1", []), 9)
+            self.assertEqual(get_book_shard_layout(), 2)
+            self.assertEqual(get_reader().execute("SELECT COUNT(*) FROM books").fetchone()[0], 0)
+            with self.assertRaises(sqlite3.IntegrityError):
+                create_book("Copy", "Author", "isbn-3", 2000, "Fiction")
+            for isbn in ("new-a", "new-b", "new-c"):
+                create_book("New", "Author", isbn, 2000, "Fiction")
+            new_ids = sorted(book.id for book in get_books_by_isbn(["new-a", "new-b", "new-c"]))
+            self.assertTrue(all(book_id > 10 for book_id in new_ids))
+
+    def test_changing_the_shard_count_refuses_to_start(self):
+        self.make_app(0).test_cli_runner().invoke(args=["shard-books", "2"])
+        with self.assertRaisesRegex(RuntimeError, "2 shards but BOOK_SHARDS is 3"):
+            self.make_app(3)
+        with self.assertRaisesRegex(RuntimeError, "2 shards but BOOK_SHARDS is 0"):
+            self.make_app(0)
+        result = self.make_app(2).test_cli_runner().invoke(args=["shard-books", "3"])
+        self.assertIn("resharding is not supported", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+
+class _ClientDisconnected(OSError):
+    """Raised in the request's thread when the client went away while its response was being produced."""
+
+
+def _join_header(name: str, first: str, second: str) -> str:
+    # Repeated headers are one comma-separated list, except Cookie (split into several headers by HTTP/2)
+    return f"{first}; {second}" if name == "HTTP_COOKIE" else f"{first}, {second}"
+
+
+class WSGIToASGI:
+    """
+    Serve a WSGI app (the Flask API) to an ASGI server.
+
+    The event loop does all of the network I/O: it holds idle keep-alive
+    connections, receives each request body (spooled to a temporary file past
+    `spool_size`) before the request is handed to the executor, and sends the
+    response chunks the app has produced. Executor threads therefore only run
+    the Flask views and the models' SQLite queries, and are never held by a
+    slow upload or a slow reader. Streamed responses are produced at most
+    `max_buffered_chunks` chunks ahead of the client, so streaming endpoints
+    keep their bounded memory use and slow clients still apply backpressure.
+    """
+
+    def __init__(self, wsgi_app, workers: int = 8, max_buffered_chunks: int = 8, spool_size: int = 1024 * 1024):
+        """
+        Args:
+            wsgi_app (callable): The WSGI application.
+            workers (int, optional): Requests executing concurrently; the rest wait on the loop.
+            max_buffered_chunks (int, optional): Response messages produced but not yet sent, per request.
+            spool_size (int, optional): Request body bytes kept in memory before spooling to disk.
+        """
+        self.wsgi_app = wsgi_app
+        self.max_buffered_chunks = max_buffered_chunks
+        self.spool_size = spool_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asgi-request")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive):
+        """Receive the whole request body on the loop, or return None if the client disconnects first."""
+        body = SpooledTemporaryFile(max_size=self.spool_size)
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":  # http.disconnect
+                body.close()
+                return None
+            body.write(message.get("body", b""))
+            if not message.get("more_body", False):
+                body.seek(0)
+                return body
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        credits = threading.Semaphore(self.max_buffered_chunks)
+        disconnected = threading.Event()
+
+        def emit(message):
+            # Called from the request's thread; blocks while max_buffered_chunks messages await the client
+            credits.acquire()
+            if disconnected.is_set():
+                raise _ClientDisconnected("Client disconnected")
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        app_done = loop.run_in_executor(self.executor, self._run_app, scope, body, emit, messages, loop)
+        try:
+            while (message := await messages.get()) is not None:
+                await send(message)
+                credits.release()
+        except BaseException:
+            disconnected.set()
+            credits.release(self.max_buffered_chunks)  # Wakes the request's thread so it can stop
+            raise
+        await app_done  # Re-raises an error from the app
+
+    def _environ(self, scope, body) -> dict:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        root_path = scope.get("root_path", "")
+        path = scope["path"][len(root_path):] if scope["path"].startswith(root_path) else scope["path"]
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": root_path.encode().decode("latin-1"),
+            "PATH_INFO": path.encode().decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.input_terminated": True,  # Read chunked bodies to EOF rather than by Content-Length
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = f"HTTP_{name}"
+            value = value.decode("latin-1")
+            environ[name] = _join_header(name, environ[name], value) if name in environ else value
+        return environ
+
+    def _run_app(self, scope, body, emit, messages, loop):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get("started"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["start"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            }
+            return write
+
+        def write(data):
+            if not response.get("started"):
+                emit(response["start"])
+                response["started"] = True
+            if data:
+                emit({"type": "http.response.body", "body": data, "more_body": True})
+
+        try:
+            result = self.wsgi_app(self._environ(scope, body), start_response)
+            try:
+                for chunk in result:
+                    write(chunk)
+                write(b"")  # Sends the headers of an empty response
+                emit({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        except _ClientDisconnected:
+            pass
+        finally:
+            body.close()
+            loop.call_soon_threadsafe(messages.put_nowait, None)
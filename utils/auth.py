@@ -1,7 +1,134 @@
 import hashlib
 import os
+import time
+from flask import current_app
+from models.sessions import (
+    SESSION_TIMEOUT, create_session, delete_session, is_token_revoked, revoke_token, validate_session,
+)
+
+SESSION_BACKENDS = ("database", "signed")
 
 def generate_token(username: str) -> str:
     """Generate a unique token using the username and a random salt."""
     salt = os.urandom(16).hex()
     return hashlib.sha256(f"{username}{salt}".encode()).hexdigest()
+
+
+class DatabaseSessionBackend:
+    """Opaque random tokens looked up in the `sessions` table."""
+
+    def issue(self, user_id: int, username: str) -> str:
+        """
+        Start a session for a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            username (str): The username of the user.
+
+        Returns:
+            str: The session token.
+        """
+        token = generate_token(username)
+        create_session(user_id, token)
+        return token
+
+    def validate(self, token: str) -> bool:
+        """Return True if the token belongs to a live session."""
+        return validate_session(token)
+
+    def revoke(self, token: str):
+        """End the session a token belongs to."""
+        delete_session(token)
+
+
+def _jwt():
+    """Import PyJWT on first use, so workers on the database backend never load it."""
+    import jwt
+    return jwt
+
+
+class SignedTokenSessionBackend:
+    """
+    HS256-signed JWTs, validated by signature and expiry without a session lookup.
+
+    Logged-out tokens are recorded in the `revoked_tokens` table until they
+    expire, so a logout is enforced by every process sharing the database.
+    Tokens found not revoked are cached for SESSION_CACHE_TTL, which bounds
+    how long another process may still accept a logged-out token.
+    """
+
+    algorithm = "HS256"
+
+    def __init__(self, secret: str, lifetime: int = SESSION_TIMEOUT):
+        """
+        Args:
+            secret (str): The signing key, shared by every node.
+            lifetime (int, optional): Token lifetime in seconds. Defaults to SESSION_TIMEOUT.
+        """
+        if not secret:
+            raise ValueError("SECRET_KEY must be set to use signed session tokens")
+        self.secret = secret
+        self.lifetime = lifetime
+
+    def issue(self, user_id: int, username: str) -> str:
+        """
+        Sign a token for a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            username (str): The username of the user.
+
+        Returns:
+            str: The encoded JWT.
+        """
+        now = int(time.time())
+        claims = {
+            "sub": str(user_id),
+            "name": username,
+            "iat": now,
+            "exp": now + self.lifetime,
+            "jti": os.urandom(16).hex(),
+        }
+        return _jwt().encode(claims, self.secret, algorithm=self.algorithm)
+
+    def _decode(self, token: str):
+        jwt = _jwt()
+        try:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm], options={"require": ["exp", "jti"]})
+        except jwt.InvalidTokenError:
+            return None
+
+    def validate(self, token: str) -> bool:
+        """Return True if the token is correctly signed, unexpired and not revoked."""
+        claims = self._decode(token)
+        return claims is not None and not is_token_revoked(claims["jti"], claims["exp"])
+
+    def revoke(self, token: str):
+        """Record a token as revoked until it expires."""
+        claims = self._decode(token)
+        if claims is None:
+            return
+        revoke_token(claims["jti"], claims["exp"])
+
+
+def create_session_backend(config):
+    """
+    Build the session backend selected by SESSION_BACKEND.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        DatabaseSessionBackend or SignedTokenSessionBackend: The configured backend.
+    """
+    backend = config["SESSION_BACKEND"]
+    if backend == "database":
+        return DatabaseSessionBackend()
+    if backend == "signed":
+        return SignedTokenSessionBackend(config["SECRET_KEY"])
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; expected one of {SESSION_BACKENDS}")
+
+
+def get_session_backend():
+    """Return the session backend of the current app."""
+    return current_app.extensions["session_backend"]
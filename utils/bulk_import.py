@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+from models.book import create_books
+
+BOOK_FIELDS = ("title", "author", "isbn", "published_year", "genre")
+
+
+def iter_ndjson(lines):
+    """
+    Parse newline-delimited JSON, one book object per line.
+
+    Args:
+        lines (iterable): Lines as str or bytes; blank lines are skipped.
+
+    Yields:
+        tuple: (row number, record dict or None, parse error or None).
+    """
+    for row_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line), None
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+
+
+def iter_json_array(records):
+    """
+    Number the records of an already decoded JSON array.
+
+    Yields:
+        tuple: (row number, record, None).
+    """
+    for row_number, record in enumerate(records, start=1):
+        yield row_number, record, None
+
+
+def iter_csv(text_stream):
+    """
+    Parse CSV with a header row naming the book fields.
+
+    Args:
+        text_stream (file-like): A text stream positioned at the header.
+
+    Yields:
+        tuple: (row number, record dict, None), numbering data rows from 1.
+    """
+    for row_number, row in enumerate(csv.DictReader(text_stream), start=1):
+        yield row_number, {key: (value or None) for key, value in row.items() if key}, None
+
+
+def validate_book_record(record):
+    """
+    Validate one imported book and convert it to insert order.
+
+    Args:
+        record (dict): The decoded record.
+
+    Returns:
+        tuple: (title, author, isbn, published_year, genre) and None, or None and an error message.
+    """
+    if not isinstance(record, dict):
+        return None, "Record must be an object"
+
+    for field in ("title", "author", "isbn"):
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None, f"{field} is required"
+
+    published_year = record.get("published_year")
+    if published_year is not None:
+        try:
+            published_year = int(published_year)
+        except (TypeError, ValueError):
+            return None, "published_year must be an integer"
+
+    genre = record.get("genre")
+    if genre is not None and not isinstance(genre, str):
+        return None, "genre must be a string"
+
+    return (record["title"], record["author"], record["isbn"], published_year, genre), None
+
+
+def import_books(records, batch_size: int, max_errors: int = 1000):
+    """
+    Validate and insert books in batches, collecting per-row errors.
+
+    Invalid rows and duplicate ISBNs are reported and skipped without
+    aborting the rest of their batch; every batch is one transaction.
+
+    Args:
+        records (iterable): (row number, record, parse error) tuples from one of the iter_* parsers.
+        batch_size (int): Number of rows inserted per transaction.
+        max_errors (int, optional): Maximum number of errors listed in the report (all are counted).
+
+    Returns:
+        dict: The number of rows inserted and failed, and the listed errors.
+    """
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    batch = []
+    row_numbers = []
+
+    def add_error(row_number, message):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"row": row_number, "error": message})
+
+    def flush():
+        duplicates = create_books(batch)
+        for index in duplicates:
+            add_error(row_numbers[index], f"Duplicate ISBN {batch[index][2]}")
+        report["inserted"] += len(batch) - len(duplicates)
+        batch.clear()
+        row_numbers.clear()
+
+    for row_number, record, error in records:
+        if error is None:
+            book, error = validate_book_record(record)
+        if error is not None:
+            add_error(row_number, error)
+            continue
+        batch.append(book)
+        row_numbers.append(row_number)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return report
+
+
+def open_import_file(path: str, file_format: str = None):
+    """
+    Open a CSV or NDJSON file for import.
+
+    Args:
+        path (str): The file to read.
+        file_format (str, optional): "csv" or "ndjson"; inferred from the extension when omitted.
+
+    Returns:
+        tuple: The open file and its record iterator.
+    """
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    handle = io.open(path, newline="" if file_format == "csv" else None, encoding="utf-8")
+    records = iter_csv(handle) if file_format == "csv" else iter_ndjson(handle)
+    return handle, records
@@ -0,0 +1,443 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries can carry a time-to-live.
+
+    Expired entries are treated as misses and dropped when they are next read;
+    once `maxsize` entries are stored, the least recently used one is evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        """
+        Args:
+            maxsize (int): Maximum number of entries kept.
+            ttl (float, optional): Default lifetime of an entry in seconds; None keeps entries until evicted.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Look up a key, refreshing its position in the LRU order.
+
+        Args:
+            key: The cache key.
+            default: Returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+            self._misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl (float, optional): Lifetime in seconds, overriding the cache default.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key):
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        """Remove several keys at once."""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return the hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class SQLiteCache:
+    """
+    A cache shared by every process on a host through a SQLite file.
+
+    Values must be JSON-serializable and come back as decoded JSON (tuples
+    become lists). Expired rows are ignored on read and overwritten on write.
+
+    Every key has a generation that deletes bump, leaving a tombstone row
+    behind. A set() given the generation read before its value was loaded
+    is dropped if the key was deleted since, even by another process, so a
+    slow load cannot store a value a writer has already invalidated.
+    Tombstones are kept, one per key ever deleted.
+    """
+
+    def __init__(self, path: str, ttl: float = None):
+        """
+        Args:
+            path (str): Path of the cache database file.
+            ttl (float, optional): Default lifetime of an entry in seconds.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+        if columns and "generation" not in columns:
+            conn.execute("DROP TABLE cache")  # Written by an older version; entries are disposable
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL,
+                generation INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")  # Losing cache entries on a crash is harmless
+        return conn
+
+    def get(self, key, default=None):
+        """Look up a key, returning `default` when it is missing or expired."""
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND value IS NOT NULL", (str(key),)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return json.loads(row[0])
+
+    def generations(self, keys) -> dict:
+        """
+        Return the current generation of several keys.
+
+        Args:
+            keys (iterable): The cache keys.
+
+        Returns:
+            dict: Each key mapped to its generation, 0 for keys never stored or deleted.
+        """
+        keys = list(keys)
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = [str(key) for key in keys[start:start + 500]]
+            found.update(conn.execute(
+                f"SELECT key, generation FROM cache WHERE key IN ({', '.join('?' for _ in chunk)})", chunk
+            ).fetchall())
+        return {key: found.get(str(key), 0) for key in keys}
+
+    def set(self, key, value, ttl: float = None, generation: int = None) -> bool:
+        """
+        Store a value, overriding the default ttl if one is given.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl (float, optional): Lifetime in seconds, overriding the cache default.
+            generation (int, optional): Only store the value if the key is still at this
+                                        generation, i.e. was not deleted since it was read.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        conn = self._connection()
+        cursor = conn.execute(
+            "INSERT INTO cache (key, value, expires_at, generation) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+            + (" WHERE cache.generation = excluded.generation" if generation is not None else ""),
+            (str(key), json.dumps(value), None if ttl is None else time.time() + ttl, generation or 0)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+    def delete(self, key):
+        """Remove a key if present."""
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """Remove several keys in one transaction, leaving tombstones with a bumped generation."""
+        conn = self._connection()
+        conn.executemany(
+            "INSERT INTO cache (key, value, expires_at, generation) VALUES (?, NULL, NULL, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = NULL, expires_at = NULL, generation = generation + 1",
+            [(str(key),) for key in keys]
+        )
+        conn.commit()
+
+    def clear(self):
+        """Remove every entry, bumping the generation of every stored key."""
+        conn = self._connection()
+        conn.execute("UPDATE cache SET value = NULL, expires_at = NULL, generation = generation + 1")
+        conn.commit()
+
+
+class TieredCache:
+    """
+    An in-process cache in front of a shared one.
+
+    Local copies live at most `local_ttl` seconds, which bounds how long an
+    invalidation made by another process can go unnoticed here.
+    """
+
+    def __init__(self, local, shared, local_ttl: float):
+        """
+        Args:
+            local (LRUCache): The per-process tier.
+            shared (SQLiteCache): The tier shared between processes.
+            local_ttl (float): Maximum lifetime of a local copy in seconds.
+        """
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+
+    def get(self, key, default=None):
+        """Look up a key locally, then in the shared tier, copying shared hits locally."""
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self.local.set(key, value, ttl=self.local_ttl)
+        return value
+
+    def generations(self, keys) -> dict:
+        """Return the shared tier's generation of several keys (see SQLiteCache.generations)."""
+        return self.shared.generations(keys)
+
+    def set(self, key, value, ttl: float = None, generation: int = None) -> bool:
+        """
+        Store a value in both tiers.
+
+        With `generation` given, the value is stored in neither tier if the
+        shared tier has seen a delete of the key since that generation.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        if not self.shared.set(key, value, ttl=ttl, generation=generation):
+            return False
+        self.local.set(key, value, ttl=self.local_ttl if ttl is None else min(ttl, self.local_ttl))
+        return True
+
+    def delete(self, key):
+        """Remove a key from both tiers."""
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """Remove several keys from both tiers."""
+        keys = list(keys)
+        self.shared.delete_many(keys)
+        self.local.delete_many(keys)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        self.shared.clear()
+        self.local.clear()
+
+
+class ReadThroughCache:
+    """
+    Load-on-miss caching with negative entries and stampede protection.
+
+    Misses for the same key are coalesced: one caller runs the loader while
+    concurrent callers wait for it and then read its result. Results loaded
+    while an invalidation happened in this process are not stored. When the
+    backend is shared between processes and versions its keys (it has a
+    `generations` method, like TieredCache), the generation read before the
+    load must also be unchanged when storing, so a slow load can never put
+    back data that a writer in any process has just invalidated.
+    """
+
+    def __init__(self, backend, ttl: float = None, negative_ttl: float = None):
+        """
+        Args:
+            backend: The store, e.g. an LRUCache or a TieredCache.
+            ttl (float, optional): Lifetime of cached values in seconds.
+            negative_ttl (float, optional): Lifetime of cached "not found" (None) results.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> [lock, waiters]
+        self._invalidations = 0
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _generations(self, keys):
+        generations = getattr(self.backend, "generations", None)
+        return generations(keys) if generations is not None else None
+
+    def _store(self, key, value, generations):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if generations is None:
+            self.backend.set(key, [value], ttl=ttl)
+        else:
+            self.backend.set(key, [value], ttl=ttl, generation=generations[key])
+
+    def _lookup(self, key):
+        entry = self.backend.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        return entry[0]  # Values are boxed so that a cached None is distinguishable from a miss
+
+    def get(self, key, loader):
+        """
+        Return the cached value for `key`, calling loader(key) on a miss.
+
+        Args:
+            key: The cache key.
+            loader (callable): Loads the value; None means "not found" and is cached for negative_ttl.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self._count("hits" if value is not None else "negative_hits")
+            return value
+
+        with self._lock:
+            slot = self._loading.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                value = self._lookup(key)
+                if value is not _MISSING:
+                    self._count("coalesced")
+                    return value
+
+                self._count("misses")
+                with self._lock:
+                    invalidations = self._invalidations
+                generations = self._generations([key])  # Read before loading, so a later delete is seen
+                value = loader(key)
+                with self._lock:
+                    unchanged = invalidations == self._invalidations
+                if unchanged:
+                    self._store(key, value, generations)
+                return value
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._loading[key]
+
+    def get_many(self, keys, loader) -> dict:
+        """
+        Return the cached values for several keys, loading all misses with one loader call.
+
+        Batch misses are not coalesced with concurrent loads of the same keys;
+        they are stored under the same invalidation checks as get().
+
+        Args:
+            keys (iterable): The cache keys.
+            loader (callable): Takes the list of missed keys and returns a dict of
+                               key to value, with None (or no entry) meaning "not found".
+
+        Returns:
+            dict: Every requested key mapped to its value (None when not found).
+        """
+        values = {}
+        missed = []
+        hits = negative_hits = 0
+        for key in dict.fromkeys(keys):
+            value = self._lookup(key)
+            if value is _MISSING:
+                missed.append(key)
+            else:
+                values[key] = value
+                hits += value is not None
+                negative_hits += value is None
+
+        with self._lock:
+            self._stats["hits"] += hits
+            self._stats["negative_hits"] += negative_hits
+            self._stats["misses"] += len(missed)
+            invalidations = self._invalidations
+        if not missed:
+            return values
+
+        generations = self._generations(missed)
+        loaded = loader(missed)
+        with self._lock:
+            unchanged = invalidations == self._invalidations
+        for key in missed:
+            value = values[key] = loaded.get(key)
+            if unchanged:
+                self._store(key, value, generations)
+        return values
+
+    def invalidate(self, key):
+        """Forget one key."""
+        self.invalidate_many([key])
+
+    def invalidate_many(self, keys):
+        """Forget several keys."""
+        with self._lock:
+            self._invalidations += 1
+        self.backend.delete_many(keys)
+
+    def clear(self):
+        """Forget every key."""
+        with self._lock:
+            self._invalidations += 1
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Return hit, miss and coalesced-load counters and the hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
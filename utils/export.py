@@ -0,0 +1,55 @@
+import csv
+import io
+import zlib
+from models.book import Book
+from utils.serialization import dumps
+
+BOOK_COLUMNS = Book._fields
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_chunks(row_chunks):
+    for rows in row_chunks:
+        yield b"".join(dumps(dict(zip(BOOK_COLUMNS, row))) + b"\n" for row in rows)
+
+
+def _csv_chunks(row_chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BOOK_COLUMNS)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(row_chunks, export_format: str, gzip: bool = False):
+    """
+    Encode chunks of book rows as a stream of NDJSON or CSV bytes.
+
+    Args:
+        row_chunks (iterable): Lists of book rows, e.g. from models.book.iter_books.
+        export_format (str): "ndjson" or "csv" (with a header row).
+        gzip (bool, optional): Compress the stream incrementally with gzip.
+
+    Returns:
+        iterator: The encoded byte chunks, produced lazily one row chunk at a time.
+    """
+    chunks = _csv_chunks(row_chunks) if export_format == "csv" else _ndjson_chunks(row_chunks)
+    return _gzip_chunks(chunks) if gzip else chunks
@@ -0,0 +1,72 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, make_response, request
+from db.database import get_catalog_version, get_database_path
+from utils.cache import LRUCache
+
+
+def _response_cache():
+    """Return the current app's response cache, or None when RESPONSE_CACHE_SIZE is 0."""
+    if not current_app.config["RESPONSE_CACHE_SIZE"]:
+        return None
+    cache = current_app.extensions.get("response_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            "response_cache", LRUCache(current_app.config["RESPONSE_CACHE_SIZE"])
+        )
+    return cache
+
+
+def get_response_cache_stats() -> dict:
+    """
+    Return the hit and miss counters of the response cache.
+
+    Returns:
+        dict: The cache counters, or an empty dict when the cache is disabled.
+    """
+    cache = _response_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def catalog_cached(view):
+    """
+    Serve a catalog read with a strong ETag and from an in-process response cache.
+
+    The ETag combines the catalog version with the request path and normalized
+    query string, so it changes whenever any book is written. A matching
+    If-None-Match is answered with 304 before the view runs, and full bodies
+    are kept in an LRU cache keyed the same way, so repeat reads skip both
+    SQLite and JSON serialization until the catalog changes.
+
+    Args:
+        view (function): A GET view whose response depends only on the catalog and its arguments.
+
+    Returns:
+        function: The wrapped view.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = get_catalog_version()
+        query = urlencode(sorted(request.args.items(multi=True)))
+        key = (get_database_path(), request.path, query)
+        etag = f"{version}-{hashlib.sha1(repr(key[1:]).encode()).hexdigest()[:16]}"
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            cache = _response_cache()
+            entry = cache.get(key) if cache is not None else None
+            if entry is not None and entry[0] == version:
+                _, body, status, mimetype = entry
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+            else:
+                response = make_response(view(*args, **kwargs))
+                body = response.get_data()
+                if cache is not None and len(body) <= current_app.config["RESPONSE_CACHE_MAX_BODY"]:
+                    cache.set(key, (version, body, response.status_code, response.mimetype))
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"  # Clients and CDNs may store it but must revalidate
+        return response
+    return wrapper
@@ -0,0 +1,250 @@
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from flask import Response, current_app, g, has_request_context, request
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+slow_query_logger = logging.getLogger("library.sql.slow")
+
+_NULL_TIMER = nullcontext()
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and variable-length placeholder lists so one statement maps to one label."""
+    return _PLACEHOLDER_LIST.sub("?, ...", _WHITESPACE.sub(" ", sql).strip())[:200]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Thread-safe request latency histograms and per-statement SQLite counters."""
+
+    def __init__(self, slow_query_threshold: float = None):
+        """
+        Args:
+            slow_query_threshold (float, optional): Statements slower than this many seconds are logged.
+        """
+        self.slow_query_threshold = slow_query_threshold
+        self._lock = threading.Lock()
+        self._requests = {}  # (method, route, status) -> [bucket counts..., sum]
+        self._statements = {}  # normalized sql -> [count, seconds]
+        self._slow_statements = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        """Record one request's latency."""
+        key = (method, route, str(status))
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            counts = self._requests.get(key)
+            if counts is None:
+                counts = self._requests[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += seconds
+
+    def observe_statement(self, sql: str, seconds: float):
+        """Record one statement's execution time, logging it if it was slow."""
+        statement = normalize_sql(sql)
+        slow = self.slow_query_threshold is not None and seconds >= self.slow_query_threshold
+        with self._lock:
+            totals = self._statements.get(statement)
+            if totals is None:
+                totals = self._statements[statement] = [0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+            if slow:
+                self._slow_statements += 1
+        if slow:
+            slow_query_logger.warning("Slow SQLite statement (%.1f ms): %s", seconds * 1000, statement)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics document.
+        """
+        with self._lock:
+            requests = {key: list(counts) for key, counts in self._requests.items()}
+            statements = {key: list(totals) for key, totals in self._statements.items()}
+            slow = self._slow_statements
+
+        lines = [
+            "# HELP http_request_duration_seconds Time spent handling requests, by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), counts in sorted(requests.items()):
+            labels = f'method="{method}",route="{_escape_label(route)}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {counts[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP sqlite_statements_total SQLite statements executed, by normalized statement.",
+            "# TYPE sqlite_statements_total counter",
+        ]
+        lines += [
+            f'sqlite_statements_total{{statement="{_escape_label(sql)}"}} {count}'
+            for sql, (count, _) in sorted(statements.items())
+        ]
+        lines += [
+            "# HELP sqlite_statement_seconds_total Time spent executing SQLite statements, by normalized statement.",
+            "# TYPE sqlite_statement_seconds_total counter",
+        ]
+        lines += [
+            f'sqlite_statement_seconds_total{{statement="{_escape_label(sql)}"}} {seconds:.6f}'
+            for sql, (_, seconds) in sorted(statements.items())
+        ]
+        lines += [
+            "# HELP sqlite_slow_statements_total Statements slower than METRICS_SLOW_QUERY_SECONDS.",
+            "# TYPE sqlite_slow_statements_total counter",
+            f"sqlite_slow_statements_total {slow}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that times each execute call into its connection's MetricsRegistry."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_statement(self.connection.metrics, sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_statement(self.connection.metrics, sql, time.perf_counter() - started)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors, including those behind conn.execute, are instrumented.
+
+    The `metrics` attribute must be set to a MetricsRegistry after connecting.
+    Only execute time is measured; rows fetched lazily afterwards are not.
+    """
+
+    metrics = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _record_statement(metrics, sql, seconds):
+    if metrics is not None:
+        metrics.observe_statement(sql, seconds)
+    if has_request_context():
+        timings = g.get("_timings")
+        if timings is not None:
+            timings["db"] = timings.get("db", 0.0) + seconds
+            g._db_statements = g.get("_db_statements", 0) + 1
+
+
+class _PhaseTimer:
+    __slots__ = ("timings", "phase", "started")
+
+    def __init__(self, timings: dict, phase: str):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings[self.phase] = self.timings.get(self.phase, 0.0) + time.perf_counter() - self.started
+
+
+def timed(phase: str):
+    """
+    Time a block as a named phase of the current request, reported in its Server-Timing header.
+
+    Returns a shared no-op context manager when metrics are disabled or
+    outside a request.
+
+    Args:
+        phase (str): The Server-Timing metric name, e.g. "auth" or "serialize".
+    """
+    timings = g.get("_timings") if has_request_context() else None
+    return _PhaseTimer(timings, phase) if timings is not None else _NULL_TIMER
+
+
+def get_metrics():
+    """Return the current app's MetricsRegistry, or None when METRICS_ENABLED is off."""
+    if not current_app.config["METRICS_ENABLED"]:
+        return None
+    metrics = current_app.extensions.get("metrics")
+    if metrics is None:
+        metrics = current_app.extensions.setdefault(
+            "metrics", MetricsRegistry(current_app.config["METRICS_SLOW_QUERY_SECONDS"])
+        )
+    return metrics
+
+
+def init_metrics(app):
+    """
+    Register the request timing hooks and the /metrics endpoint.
+
+    With METRICS_ENABLED off the hooks return after a single config lookup,
+    connections are plain sqlite3 connections and /metrics answers 404.
+    Register this before other before_request hooks so their time is counted.
+
+    Args:
+        app (Flask): The application to instrument.
+    """
+    @app.before_request
+    def start_request_timer():
+        if app.config["METRICS_ENABLED"]:
+            g._timings = {}
+            g._request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        started = g.pop("_request_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        get_metrics().observe_request(request.method, route, response.status_code, elapsed)
+
+        if app.config["METRICS_SERVER_TIMING"]:
+            timings = g.pop("_timings")
+            entries = []
+            for phase, seconds in timings.items():
+                entry = f"{phase};dur={seconds * 1000:.2f}"
+                if phase == "db":
+                    entry += f';desc="{g.get("_db_statements", 0)} statements"'
+                entries.append(entry)
+            entries.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Expose request and SQLite metrics in the Prometheus text format."""
+        registry = get_metrics()
+        if registry is None:
+            return {"message": "Metrics are disabled"}, 404
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -1,3 +1,5 @@
+import base64
+import json
 from flask import request, jsonify
 
 
@@ -38,3 +40,132 @@ def paginate(query_results, page, per_page):
         "current_page": page,
         "per_page": per_page,
     }
+
+
+def paginate_query(total_items, fetch_page, page, per_page):
+    """
+    Paginate a query whose rows are fetched lazily from the database.
+
+    Unlike `paginate`, only the rows for the requested page are loaded; the
+    total is supplied separately (usually from a COUNT(*) query).
+
+    Args:
+        total_items (int): Total number of items matching the query.
+        fetch_page (callable): Called as fetch_page(limit, offset) and returns the page items.
+        page (int): Current page number.
+        per_page (int): Number of items per page.
+
+    Returns:
+        dict: Paginated results including metadata.
+    """
+    total_pages = (total_items + per_page - 1) // per_page  # Calculate total pages
+
+    if page > total_pages or page < 1:
+        return {
+            "error": "Invalid page number",
+            "total_pages": total_pages,
+            "current_page": page,
+            "per_page": per_page,
+        }, 400
+
+    items = fetch_page(per_page, (page - 1) * per_page)
+
+    return {
+        "items": items,
+        "total_items": total_items,
+        "total_pages": total_pages,
+        "current_page": page,
+        "per_page": per_page,
+    }
+
+
+def encode_cursor(sort, value, last_id):
+    """
+    Encode a keyset position as an opaque, URL-safe cursor.
+
+    Args:
+        sort (str): The field the results are ordered by.
+        value: The sort value of the last item returned.
+        last_id (int): The id of the last item returned.
+
+    Returns:
+        str: The cursor token.
+    """
+    raw = json.dumps([sort, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Types a cursor's sort value may decode to, per sort field; NULL (None) is accepted except for id
+_CURSOR_VALUE_TYPES = {
+    "id": (int,),
+    "title": (str,),
+    "author": (str,),
+    "published_year": (int, float),
+    "created_at": (int, float),
+}
+
+
+def _valid_cursor_value(sort, value):
+    if value is None:
+        return sort != "id"
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, _CURSOR_VALUE_TYPES.get(sort, (str, int, float)))
+
+
+def decode_cursor(token, sort):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        token (str): The cursor token.
+        sort (str): The field the current request is ordered by.
+
+    Returns:
+        tuple: The (sort value, id) position encoded in the cursor.
+
+    Raises:
+        ValueError: If the token is malformed, holds a value that does not fit the sort
+                    field, or was issued for a different sort order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort order")
+    if isinstance(last_id, bool) or not isinstance(last_id, int) or not _valid_cursor_value(sort, value):
+        raise ValueError("Malformed cursor")
+    return value, last_id
+
+
+def paginate_keyset(fetch_after, per_page, sort, after=None):
+    """
+    Paginate with a keyset cursor instead of a page number.
+
+    One extra row is fetched to tell whether another page exists, so each
+    page costs the same regardless of how deep into the results it is.
+
+    Args:
+        fetch_after (callable): Called as fetch_after(limit, after) and returns item dicts.
+        per_page (int): Number of items per page.
+        sort (str): The field the items are ordered by.
+        after (tuple, optional): The decoded (sort value, id) position to continue after.
+
+    Returns:
+        dict: The page items, the cursor for the next page (or None) and metadata.
+    """
+    items = fetch_after(per_page + 1, after)
+    next_cursor = None
+
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, last[sort], last["id"])
+
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "per_page": per_page,
+    }
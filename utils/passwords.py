@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import cached_property
+from flask import current_app
+
+PASSWORD_HASH_ALGORITHMS = ("scrypt", "pbkdf2_sha256")
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when a password check cannot start or finish within the login latency budget."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """
+    Salted password hashes with scrypt or PBKDF2-SHA256 and tunable cost.
+
+    Hashes are stored as "$"-separated strings carrying their algorithm and
+    cost parameters, e.g. "scrypt$16384$8$1$<salt>$<hash>", so they can still be
+    verified after the configured cost changes and then upgraded with
+    needs_rehash. Values in any other format are legacy plaintext passwords.
+
+    `check` and `check_and_rehash` run every key derivation (including the
+    dummy hash and upgraded hashes) on a small thread pool. hashlib releases
+    the GIL while deriving, so the pool size caps how many cores logins can
+    use, and `max_pending` caps how many logins may queue for it, so that a
+    burst of logins cannot starve the threads serving book reads.
+    """
+
+    def __init__(self, algorithm: str = "scrypt", scrypt_n: int = 2 ** 14, scrypt_r: int = 8, scrypt_p: int = 1,
+                 pbkdf2_iterations: int = 600000, workers: int = 2, max_pending: int = 64, timeout: float = 2.0):
+        """
+        Args:
+            algorithm (str, optional): One of PASSWORD_HASH_ALGORITHMS, used for new hashes. Defaults to "scrypt".
+            scrypt_n (int, optional): scrypt CPU/memory cost, a power of two.
+            scrypt_r (int, optional): scrypt block size.
+            scrypt_p (int, optional): scrypt parallelization.
+            pbkdf2_iterations (int, optional): PBKDF2-SHA256 iteration count.
+            workers (int, optional): Threads deriving keys for `check`.
+            max_pending (int, optional): Checks allowed to run or wait at once; more are rejected.
+            timeout (float, optional): Seconds a check may take, queueing included, before giving up.
+        """
+        if algorithm not in PASSWORD_HASH_ALGORITHMS:
+            raise ValueError(f"Unknown password hash algorithm {algorithm!r}; expected one of {PASSWORD_HASH_ALGORITHMS}")
+        if algorithm == "scrypt" and not hasattr(hashlib, "scrypt"):
+            raise ValueError("hashlib.scrypt is unavailable in this Python build; use pbkdf2_sha256")
+        self.algorithm = algorithm
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    @cached_property
+    def _dummy_hash(self) -> str:
+        # Verified against when the user does not exist, so unknown usernames take as long as wrong
+        # passwords. Derived on first use rather than at startup, where it would cost every worker a hash.
+        return self.hash(os.urandom(16).hex())
+
+    def _derive(self, algorithm: str, password: str, salt: bytes, params: tuple) -> bytes:
+        if algorithm == "scrypt":
+            n, r, p = params
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024)
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params[0])
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured algorithm and cost.
+
+        Args:
+            password (str): The plaintext password.
+
+        Returns:
+            str: The encoded hash, including algorithm, parameters and salt.
+        """
+        salt = os.urandom(16)
+        params = self.scrypt_params if self.algorithm == "scrypt" else (self.pbkdf2_iterations,)
+        digest = self._derive(self.algorithm, password, salt, params)
+        return "$".join([self.algorithm, *map(str, params), _b64encode(salt), _b64encode(digest)])
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """
+        Check a password against a stored hash in the calling thread.
+
+        Args:
+            password (str): The plaintext password to check.
+            encoded (str): The stored hash, or a legacy plaintext password.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        algorithm, _, rest = encoded.partition("$")
+        if algorithm not in PASSWORD_HASH_ALGORITHMS:
+            return hmac.compare_digest(password.encode(), encoded.encode())
+        try:
+            *params, salt, digest = rest.split("$")
+            derived = self._derive(algorithm, password, _b64decode(salt), tuple(int(value) for value in params))
+            return hmac.compare_digest(derived, _b64decode(digest))
+        except ValueError:  # A malformed hash never matches
+            return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """Return True if a stored value is plaintext or was hashed with other settings than the current ones."""
+        algorithm, _, rest = encoded.partition("$")
+        if algorithm != self.algorithm:
+            return True
+        try:
+            params = tuple(int(value) for value in rest.split("$")[:-2])
+        except ValueError:  # A malformed hash is replaced like an outdated one
+            return True
+        return params != (self.scrypt_params if algorithm == "scrypt" else (self.pbkdf2_iterations,))
+
+    def _verify_and_rehash(self, password: str, encoded: str, rehash: bool):
+        if encoded is None:
+            self.verify(password, self._dummy_hash)
+            return False, None
+        if not self.verify(password, encoded):
+            return False, None
+        return True, (self.hash(password) if rehash and self.needs_rehash(encoded) else None)
+
+    def _run(self, password: str, encoded: str, rehash: bool):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many password checks in progress")
+        try:
+            future = self._executor.submit(self._verify_and_rehash, password, encoded, rehash)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy("Password check exceeded its time budget")
+
+    def check(self, password: str, encoded: str = None) -> bool:
+        """
+        Verify a password on the hasher's thread pool, within the latency budget.
+
+        Args:
+            password (str): The plaintext password to check.
+            encoded (str, optional): The stored hash; None checks against a dummy hash and returns False.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            PasswordHasherBusy: If max_pending checks are already in flight, or this one exceeded the timeout.
+        """
+        return self._run(password, encoded, rehash=False)[0]
+
+    def check_and_rehash(self, password: str, encoded: str = None) -> tuple:
+        """
+        Verify a password and, if it matches an outdated hash, derive its replacement, as one pool task.
+
+        Both derivations share the check's slot and timeout, so upgrading a
+        hash at login never runs in the request thread.
+
+        Args:
+            password (str): The plaintext password to check.
+            encoded (str, optional): The stored hash; None checks against a dummy hash and returns False.
+
+        Returns:
+            tuple: Whether the password matches, and the new hash to store (None when the stored one is current).
+
+        Raises:
+            PasswordHasherBusy: If max_pending checks are already in flight, or this one exceeded the timeout.
+        """
+        return self._run(password, encoded, rehash=True)
+
+    def shutdown(self):
+        """Stop the thread pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_password_hasher(config) -> PasswordHasher:
+    """
+    Build the password hasher from the PASSWORD_* settings.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        PasswordHasher: The configured hasher.
+    """
+    return PasswordHasher(
+        algorithm=config["PASSWORD_HASH_ALGORITHM"],
+        scrypt_n=config["PASSWORD_SCRYPT_N"],
+        scrypt_r=config["PASSWORD_SCRYPT_R"],
+        scrypt_p=config["PASSWORD_SCRYPT_P"],
+        pbkdf2_iterations=config["PASSWORD_PBKDF2_ITERATIONS"],
+        workers=config["PASSWORD_HASH_WORKERS"],
+        max_pending=config["PASSWORD_HASH_MAX_PENDING"],
+        timeout=config["PASSWORD_HASH_TIMEOUT"],
+    )
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the password hasher of the current app."""
+    return current_app.extensions["password_hasher"]
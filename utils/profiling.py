@@ -0,0 +1,248 @@
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+
+PROFILING_ENGINES = ("stack", "cprofile")
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _collapse(frame) -> str:
+    """Render a frame and its callers as one collapsed-stack line, outermost first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    A daemon thread that samples the Python stacks of registered threads.
+
+    The thread starts on the first registration and sleeps on a condition
+    while no thread is registered, so an idle sampler costs nothing.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval (float, optional): Seconds between samples.
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._thread = None
+
+    def register(self, ident: int):
+        """Start sampling a thread."""
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def unregister(self, ident: int) -> Counter:
+        """
+        Stop sampling a thread.
+
+        Returns:
+            Counter: Samples taken per collapsed stack.
+        """
+        with self._lock:
+            return self._active.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                idents = list(self._active)
+            frames = sys._current_frames()
+            stacks = {ident: _collapse(frames[ident]) for ident in idents if ident in frames}
+            del frames
+            with self._lock:
+                for ident, stack in stacks.items():
+                    samples = self._active.get(ident)
+                    if samples is not None:
+                        samples[stack] += 1
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """
+    Profile a random sample of requests, and every request slower than a threshold.
+
+    With the "stack" engine the request thread is sampled by a StackSampler
+    and the result written as collapsed stacks (`<name>.collapsed`, one
+    "frame;frame;frame count" line per stack, ready for flamegraph.pl or
+    speedscope), each rooted at a "METHOD route" frame so files can be merged.
+    The "cprofile" engine writes cProfile stats (`<name>.pstats`) instead;
+    it is deterministic but slows every profiled request, and with a slow
+    threshold set every request is profiled until it is known to be fast.
+    Only one cProfile session can be active per process (Python 3.12+
+    rejects a second one), so requests overlapping a profiled request are
+    not profiled.
+
+    Each profile has a `<name>.json` sidecar with the method, route, path,
+    query parameters, duration and reason. Only the newest `max_files`
+    profiles are kept.
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, slow_seconds: float = None,
+                 engine: str = "stack", interval: float = 0.005, max_files: int = 200):
+        """
+        Args:
+            directory (str): Where profiles are written; created if missing.
+            sample_rate (float, optional): Fraction of requests profiled regardless of duration.
+            slow_seconds (float, optional): Requests at least this slow are kept. None disables.
+            engine (str, optional): "stack" or "cprofile".
+            interval (float, optional): Seconds between stack samples (stack engine).
+            max_files (int, optional): Profiles kept in `directory`; older ones are deleted.
+
+        Raises:
+            ValueError: If the engine is unknown.
+        """
+        if engine not in PROFILING_ENGINES:
+            raise ValueError(f"Unknown profiling engine {engine!r}; expected one of {PROFILING_ENGINES}")
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.engine = engine
+        self.max_files = max_files
+        self.sampler = StackSampler(interval) if engine == "stack" else None
+        self._sequence = itertools.count()
+        self._write_lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()  # Held by the one request being cProfiled
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """
+        Decide whether to watch the current request and start profiling it.
+
+        Returns:
+            tuple or None: State for finish(), or None if the request is not profiled.
+        """
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            return None
+        if self.sampler is not None:
+            handle = threading.get_ident()
+            self.sampler.register(handle)
+        else:
+            if not self._cprofile_lock.acquire(blocking=False):
+                return None  # Another request is being profiled
+            import cProfile  # Only the cprofile engine needs it
+            handle = cProfile.Profile()
+            try:
+                handle.enable()
+            except ValueError:  # Another profiler, outside this class, is active
+                self._cprofile_lock.release()
+                return None
+        return handle, sampled, time.perf_counter()
+
+    def finish(self, state, tags: dict):
+        """
+        Stop profiling a request and write its profile if it was sampled or slow.
+
+        Args:
+            state (tuple): The value returned by start().
+            tags (dict): Request details stored in the sidecar (method, route, path, query).
+
+        Returns:
+            str or None: The path of the written profile, or None if it was discarded.
+        """
+        handle, sampled, started = state
+        elapsed = time.perf_counter() - started
+        if self.sampler is not None:
+            samples = self.sampler.unregister(handle)
+        else:
+            handle.disable()
+            self._cprofile_lock.release()
+        slow = self.slow_seconds is not None and elapsed >= self.slow_seconds
+        if not (sampled or slow):
+            return None
+
+        route = _SLUG.sub("_", tags.get("route", "")).strip("_") or "root"
+        name = f"{time.time_ns()}-{os.getpid()}-{next(self._sequence)}-{tags.get('method', '')}-{route}"
+        base = os.path.join(self.directory, name)
+        if self.sampler is not None:
+            path = base + ".collapsed"
+            root = f"{tags.get('method', '')} {tags.get('route', '')}".strip()
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{root};{stack} {count}\n")
+        else:
+            path = base + ".pstats"
+            handle.dump_stats(path)
+
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({**tags, "seconds": round(elapsed, 6), "reason": "slow" if slow else "sampled",
+                       "engine": self.engine, "profile": os.path.basename(path)}, f)
+        self._rotate()
+        return path
+
+    def _rotate(self):
+        with self._write_lock:
+            sidecars = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+            for sidecar in sidecars[:max(0, len(sidecars) - self.max_files)]:
+                stem = sidecar[:-len(".json")]
+                for suffix in (".json", ".collapsed", ".pstats"):
+                    try:
+                        os.remove(os.path.join(self.directory, stem + suffix))
+                    except FileNotFoundError:
+                        pass
+
+
+def init_profiling(app):
+    """
+    Register request profiling hooks when PROFILING_ENABLED is on.
+
+    Nothing is registered otherwise, so a disabled profiler adds no work to
+    any request. The decision is made once, at application creation.
+
+    Args:
+        app (Flask): The application to profile.
+    """
+    if not app.config["PROFILING_ENABLED"]:
+        return
+
+    profiler = RequestProfiler(
+        app.config["PROFILING_DIR"],
+        sample_rate=app.config["PROFILING_SAMPLE_RATE"],
+        slow_seconds=app.config["PROFILING_SLOW_SECONDS"],
+        engine=app.config["PROFILING_ENGINE"],
+        interval=app.config["PROFILING_INTERVAL"],
+        max_files=app.config["PROFILING_MAX_FILES"],
+    )
+    app.extensions["profiler"] = profiler
+
+    @app.before_request
+    def start_profiling():
+        g._profile = profiler.start()
+
+    @app.teardown_request
+    def finish_profiling(exc):
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        tags = {
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule is not None else "<unmatched>",
+            "path": request.path,
+            "query": request.args.to_dict(flat=False),
+        }
+        try:
+            profiler.finish(state, tags)
+        except OSError:
+            app.logger.exception("Could not write request profile")
@@ -0,0 +1,61 @@
+import json
+from flask import Response
+from utils.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up; the stdlib encoder is used without it
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON, using orjson when it is installed.
+
+    Args:
+        obj: A JSON-serializable object.
+
+    Returns:
+        bytes: The encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def book_to_dict(book) -> dict:
+    """
+    Convert a models.book.Book to the dict sent to API clients.
+
+    Args:
+        book (Book): The book row.
+
+    Returns:
+        dict: The book keyed by column name.
+    """
+    return dict(zip(book._fields, book))
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """
+    Build a JSON response, splicing in pre-rendered items when present.
+
+    When payload["items"] is a string it is taken to be JSON array text (from
+    models.book.search_books_page with as_json) and written to the body
+    verbatim instead of being decoded and re-encoded.
+
+    Args:
+        payload (dict): The response body.
+        status (int, optional): The HTTP status code. Defaults to 200.
+
+    Returns:
+        Response: The JSON response.
+    """
+    with timed("serialize"):
+        items = payload.get("items")
+        if isinstance(items, str):
+            head = dumps({key: value for key, value in payload.items() if key != "items"})
+            body = head[:-1] + (b"," if len(head) > 2 else b"") + b'"items":' + items.encode() + b"}"
+        else:
+            body = dumps(payload)
+    return Response(body, status=status, mimetype="application/json")
@@ -0,0 +1,90 @@
+import itertools
+import os
+import threading
+from flask import request
+from models.sessions import remove_expired_sessions
+from utils.metrics import timed
+
+STRATEGIES = ("background", "amortized", "lazy")
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_sweeper_lock = threading.Lock()
+
+
+class SessionSweeper(threading.Thread):
+    """Daemon thread that deletes expired sessions every `interval` seconds."""
+
+    def __init__(self, app, interval: float):
+        """
+        Args:
+            app (Flask): The application whose database is swept.
+            interval (float): Seconds between sweeps.
+        """
+        super().__init__(name="session-sweeper", daemon=True)
+        self.app = app
+        self.interval = interval
+        self.pid = os.getpid()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired sessions once, logging rather than raising on failure."""
+        try:
+            with self.app.app_context():
+                remove_expired_sessions()
+        except Exception:
+            self.app.logger.exception("Expired session sweep failed")
+
+    def stop(self):
+        """Ask the thread to exit after its current wait."""
+        self._stop_event.set()
+
+
+def init_session_expiry(app):
+    """
+    Register the expired-session cleanup strategy selected by SESSION_CLEANUP_STRATEGY.
+
+    Strategies:
+        background: a daemon thread sweeps every SESSION_CLEANUP_INTERVAL seconds.
+        amortized: every SESSION_CLEANUP_EVERY_N_REQUESTS-th write request sweeps.
+        lazy: nothing is swept; validate_session ignores expired rows and
+              create_session replaces a user's old sessions.
+
+    In every strategy read-only requests (GET, HEAD, OPTIONS) never write.
+
+    Args:
+        app (Flask): The application to configure.
+    """
+    strategy = app.config["SESSION_CLEANUP_STRATEGY"]
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown SESSION_CLEANUP_STRATEGY {strategy!r}; expected one of {STRATEGIES}")
+
+    if strategy == "background":
+        interval = app.config["SESSION_CLEANUP_INTERVAL"]
+
+        @app.before_request
+        def ensure_session_sweeper():
+            # Started on the first request rather than at import so that each
+            # forked worker (e.g. gunicorn --preload) runs its own thread.
+            sweeper = app.extensions.get("session_sweeper")
+            if sweeper is None or sweeper.pid != os.getpid():
+                with _sweeper_lock:
+                    sweeper = app.extensions.get("session_sweeper")
+                    if sweeper is None or sweeper.pid != os.getpid():
+                        sweeper = app.extensions["session_sweeper"] = SessionSweeper(app, interval)
+                        sweeper.start()
+
+    elif strategy == "amortized":
+        every = app.config["SESSION_CLEANUP_EVERY_N_REQUESTS"]
+        counter = itertools.count(1)
+
+        @app.before_request
+        def amortized_session_cleanup():
+            if request.method in SAFE_METHODS:
+                return
+            if next(counter) % every == 0:
+                with timed("sweep"):
+                    remove_expired_sessions()